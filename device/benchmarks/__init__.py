@@ -0,0 +1,5 @@
+"""Micro-benchmarks for the fd_device.
+
+Run a benchmark from the device directory, for example:
+    python -m benchmarks.owhttpd_parser
+"""
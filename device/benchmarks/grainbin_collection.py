@@ -0,0 +1,133 @@
+"""Measure the time to collect grainbin updates from a simulated OWFS.
+
+The simulator serves BUSSES busses with SENSORS sensors each, both as
+owhttpd pages and over the owserver protocol. Every request takes LATENCY
+seconds and a temperature conversion takes CONVERSION_TIME seconds, for a
+single sensor or for a whole bus at once.
+
+Each collection strategy is run for both backends and the time and number
+of requests answered by the simulated OWFS per update cycle are printed.
+An owhttpd page can take several requests to render. The data is kept in
+a temporary SQLite database, never in the configured database.
+"""
+import os
+import tempfile
+import time
+
+from sqlalchemy import select
+
+from fd_device.database import database
+from fd_device.database.database import create_all_tables, get_engine, get_session
+from fd_device.database.device import Device, Grainbin
+from fd_device.grainbin import update
+from fd_device.grainbin.simulator import (
+    SimulatedOwfs,
+    SimulatedOwhttpd,
+    SimulatedOwserver,
+    start_in_thread,
+)
+from fd_device.settings import get_config
+
+CONFIG = get_config()
+BUSSES = 4
+SENSORS = 8
+LATENCY = 0.002
+# a DS18B20 takes 0.75 seconds at 12 bit resolution, scaled down
+CONVERSION_TIME = 0.05
+CYCLES = 3
+
+
+def full_read():
+    """Discover and read every sensor in full, one bus after another."""
+
+    session = get_session()
+    grainbins = session.scalars(select(Grainbin)).all()
+    for grainbin in grainbins:
+        update.get_indivudual_grainbin_update(grainbin)
+    session.close()
+
+
+def cached_topology():
+    """Read the temperatures only, one conversion per sensor."""
+
+    CONFIG.GRAINBIN_SIMULTANEOUS_CONVERSION = False
+    update.get_grainbin_updates()
+
+
+def simultaneous():
+    """Read the temperatures after one conversion per bus."""
+
+    CONFIG.GRAINBIN_SIMULTANEOUS_CONVERSION = True
+    update.get_grainbin_updates()
+
+
+def use_temporary_database(directory: str):
+    """Create the engine on a new SQLite database in directory."""
+
+    path = os.path.join(directory, "benchmark.sqlite")
+    database.config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+    if get_engine().url.database != path:
+        # the engine was created before the uri was changed
+        raise RuntimeError("The benchmark must not use the configured database")
+    create_all_tables()
+
+
+def main():
+    """Run the benchmark and print the results."""
+
+    model = SimulatedOwfs(
+        bus_count=BUSSES,
+        sensors_per_bus=SENSORS,
+        conversion_time=CONVERSION_TIME,
+        latency=LATENCY,
+        seed=1,
+    )
+    servers = [SimulatedOwhttpd(model), SimulatedOwserver(model)]
+    for server in servers:
+        start_in_thread(server)
+
+    CONFIG.OWFS_HOST = "127.0.0.1"
+    CONFIG.OWFS_HTTP_PORT = servers[0].server_address[1]
+    CONFIG.OWFS_SERVER_PORT = servers[1].server_address[1]
+    # the simulator waits for the conversion before answering
+    CONFIG.GRAINBIN_CONVERSION_TIME = 0
+
+    temporary_directory = tempfile.TemporaryDirectory()
+    use_temporary_database(temporary_directory.name)
+    session = get_session()
+    device = Device("benchmark")
+    session.add(device)
+    session.flush()
+    for bus_number in range(1, BUSSES + 1):
+        session.add(Grainbin(f"bin {bus_number}", bus_number, device.id))
+    session.commit()
+    session.close()
+
+    print(f"{BUSSES} busses x {SENSORS} sensors, {CYCLES} cycles")
+    print(f"{'backend':<10} {'strategy':<18} {'s/cycle':>9} {'requests':>9}")
+    for backend in ("http", "owserver"):
+        CONFIG.OWFS_BACKEND = backend
+        update.TOPOLOGY.invalidate(reload_attributes=True)
+        # discover the topology before timing the cached strategies
+        update.TOPOLOGY.refresh(reload_attributes=True)
+        for strategy in (full_read, cached_topology, simultaneous):
+            requests = model.request_count
+            start = time.perf_counter()
+            for _ in range(CYCLES):
+                strategy()
+            elapsed = (time.perf_counter() - start) / CYCLES
+            requests = (model.request_count - requests) / CYCLES
+            print(
+                f"{backend:<10} {strategy.__name__:<18} {elapsed:>9.3f} {requests:>9.0f}"
+            )
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    database.remove_session()
+    database.dispose_engine()
+    temporary_directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare the owhttpd page parser against the previous BeautifulSoup parser.
+
+Every page captured in tests/grainbin is parsed with both parsers. The
+time per page and the peak memory allocated while parsing are printed.
+"""
+import glob
+import os
+import time
+import timeit
+import tracemalloc
+
+from fd_device.grainbin.owhttpd_parser import parse_owhttpd_page
+from fd_device.settings import get_config
+
+CONFIG = get_config()
+NUMBER = 200
+
+
+def parse_with_beautifulsoup(text: str) -> list[list[str]]:
+    """Parse a page the way fetch_and_parse_page used to."""
+
+    # imported here so that the import cost is measured separately
+    from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+
+    data = []
+    soup = BeautifulSoup(text, "html.parser")
+    tables = soup.find_all("table")
+    if not tables:
+        return []
+    for row in tables[1].find_all("tr"):
+        col_as_list = []
+        for col in row.find_all("td"):
+            form = col.find("form")
+            if form:
+                for tag in form.find_all("input"):
+                    if tag["type"] == "TEXT":
+                        col_as_list.append(tag["value"])
+            else:
+                col_as_list.append(col.get_text())
+        data.append(col_as_list)
+    return data
+
+
+def peak_memory(parse, text: str) -> int:
+    """Return the peak number of bytes allocated while parsing text."""
+
+    tracemalloc.start()
+    parse(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    """Run the benchmark and print the results."""
+
+    start = time.perf_counter()
+    import bs4  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
+
+    import_time = time.perf_counter() - start
+    print(f"bs4 import: {import_time * 1000:.1f} ms")
+
+    pages = sorted(glob.glob(f"{CONFIG.TEST_DIR}/grainbin/*_owfs_page.txt"))
+    print(f"{'page':<45} {'bs4 us':>9} {'new us':>9} {'bs4 KiB':>9} {'new KiB':>9}")
+    for page in pages:
+        with open(page) as f:
+            text = f.read()
+
+        if parse_with_beautifulsoup(text) != parse_owhttpd_page(text):
+            print(f"{os.path.basename(page)}: results differ")
+            continue
+
+        old_time = timeit.timeit(lambda: parse_with_beautifulsoup(text), number=NUMBER)
+        new_time = timeit.timeit(lambda: parse_owhttpd_page(text), number=NUMBER)
+        old_memory = peak_memory(parse_with_beautifulsoup, text)
+        new_memory = peak_memory(parse_owhttpd_page, text)
+        print(
+            f"{os.path.basename(page):<45} "
+            f"{old_time / NUMBER * 1e6:>9.1f} {new_time / NUMBER * 1e6:>9.1f} "
+            f"{old_memory / 1024:>9.1f} {new_memory / 1024:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Compare the size and CPU cost of the update serializers and compressions.
+
+A grainbin.update_batch body for BINS grainbins with SENSORS sensors each
+and a device.update body are encoded with every serializer and
+compression combination. The encoded size and the time to encode and to
+decode each body are printed.
+"""
+import datetime
+import timeit
+
+from kombu import compression, serialization
+
+from fd_device.grainbin.update import get_grainbin_batch
+from fd_device.serialization import SERIALIZER_NAME, register_serializer
+
+BINS = 10
+SENSORS = 30
+NUMBER = 200
+SERIALIZERS = ("json", SERIALIZER_NAME)
+COMPRESSIONS = (None, "zlib", "bzip2", "lzma")
+
+
+def grainbin_cycle() -> dict:
+    """Return the batch of one grainbin update cycle."""
+
+    now = datetime.datetime.now()
+    updates = []
+    for bin_number in range(BINS):
+        sensors = [f"28.{bin_number:04X}{n:08X}" for n in range(SENSORS)]
+        updates.append(
+            {
+                "created_at": now,
+                "name": f"Grainbin {bin_number}",
+                "bus_number": bin_number,
+                "bus_number_string": f"bus.{bin_number}",
+                "sensor_names": sensors,
+                "sensor_data": [
+                    {
+                        "temperature": round(18 + (n * 7 % 40) / 16, 4),
+                        "temphigh": n // 10 + 1,
+                        "templow": n % 10 + 1,
+                        "sensor_name": sensor,
+                    }
+                    for n, sensor in enumerate(sensors)
+                ],
+                "average_temp": 19.25,
+            }
+        )
+    return get_grainbin_batch(updates, "device_1", now)
+
+
+def device_update() -> dict:
+    """Return a device update."""
+
+    now = datetime.datetime.now()
+    return {
+        "created_at": now,
+        "id": "device_1",
+        "interior_temp": 21.5,
+        "exterior_temp": -4.25,
+        "interior_sample_count": 3,
+        "exterior_sample_count": 3,
+        "sampled_at": now,
+    }
+
+
+def encode(body, serializer: str, method):
+    """Serialize and compress a message body like kombu does."""
+
+    content_type, encoding, data = serialization.dumps(body, serializer)
+    if isinstance(data, str):
+        data = data.encode(encoding)
+    if method:
+        data, _ = compression.compress(data, method)
+    return content_type, encoding, data
+
+
+def decode(content_type: str, encoding: str, data: bytes, method):
+    """Decompress and load a message body like kombu does."""
+
+    if method:
+        data = compression.decompress(data, compression.get_encoder(method)[1])
+    return serialization.loads(data, content_type, encoding)
+
+
+def main():
+    """Run the benchmark and print the results."""
+
+    register_serializer()
+    for name, payload in (
+        ("grainbin batch", grainbin_cycle()),
+        ("device", device_update()),
+    ):
+        body = (
+            [payload],
+            {},
+            {"callbacks": None, "errbacks": None, "chain": None, "chord": None},
+        )
+        print(f"{name}:")
+        print(
+            f"{'serializer':<12} {'compression':<12} {'bytes':>8} {'encode us':>10} {'decode us':>10}"
+        )
+        for serializer in SERIALIZERS:
+            for method in COMPRESSIONS:
+                encoded = encode(body, serializer, method)
+                encode_time = timeit.timeit(
+                    lambda: encode(body, serializer, method), number=NUMBER
+                )
+                decode_time = timeit.timeit(
+                    lambda: decode(*encoded, method), number=NUMBER
+                )
+                print(
+                    f"{serializer:<12} {str(method):<12} {len(encoded[2]):>8} "
+                    f"{encode_time / NUMBER * 1e6:>10.1f} {decode_time / NUMBER * 1e6:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Keep the broker connections used to publish updates open and healthy.
+
+Celery keeps up to broker_pool_limit connections open in app.pool and
+reuses them for every sent task, so a task does not pay for a new
+connection and login. A connection that only publishes never reads from
+the broker, so nothing sends its heartbeats or reads the ones the broker
+sends. check_broker is run regularly to do both for every idle pooled
+connection, and to drop a lost connection so the next task connects again.
+"""
+import datetime
+import logging
+import socket
+import time
+from typing import NamedTuple, Optional
+
+from amqp.exceptions import AMQPError  # type: ignore
+from celery import Celery
+from kombu import Connection
+from kombu.exceptions import KombuError
+from kombu.resource import Resource
+
+from fd_device.settings import get_config
+
+LOGGER = logging.getLogger("fd.broker")
+CONFIG = get_config()
+
+# errors raised by a lost or unreachable broker
+BROKER_ERRORS = (KombuError, AMQPError, OSError)
+
+
+class BrokerHealth(NamedTuple):
+    """The result of a broker connection check."""
+
+    connected: bool
+    # how long the check took. In seconds
+    latency: float
+    error: Optional[str]
+    checked_at: datetime.datetime
+
+
+def check_broker(app: Celery, timeout: Optional[float] = None) -> BrokerHealth:
+    """Check the pooled broker connections and send their heartbeats.
+
+    One connection is opened if it is not open yet. The other idle
+    connections in the pool are only checked if they are open. A connection
+    that fails the check is dropped and opened again the next time it is used.
+
+    Args:
+        app: the Celery app whose connection pool is checked
+        timeout: how long to wait for a free connection and to connect.
+            Defaults to BROKER_CONNECTION_TIMEOUT
+
+    Returns:
+        BrokerHealth: whether the broker could be reached
+    """
+
+    timeout = CONFIG.BROKER_CONNECTION_TIMEOUT if timeout is None else timeout
+    start = time.perf_counter()
+    errors = []
+    connections: list[Connection] = []
+    try:
+        connections.append(app.pool.acquire(block=True, timeout=timeout))
+        connections.extend(_acquire_idle(app.pool))
+        for index, connection in enumerate(connections):
+            if index and not connection.connected:
+                continue
+            try:
+                keep_alive(connection, timeout)
+            except BROKER_ERRORS as broker_error:
+                connection.collect()
+                errors.append(repr(broker_error))
+    except BROKER_ERRORS as broker_error:
+        errors.append(repr(broker_error))
+    finally:
+        for connection in connections:
+            connection.release()
+
+    error = ", ".join(errors) if errors else None
+    health = BrokerHealth(
+        connected=error is None,
+        latency=time.perf_counter() - start,
+        error=error,
+        checked_at=datetime.datetime.now(),
+    )
+    if error is None:
+        LOGGER.debug(
+            f"{len(connections)} broker connections checked in {health.latency:.3f} seconds"
+        )
+    else:
+        LOGGER.warning(f"Broker connection check failed: {error}")
+    return health
+
+
+def keep_alive(connection: Connection, timeout: float):
+    """Connect if needed, read the pending frames and send the heartbeat.
+
+    The heartbeats sent by the broker are only counted once they are read.
+    Without reading them a connection that only publishes looks dead after
+    two heartbeat intervals and is closed.
+
+    Raises:
+        BROKER_ERRORS: if the broker can not be reached or the connection is lost
+    """
+
+    connection.ensure_connection(max_retries=1, timeout=timeout)
+    try:
+        while True:
+            connection.drain_events(timeout=0)
+    except socket.timeout:
+        pass
+    connection.heartbeat_check()
+
+
+def _acquire_idle(pool: Resource) -> list[Connection]:
+    """Acquire every connection of the pool that is not in use."""
+
+    connections: list[Connection] = []
+    if not pool.limit:
+        # an unlimited pool has no idle connections, a new one is made each time
+        return connections
+    while True:
+        try:
+            connections.append(pool.acquire(block=False))
+        except pool.LimitExceeded:
+            return connections
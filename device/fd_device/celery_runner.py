@@ -1,14 +1,23 @@
 """Main celery module."""
 import logging
 import time
+from functools import partial
+from typing import Any, Callable, NamedTuple, Optional
 
-import schedule
 from amqp import exceptions as amqp_exceptions  # type: ignore
 from celery import Celery, exceptions
 from celery.result import AsyncResult
 
+from fd_device.broker import check_broker
+from fd_device.database.database import remove_session
+from fd_device.database.instrumentation import track_queries
+from fd_device.database.metadata import METADATA
 from fd_device.device.update import get_device_info
-from fd_device.grainbin.update import get_grainbin_updates
+from fd_device.grainbin.rollup import maintain_reading_history
+from fd_device.grainbin.update import get_grainbin_batch, get_grainbin_updates
+from fd_device.outbox import drain_outbox, store_message
+from fd_device.scheduler import COALESCE, SKIP, Scheduler
+from fd_device.serialization import register_serializer
 from fd_device.settings import get_config
 
 LOGGER = logging.getLogger("fd.celery_runner")
@@ -16,16 +25,99 @@ CONFIG = get_config()
 
 app = Celery()
 app.config_from_object("fd_device.settings:CeleryConfig")
+register_serializer()
 
+# errors raised when a task could not be published or its result not received
+PUBLISH_ERRORS = (
+    exceptions.OperationalError,
+    amqp_exceptions.ConnectionForced,
+    OSError,
+)
+# the shortest time to wait for a result, even when the deadline has passed.
+# Results that already arrived are still collected. In seconds
+MIN_RESULT_WAIT = 0.1
 
-def send_update_to_server(task_name: str, payload, ignore_result: bool = False):
-    """Send a payload to a specific task on the server."""
+
+class SendOutcome(NamedTuple):
+    """The outcome of sending one payload to the server."""
+
+    task_name: str
+    # 'sent', 'timeout' (published, but no result in time) or
+    # 'failed' (not published)
+    status: str
+    response: Any
+    attempts: int
+
+
+class TaskSupport:
+    """Remember that the server does not have a task.
+
+    The task is tried again once retry_after seconds have passed, so a
+    server that is upgraded later is picked up.
+    """
+
+    def __init__(self, retry_after: float, clock: Callable[[], float] = time.monotonic):
+        """Create the TaskSupport object."""
+
+        self.retry_after = retry_after
+        self._clock = clock
+        self._unsupported_at: Optional[float] = None
+
+    def is_supported(self) -> bool:
+        """Return True if the task should be tried."""
+
+        if self._unsupported_at is None:
+            return True
+        if self._clock() - self._unsupported_at > self.retry_after:
+            self._unsupported_at = None
+            return True
+        return False
+
+    def mark_unsupported(self):
+        """Stop trying the task until retry_after seconds have passed."""
+
+        self._unsupported_at = self._clock()
+
+
+GRAINBIN_BATCH = TaskSupport(CONFIG.GRAINBIN_UPDATE_BATCH_RETRY)
+
+
+def is_not_registered(response) -> bool:
+    """Return True if the response is the error of a task the server does not have."""
+
+    if not isinstance(response, Exception):
+        return False
+    return bool(type(response).__name__ == exceptions.NotRegistered.__name__)
+
+
+def publish_update(task_name: str, payload, **options) -> AsyncResult:
+    """Publish a payload to a task with the UPDATE_SERIALIZER and UPDATE_COMPRESSION."""
+
+    return app.send_task(
+        task_name,
+        args=[payload],
+        serializer=CONFIG.UPDATE_SERIALIZER,
+        compression=CONFIG.UPDATE_COMPRESSION,
+        **options,
+    )
+
+
+def send_update_to_server(
+    task_name: str,
+    payload,
+    ignore_result: bool = False,
+    store_on_failure: bool = False,
+):
+    """Send a payload to a specific task on the server.
+
+    If store_on_failure is True and the payload could not be published, it
+    is stored in the outbox and sent again later. A payload whose result
+    timed out was published, so it is not stored.
+    """
 
     try:
         LOGGER.debug(f"Sending '{task_name}' to Celery broker")
-        result: AsyncResult = app.send_task(
-            task_name, args=[payload], ignore_result=ignore_result
-        )
+        result = publish_update(task_name, payload, ignore_result=ignore_result)
         if not ignore_result:
             response = result.get(timeout=CONFIG.SEND_TASK_GET_TIMEOUT)
             LOGGER.debug(f"'{task_name}' task returned: {response}")
@@ -34,16 +126,107 @@ def send_update_to_server(task_name: str, payload, ignore_result: bool = False):
         return True
     except exceptions.OperationalError as operational_error:
         LOGGER.error(f"Caught Operational error: {operational_error}")
-        return False
     except exceptions.TimeoutError as timeout_error:
         LOGGER.error(f"Caught Timeout error: {timeout_error}")
         return False
     except amqp_exceptions.ConnectionForced as connection_error:
         LOGGER.error(f"Caught Connection error: {connection_error}")
-        return False
     except OSError as os_error:
         LOGGER.error(f"Caught OSError: {os_error}")
-        return False
+
+    if store_on_failure:
+        store_message(task_name, payload)
+    return False
+
+
+def send_updates_to_server(
+    task_name: str, payloads: list, store_on_failure: bool = False
+) -> list[SendOutcome]:
+    """Send many payloads to a task and wait for all results at once.
+
+    Every payload is published first, then the results are collected under
+    one overall deadline of SEND_TASK_GET_TIMEOUT, so a cycle takes about one
+    round trip instead of one per payload. Payloads without a result by the
+    deadline are sent again one at a time, up to SEND_TASK_RETRIES times.
+
+    After a payload fails to publish, the rest are not tried. They are
+    stored in the outbox if store_on_failure is True.
+
+    Returns:
+        list[SendOutcome]: the outcome of each payload, in order
+    """
+
+    outcomes: list = [None] * len(payloads)
+    pending = _publish_all(task_name, payloads, outcomes, store_on_failure)
+
+    deadline = time.monotonic() + CONFIG.SEND_TASK_GET_TIMEOUT
+    for index, result in pending:
+        timeout = max(deadline - time.monotonic(), MIN_RESULT_WAIT)
+        try:
+            response = result.get(timeout=timeout, propagate=False)
+            outcomes[index] = SendOutcome(task_name, "sent", response, 1)
+        except (exceptions.TimeoutError, *PUBLISH_ERRORS) as error:
+            LOGGER.warning(f"No result for '{task_name}' {result.id}: {error!r}")
+
+    for index, outcome in enumerate(outcomes):
+        if outcome is None:
+            outcomes[index] = _resend_update(
+                task_name, payloads[index], store_on_failure
+            )
+
+    statuses = [outcome.status for outcome in outcomes]
+    LOGGER.info(
+        f"Sent {len(payloads)} '{task_name}' tasks: "
+        f"{statuses.count('sent')} sent, {statuses.count('timeout')} timed out, "
+        f"{statuses.count('failed')} failed"
+    )
+    return outcomes
+
+
+def _publish_all(
+    task_name: str, payloads: list, outcomes: list, store_on_failure: bool
+) -> list[tuple[int, AsyncResult]]:
+    """Publish the payloads without waiting for their results.
+
+    The payloads that could not be published get a 'failed' outcome.
+
+    Returns:
+        list[tuple[int, AsyncResult]]: the index and result of each published payload
+    """
+
+    pending: list[tuple[int, AsyncResult]] = []
+    publishing = True
+    for index, payload in enumerate(payloads):
+        if publishing:
+            try:
+                pending.append((index, publish_update(task_name, payload)))
+                continue
+            except PUBLISH_ERRORS as error:
+                LOGGER.error(f"Could not publish '{task_name}': {error!r}")
+                publishing = False
+        if store_on_failure:
+            store_message(task_name, payload)
+        outcomes[index] = SendOutcome(task_name, "failed", None, 1)
+    return pending
+
+
+def _resend_update(task_name: str, payload, store_on_failure: bool) -> SendOutcome:
+    """Send a payload again on its own until a result is received."""
+
+    attempts = 1
+    for attempts in range(2, CONFIG.SEND_TASK_RETRIES + 2):
+        try:
+            result = publish_update(task_name, payload)
+            response = result.get(timeout=CONFIG.SEND_TASK_GET_TIMEOUT, propagate=False)
+            return SendOutcome(task_name, "sent", response, attempts)
+        except exceptions.TimeoutError:
+            LOGGER.warning(f"'{task_name}' timed out on attempt {attempts}")
+        except PUBLISH_ERRORS as error:
+            LOGGER.error(f"Could not publish '{task_name}': {error!r}")
+            if store_on_failure:
+                store_message(task_name, payload)
+            return SendOutcome(task_name, "failed", None, attempts)
+    return SendOutcome(task_name, "timeout", None, attempts)
 
 
 def send_device_update():
@@ -52,7 +235,7 @@ def send_device_update():
     LOGGER.debug("Creating device update")
     info = get_device_info()
     LOGGER.debug("Sending device update")
-    send_update_to_server("device.update", info)
+    send_update_to_server("device.update", info, store_on_failure=True)
 
 
 def send_grainbin_update():
@@ -61,43 +244,110 @@ def send_grainbin_update():
     LOGGER.debug("Creating grainbin update")
     info = get_grainbin_updates()
     LOGGER.debug("Sending grainbin update")
-    for update in info:
-        send_update_to_server("grainbin.update", update)
+    if CONFIG.GRAINBIN_UPDATE_BATCH and info and GRAINBIN_BATCH.is_supported():
+        if send_grainbin_batch(info):
+            return
+    send_updates_to_server("grainbin.update", info, store_on_failure=True)
+
+
+def send_grainbin_batch(info: list) -> bool:
+    """Send the grainbin updates of a cycle in one grainbin.update_batch task.
+
+    If the batch can not be published, the updates are stored in the outbox
+    one per grainbin, which every server can receive.
+
+    Returns:
+        bool: False if the updates still need to be sent one per grainbin
+    """
+
+    device = METADATA.get_device()
+    if device is None:
+        return False
+
+    # the batch is stamped with when the grainbins were read, not when it is sent
+    batch = get_grainbin_batch(info, device.device_id)
+    (outcome,) = send_updates_to_server("grainbin.update_batch", [batch])
+    if outcome.status == "failed":
+        for update in info:
+            store_message("grainbin.update", update)
+        return True
+    if is_not_registered(outcome.response):
+        LOGGER.info(
+            "The server does not have the grainbin.update_batch task, "
+            "sending one grainbin.update task per grainbin"
+        )
+        GRAINBIN_BATCH.mark_unsupported()
+        return False
+    return True
+
+
+def send_outbox_updates():
+    """Send the updates stored in the outbox while the server was unreachable."""
+
+    drain_outbox(
+        lambda task_name, payload: send_update_to_server(
+            task_name, payload, ignore_result=True
+        )
+    )
+
+
+def check_broker_connection():
+    """Keep the pooled broker connection open and send its heartbeat."""
+
+    check_broker(app)
+
+
+def run_job(job):
+    """Run a scheduled job and release its database session when it is done.
+
+    Each job gets a fresh session so the scheduler process does not hold a
+    connection open between jobs. The queries of the job are counted and
+    logged under the name of the job.
+    """
+
+    with track_queries(job.__name__):
+        try:
+            return job()
+        finally:
+            remove_session()
+
+
+def add_update_job(func, interval: float, overlap: str = SKIP):
+    """Run func with run_job every interval seconds."""
+
+    SCHEDULER.add_job(partial(run_job, func), interval, func.__name__, overlap)
 
 
-# set schedule
+# set schedule. Intervals are in minutes unless noted
+SCHEDULER = Scheduler(jitter=CONFIG.SCHEDULER_JITTER)
 DEVICE_INTERVAL = CONFIG.SCHEDULER_DEVICE_UPDATE_INTERVAL
 GRAINBIN_INTERVAL = CONFIG.SCHEDULER_GRAINBIN_UPDATE_INTERVAL
-schedule.every(DEVICE_INTERVAL).minutes.at(":00").do(send_device_update)
-schedule.every(GRAINBIN_INTERVAL).minutes.at(":00").do(send_grainbin_update)
+ROLLUP_INTERVAL = CONFIG.SCHEDULER_ROLLUP_INTERVAL
+OUTBOX_INTERVAL = CONFIG.SCHEDULER_OUTBOX_DRAIN_INTERVAL
+# a device update that missed its time is still sent once the previous one is done
+add_update_job(send_device_update, DEVICE_INTERVAL * 60, COALESCE)
+add_update_job(send_grainbin_update, GRAINBIN_INTERVAL * 60)
+add_update_job(maintain_reading_history, ROLLUP_INTERVAL * 60)
+add_update_job(send_outbox_updates, OUTBOX_INTERVAL * 60)
+# in seconds
+SCHEDULER.add_job(check_broker_connection, CONFIG.SCHEDULER_BROKER_CHECK_INTERVAL)
+SCHEDULER.add_job(SCHEDULER.log_stats, CONFIG.SCHEDULER_STATS_INTERVAL * 60)
 
 
 def run_scheduled_tasks():
-    """Run the scheduled tasks using the 'schedule' package."""
+    """Run the scheduled tasks until interrupted."""
 
+    # open the broker connection before the first update needs it
+    check_broker_connection()
     # always send a device update upon start up (in case the device is new to the server)
-    send_device_update()
+    run_job(send_device_update)
 
     try:
-        while True:
-            idle_seconds = schedule.idle_seconds()
-
-            if idle_seconds is None:
-                # no more jobs to run
-                LOGGER.warning("No more jobs for scheduler to run")
-                break
-
-            if idle_seconds > 0:
-                # sleep till the next scheduled job needs to be run
-                LOGGER.debug(f"scheduler sleeping for {idle_seconds} seconds.")
-                time.sleep(idle_seconds)
-
-            start = time.time()
-            schedule.run_pending()
-            end = time.time()
-            elapsed_time = end - start
-            LOGGER.debug(f"SCHEDULER - took: {elapsed_time} seconds to run")
+        SCHEDULER.run()
     except KeyboardInterrupt:
         LOGGER.info("Stopping scheduler")
+    finally:
+        SCHEDULER.shutdown(wait=False)
 
+    SCHEDULER.log_stats()
     LOGGER.info("Scheduler is exiting")
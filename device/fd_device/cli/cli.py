@@ -13,9 +13,12 @@ def entry_point():
 
 
 entry_point.add_command(manage_commands.run)
+entry_point.add_command(manage_commands.broker_status)
 entry_point.add_command(setup_commands.first_setup)
 
 entry_point.add_command(testing_commands.test)
 entry_point.add_command(testing_commands.lint)
+entry_point.add_command(testing_commands.owfs_simulator)
+entry_point.add_command(testing_commands.owfs_record)
 
 entry_point.add_command(db_commands.database)
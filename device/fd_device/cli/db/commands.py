@@ -14,6 +14,14 @@ from fd_device.database.database import (
 # pylint: disable=unused-import
 from fd_device.database.device import Device  # noqa: F401
 from fd_device.database.system import Hardware  # noqa: F401
+from fd_device.grainbin.rollup import (
+    get_history_status,
+    prune_readings,
+    prune_rollups,
+    update_rollups,
+)
+from fd_device.grainbin.sensor_identity import clear_sensor_identities
+from fd_device.outbox import get_outbox_status
 from fd_device.settings import get_config
 
 
@@ -103,3 +111,55 @@ def database_upgrade(revision):
     alembic_cnf.set_main_option("script_location", config.PROJECT_ROOT + "/migrations")
 
     al_command.upgrade(alembic_cnf, revision)
+
+
+@database.command("clear_sensor_identities")
+def clear_sensor_identities_command():
+    """Forget the stored cable and position of every grainbin sensor.
+
+    They are read from the sensors again the next time the grainbin
+    topology is discovered. Use this after reprogramming sensors.
+    """
+
+    click.echo("clearing grainbin sensor identities")
+    clear_sensor_identities()
+    click.echo("done")
+
+
+@database.command("rollup")
+@click.option(
+    "--prune/--no-prune",
+    default=True,
+    help="Delete the readings and hourly rollups older than their retention",
+)
+@click.option(
+    "--retention-days",
+    default=None,
+    type=int,
+    help="Keep readings for this many days instead of GRAINBIN_READING_RETENTION_DAYS",
+)
+def rollup(prune, retention_days):
+    """Add new grainbin readings to the hourly and daily rollups."""
+
+    click.echo("updating grainbin reading rollups")
+    click.echo(f"rolled up {update_rollups()} readings")
+    if prune:
+        click.echo(f"deleted {prune_readings(days=retention_days)} old readings")
+        click.echo(f"deleted {prune_rollups()} old hourly rollups")
+    click.echo("done")
+
+
+@database.command("rollup_status")
+def rollup_status():
+    """Show the size and range of the grainbin readings and rollups."""
+
+    for key, value in get_history_status().items():
+        click.echo(f"{key}: {value}")
+
+
+@database.command("outbox_status")
+def outbox_status():
+    """Show the number and age of the updates waiting in the outbox."""
+
+    for key, value in get_outbox_status().items():
+        click.echo(f"{key}: {value}")
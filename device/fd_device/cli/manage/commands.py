@@ -1,7 +1,11 @@
 """Click commands for starting the app."""
 
+import sys
+
 import click
 
+from fd_device.broker import check_broker
+from fd_device.celery_runner import app
 from fd_device.main import main
 
 
@@ -10,3 +14,14 @@ def run():
     """Run the server."""
     click.echo("Starting server.")
     main()
+
+
+@click.command("broker_status")
+def broker_status():
+    """Check the connection to the broker. Exits with 1 if it can not be reached."""
+
+    health = check_broker(app)
+    for key, value in health._asdict().items():
+        click.echo(f"{key}: {value}")
+    if not health.connected:
+        sys.exit(1)
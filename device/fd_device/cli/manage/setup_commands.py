@@ -7,8 +7,10 @@ from sqlalchemy.orm.exc import NoResultFound
 
 from fd_device.database.database import get_session
 from fd_device.database.device import Device, Grainbin
+from fd_device.database.metadata import METADATA
 from fd_device.database.system import Hardware, Software, SystemSetup
 from fd_device.device.temperature import get_connected_sensors
+from fd_device.grainbin.rollup import delete_reading_history
 from fd_device.network.ethernet import get_interfaces
 from fd_device.network.wifi import set_interfaces
 from fd_device.system.control import (
@@ -170,8 +172,9 @@ def initialize_device():
     device.exterior_sensor = hd.exterior_sensor
 
     # check if grainbins already exisit (running setup again)
-    # and remove them if they are present
+    # and remove them if they are present, with their reading history
     if len(device.grainbins) > 0:
+        delete_reading_history([grainbin.id for grainbin in device.grainbins], session)
         for grainbin in device.grainbins:
             session.delete(grainbin)
         device.grainbin_count = 0
@@ -184,6 +187,7 @@ def initialize_device():
 
     session.commit()
     session.close()
+    METADATA.invalidate()
     return
 
 
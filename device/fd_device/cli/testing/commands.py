@@ -8,6 +8,16 @@ from typing import List
 
 import click
 
+from fd_device.grainbin.owserver import OwserverClient
+from fd_device.grainbin.simulator import (
+    ReplayOwfs,
+    SimulatedOwfs,
+    SimulatedOwhttpd,
+    SimulatedOwserver,
+    record_owfs,
+    save_recording,
+    start_in_thread,
+)
 from fd_device.settings import get_config
 
 config = get_config()  # pylint: disable=invalid-name
@@ -177,3 +187,91 @@ def lint(fix_imports, check):
     execute_tool("Checking code style", "flake8")
     execute_tool("Checking for code errors", "pylint", *pylint_args)
     execute_tool("Checking static types", "mypy", *mypy_args)
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", help="The address to listen on")
+@click.option("--http-port", default=2121, help="The owhttpd port, 0 to disable")
+@click.option("--server-port", default=4304, help="The owserver port, 0 to disable")
+@click.option("-b", "--busses", default=2, help="The number of simulated busses")
+@click.option("-s", "--sensors", default=3, help="The number of sensors per bus")
+@click.option(
+    "--conversion-time",
+    default=0.0,
+    help="Seconds a temperature conversion takes",
+)
+@click.option("--latency", default=0.0, help="Seconds added to every request")
+@click.option(
+    "--error-rate", default=0.0, help="The fraction of requests that fail (0 to 1)"
+)
+@click.option(
+    "-r",
+    "--replay",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Replay a recording made with owfs-record instead of generating sensors",
+)
+@click.option("--seed", default=None, type=int, help="Seed the random generator")
+def owfs_simulator(
+    host,
+    http_port,
+    server_port,
+    busses,
+    sensors,
+    conversion_time,
+    latency,
+    error_rate,
+    replay,
+    seed,
+):  # pylint: disable=too-many-arguments
+    """Run simulated owhttpd and owserver servers."""
+
+    if replay:
+        model = ReplayOwfs.from_file(
+            replay, latency=latency, error_rate=error_rate, seed=seed
+        )
+    else:
+        model = SimulatedOwfs(
+            bus_count=busses,
+            sensors_per_bus=sensors,
+            conversion_time=conversion_time,
+            latency=latency,
+            error_rate=error_rate,
+            seed=seed,
+        )
+
+    servers = []
+    if http_port:
+        servers.append(SimulatedOwhttpd(model, host, http_port))
+        click.echo(f"owhttpd listening on {host}:{http_port}")
+    if server_port:
+        servers.append(SimulatedOwserver(model, host, server_port))
+        click.echo(f"owserver listening on {host}:{server_port}")
+    for server in servers[1:]:
+        start_in_thread(server)
+
+    try:
+        if servers:
+            servers[0].serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+
+@click.command()
+@click.option("--host", default=config.OWFS_HOST, help="The owserver host")
+@click.option("--port", default=config.OWFS_SERVER_PORT, help="The owserver port")
+@click.argument("filename", type=click.Path(dir_okay=False, writable=True))
+def owfs_record(host, port, filename):
+    """Record the busses and sensors of a real owserver to FILENAME."""
+
+    with OwserverClient(host, port) as client:
+        recording = record_owfs(client)
+    save_recording(recording, filename)
+    click.echo(
+        f"Recorded {len(recording['dir'])} directories and "
+        f"{len(recording['read'])} values to {filename}"
+    )
@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 """Database module, including the SQLAlchemy database object and DB-related utilities."""
-from sqlalchemy import ForeignKey, String, create_engine
+import os
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy import ForeignKey, String, create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
@@ -12,30 +17,127 @@ from sqlalchemy.orm.session import Session
 from typing_extensions import Annotated
 
 from ..settings import get_config
+from .instrumentation import instrument_engine
 
 config = get_config()  # pylint: disable=invalid-name
-engine = create_engine(config.SQLALCHEMY_DATABASE_URI)
-db_session = scoped_session(sessionmaker(bind=engine))
+
+# the engine is created on first use by get_engine so that it is never
+# shared with a process forked before then
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+db_session = scoped_session(sessionmaker())
+# called with the model class when a record is saved or deleted through CRUDMixin
+_model_change_listeners: list[Callable[[type], None]] = []
 
 # special types for SQLAlchemy Base class below
 str20 = Annotated[str, 20]  # pylint: disable=invalid-name
 str7 = Annotated[str, 7]  # pylint: disable=invalid-name
 
 
+def get_engine() -> Engine:
+    """Return the sqlalchemy engine, creating it on first use.
+
+    The connection pool is configured from the SQLALCHEMY_POOL_* settings.
+    """
+
+    global _engine  # pylint: disable=global-statement
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(
+                    config.SQLALCHEMY_DATABASE_URI,
+                    pool_size=config.SQLALCHEMY_POOL_SIZE,
+                    max_overflow=config.SQLALCHEMY_MAX_OVERFLOW,
+                    pool_pre_ping=config.SQLALCHEMY_POOL_PRE_PING,
+                    pool_recycle=config.SQLALCHEMY_POOL_RECYCLE,
+                )
+                if _engine.dialect.name == "sqlite":
+                    event.listen(_engine, "connect", _configure_sqlite_connection)
+                instrument_engine(_engine)
+                db_session.configure(bind=_engine)
+    return _engine
+
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """Tune each new SQLite connection for the device.
+
+    WAL mode lets the scheduler and the command line read while another
+    process writes, and the busy timeout makes a writer wait for the lock
+    instead of failing straight away.
+    """
+
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT)}")
+    cursor.close()
+
+
+def dispose_engine(close: bool = True):
+    """Discard the pooled connections of the engine.
+
+    Args:
+        close (bool): close the connections. A forked child passes False so
+            the connections it inherited stay open for the parent process.
+    """
+
+    if _engine is not None:
+        _engine.dispose(close=close)
+
+
 def get_session() -> Session:
     """Return the sqlalchemy db_session."""
 
+    get_engine()
     return db_session()
 
 
+def remove_session():
+    """Close the session of the current scope and return its connection to the pool."""
+
+    db_session.remove()
+
+
+def _after_fork_in_child():
+    """Drop the session and pooled connections inherited from the parent process."""
+
+    # the inherited session must not be closed as it would roll back the
+    # parent's transaction on the shared socket
+    db_session.registry.clear()
+    dispose_engine(close=False)
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def on_model_change(listener: Callable[[type], None]) -> Callable[[type], None]:
+    """Register a function that is called when a record is saved or deleted.
+
+    The function is called with the model class of the record. It can be
+    used as a decorator.
+    """
+
+    _model_change_listeners.append(listener)
+    return listener
+
+
+def _notify_model_change(model: type):
+    """Call the model change listeners."""
+
+    for listener in _model_change_listeners:
+        listener(model)
+
+
 def create_all_tables():
     """Create all tables."""
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
 
 
 def drop_all_tables():
     """Drop all tables."""
-    Base.metadata.drop_all(bind=engine)
+    Base.metadata.drop_all(bind=get_engine())
 
 
 class Base(DeclarativeBase):  # pylint: disable=too-few-public-methods
@@ -64,15 +166,20 @@ class CRUDMixin:
 
     def save(self, commit=True):
         """Save the record."""
-        db_session.add(self)
+        session = get_session()
+        session.add(self)
         if commit:
-            db_session.commit()
+            session.commit()
+        _notify_model_change(type(self))
         return self
 
     def delete(self, commit=True):
         """Remove the record from the database."""
-        db_session.delete(self)
-        return commit and db_session.commit()
+        session = get_session()
+        session.delete(self)
+        result = commit and session.commit()
+        _notify_model_change(type(self))
+        return result
 
 
 class Model(CRUDMixin, Base):
@@ -100,7 +207,7 @@ class SurrogatePK(Model):  # pylint: disable=too-few-public-methods
                 isinstance(record_id, (int, float)),
             ),
         ):
-            return db_session.get(cls, int(record_id))
+            return get_session().get(cls, int(record_id))
         return None
 
 
@@ -1,8 +1,8 @@
 """The device models for the database."""
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, List, Optional
 
-from sqlalchemy import String
+from sqlalchemy import Index, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -34,7 +34,7 @@ class Grainbin(SurrogatePK):
     last_updated: Mapped[datetime] = mapped_column(
         default=func.now(), onupdate=func.now()
     )
-    average_temp: Mapped[str7]
+    average_temp: Mapped[Optional[float]]
 
     device_id: Mapped[int] = reference_col("device")
     device: Mapped["Device"] = relationship("Device", back_populates="grainbins")
@@ -45,13 +45,147 @@ class Grainbin(SurrogatePK):
         self.bus_number = bus_number
         self.bus_number_string = f"bus.{bus_number}"
         self.device_id = device_id
-        self.average_temp = "unknown"
+        self.average_temp = None
 
     def __repr__(self):
         """Represent the grainbin in a useful format."""
         return f"<Grainbin name={self.name}"
 
 
+class GrainbinSensor(SurrogatePK):
+    """Represent the static identity of a grainbin temperature sensor.
+
+    The temphigh and templow EEPROM fields of each sensor are programmed
+    with the cable number and the position of the sensor on the cable.
+    """
+
+    __tablename__ = "grainbin_sensor"
+    sensor_name: Mapped[str20] = mapped_column(unique=True)
+    temphigh: Mapped[Optional[str7]]
+    templow: Mapped[Optional[str7]]
+    last_updated: Mapped[datetime] = mapped_column(
+        default=func.now(), onupdate=func.now()
+    )
+
+    def __init__(self, sensor_name: str, temphigh=None, templow=None):
+        """Create the GrainbinSensor object."""
+        self.sensor_name = sensor_name
+        self.temphigh = temphigh
+        self.templow = templow
+
+    def __repr__(self):
+        """Represent the grainbin sensor in a useful format."""
+        return f"<GrainbinSensor sensor_name={self.sensor_name}>"
+
+
+class GrainbinReading(SurrogatePK):
+    """Represent a single temperature reading of a grainbin sensor.
+
+    Rows are written in batches by fd_device.grainbin.readings.
+    """
+
+    __tablename__ = "grainbin_reading"
+    __table_args__: Any = (
+        Index("ix_grainbin_reading_sensor_name_timestamp", "sensor_name", "timestamp"),
+        Index("ix_grainbin_reading_grainbin_id_timestamp", "grainbin_id", "timestamp"),
+        {"extend_existing": True},
+    )
+    timestamp: Mapped[datetime]
+    grainbin_id: Mapped[int] = reference_col("grainbin")
+    sensor_name: Mapped[str20]
+    # the temphigh and templow values of the sensor
+    cable: Mapped[Optional[int]]
+    position: Mapped[Optional[int]]
+    temperature: Mapped[Optional[float]]
+
+    def __repr__(self):
+        """Represent the grainbin reading in a useful format."""
+        return f"<GrainbinReading sensor_name={self.sensor_name} timestamp={self.timestamp}>"
+
+
+class GrainbinReadingRollup(SurrogatePK):
+    """Represent the summary of the grainbin readings of an hour or a day.
+
+    A rollup with a sensor_name summarizes one sensor. A rollup without a
+    sensor_name summarizes every sensor of the grainbin.
+    """
+
+    __tablename__ = "grainbin_reading_rollup"
+    __table_args__: Any = (
+        Index(
+            "ix_grainbin_reading_rollup_period_start",
+            "period",
+            "period_start",
+            "grainbin_id",
+        ),
+        {"extend_existing": True},
+    )
+    # 'hour' or 'day'
+    period: Mapped[str7]
+    period_start: Mapped[datetime]
+    grainbin_id: Mapped[int] = reference_col("grainbin")
+    sensor_name: Mapped[Optional[str20]]
+    min_temp: Mapped[float]
+    max_temp: Mapped[float]
+    mean_temp: Mapped[float]
+    count: Mapped[int]
+
+    def __repr__(self):
+        """Represent the grainbin reading rollup in a useful format."""
+        return (
+            f"<GrainbinReadingRollup period={self.period} "
+            f"period_start={self.period_start} sensor_name={self.sensor_name}>"
+        )
+
+
+class RollupState(SurrogatePK):
+    """Represent how far the rollups of a table have been processed."""
+
+    __tablename__ = "rollup_state"
+    name: Mapped[str20] = mapped_column(unique=True)
+    # the id of the last row included in the rollups
+    last_id: Mapped[int] = mapped_column(default=0)
+    last_updated: Mapped[datetime] = mapped_column(
+        default=func.now(), onupdate=func.now()
+    )
+
+    def __init__(self, name: str):
+        """Create the RollupState object."""
+        self.name = name
+        self.last_id = 0
+
+    def __repr__(self):
+        """Represent the rollup state in a useful format."""
+        return f"<RollupState name={self.name} last_id={self.last_id}>"
+
+
+class OutboxMessage(SurrogatePK):
+    """Represent an update that could not be sent to the server yet.
+
+    The payload is kept as json and sent again by fd_device.outbox.
+    """
+
+    __tablename__ = "outbox_message"
+    created_at: Mapped[datetime] = mapped_column(default=func.now())
+    task_name: Mapped[str] = mapped_column(String(50))
+    payload: Mapped[str] = mapped_column(Text)
+    # how many times sending it again has failed
+    attempts: Mapped[int] = mapped_column(default=0)
+    last_attempt: Mapped[Optional[datetime]]
+
+    def __init__(self, task_name: str, payload: str):
+        """Create the OutboxMessage object."""
+        self.task_name = task_name
+        self.payload = payload
+        self.attempts = 0
+
+    def __repr__(self):
+        """Represent the outbox message in a useful format."""
+        return (
+            f"<OutboxMessage task_name={self.task_name} created_at={self.created_at}>"
+        )
+
+
 class Device(SurrogatePK):
     """Represent the Device."""
 
@@ -66,8 +200,8 @@ class Device(SurrogatePK):
 
     interior_sensor: Mapped[Optional[str20]]
     exterior_sensor: Mapped[Optional[str20]]
-    interior_temp: Mapped[Optional[str7]]
-    exterior_temp: Mapped[Optional[str7]]
+    interior_temp: Mapped[Optional[float]]
+    exterior_temp: Mapped[Optional[float]]
 
     # grainbin related data
     grainbin_count: Mapped[int] = mapped_column(default=0)
@@ -0,0 +1,177 @@
+"""Count the SQL queries of each scheduled job.
+
+Engine event hooks add every statement executed while a job is tracked to
+the statistics of that job. When the job finishes the statistics are
+logged as one structured line and kept in the QUERY_STATS registry.
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from fd_device.settings import get_config
+
+LOGGER = logging.getLogger("fd.database.instrumentation")
+CONFIG = get_config()
+
+# the longest statement text that is kept for the slowest query
+MAX_STATEMENT_LENGTH = 500
+
+_current_stats: contextvars.ContextVar[Optional["QueryStats"]] = contextvars.ContextVar(
+    "fd_query_stats", default=None
+)
+
+
+class QueryStats:
+    """The queries executed by one run of a job."""
+
+    def __init__(self, job: str):
+        """Create the QueryStats object."""
+
+        self.job = job
+        self.started_at = datetime.now()
+        self.duration = 0.0
+        self.query_count = 0
+        # rows returned or changed, as far as the driver reports them
+        self.row_count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def add_query(self, statement: str, elapsed: float, rows: int):
+        """Add an executed statement to the statistics."""
+
+        self.query_count += 1
+        self.total_time += elapsed
+        if rows > 0:
+            self.row_count += rows
+        if elapsed >= self.max_time:
+            self.max_time = elapsed
+            self.slowest_statement = " ".join(statement.split())[:MAX_STATEMENT_LENGTH]
+
+    def as_dict(self) -> dict:
+        """Return the statistics as a dictionary."""
+
+        return {
+            "job": self.job,
+            "started_at": self.started_at.isoformat(),
+            "duration": round(self.duration, 6),
+            "query_count": self.query_count,
+            "row_count": self.row_count,
+            "total_time": round(self.total_time, 6),
+            "max_time": round(self.max_time, 6),
+            "slowest_statement": self.slowest_statement,
+        }
+
+
+class QueryStatsRegistry:
+    """Keep the latest and the accumulated query statistics of every job."""
+
+    def __init__(self):
+        """Create the QueryStatsRegistry object."""
+
+        self._lock = threading.Lock()
+        self._latest: dict[str, QueryStats] = {}
+        self._totals: dict[str, dict] = {}
+
+    def record(self, stats: QueryStats):
+        """Store the statistics of a finished job run."""
+
+        with self._lock:
+            self._latest[stats.job] = stats
+            totals = self._totals.setdefault(
+                stats.job,
+                {"runs": 0, "query_count": 0, "row_count": 0, "total_time": 0.0},
+            )
+            totals["runs"] += 1
+            totals["query_count"] += stats.query_count
+            totals["row_count"] += stats.row_count
+            totals["total_time"] += stats.total_time
+
+    def get(self, job: str) -> Optional[QueryStats]:
+        """Return the statistics of the latest run of a job."""
+
+        with self._lock:
+            return self._latest.get(job)
+
+    def snapshot(self) -> dict:
+        """Return the latest run and the totals of every job."""
+
+        with self._lock:
+            return {
+                job: {"latest": stats.as_dict(), "totals": dict(self._totals[job])}
+                for job, stats in self._latest.items()
+            }
+
+    def clear(self):
+        """Forget all statistics."""
+
+        with self._lock:
+            self._latest.clear()
+            self._totals.clear()
+
+
+QUERY_STATS = QueryStatsRegistry()
+
+
+@contextmanager
+def track_queries(job: str) -> Iterator[QueryStats]:
+    """Attribute the queries executed in the block to a job.
+
+    The statistics are logged and recorded in QUERY_STATS when the block
+    exits, even if it raises.
+    """
+
+    stats = QueryStats(job)
+    token = _current_stats.set(stats)
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.duration = time.perf_counter() - start
+        _current_stats.reset(token)
+        QUERY_STATS.record(stats)
+        LOGGER.info(f"query_stats {json.dumps(stats.as_dict())}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Remember when the statement started."""
+
+    if _current_stats.get() is not None:
+        conn.info.setdefault("fd_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Add the statement to the statistics of the current job."""
+
+    stats = _current_stats.get()
+    starts = conn.info.get("fd_query_start")
+    if stats is None or not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats.add_query(statement, elapsed, cursor.rowcount or 0)
+
+
+def _handle_error(exception_context):
+    """Drop the start time of a statement that failed."""
+
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("fd_query_start"):
+        connection.info["fd_query_start"].pop()
+
+
+def instrument_engine(engine: Engine):
+    """Add the query statistics hooks to an engine."""
+
+    if not CONFIG.DATABASE_QUERY_STATS:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,157 @@
+"""In-process cache of the device, grainbin and connection metadata.
+
+These rows only change during setup, so the update builders read them from
+memory and only touch the database to write. The cache is invalidated when
+a cached model is saved or deleted through the CRUDMixin and by the setup
+commands. Other processes see a change after METADATA_CACHE_TTL.
+"""
+import logging
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm.session import Session
+
+from fd_device.database.database import get_session, on_model_change
+from fd_device.database.device import Connection, Device, Grainbin
+from fd_device.settings import get_config
+
+LOGGER = logging.getLogger("fd.database.metadata")
+CONFIG = get_config()
+
+# the models whose rows are held in the cache
+CACHED_MODELS = (Connection, Device, Grainbin)
+
+
+class DeviceMetadata(NamedTuple):
+    """The setup values of the device."""
+
+    id: int
+    device_id: str
+    hardware_version: Optional[str]
+    software_version: Optional[str]
+    interior_sensor: Optional[str]
+    exterior_sensor: Optional[str]
+    grainbin_count: int
+
+
+class GrainbinMetadata(NamedTuple):
+    """The setup values of a grainbin."""
+
+    id: int
+    name: str
+    bus_number: int
+    bus_number_string: Optional[str]
+
+
+class MetadataCache:
+    """Read-through cache of the device, grainbin and connection rows.
+
+    All rows are loaded together on first use and kept until invalidate is
+    called or they are older than the ttl.
+    """
+
+    def __init__(
+        self, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic
+    ):
+        """Create the MetadataCache object."""
+
+        self.ttl = CONFIG.METADATA_CACHE_TTL if ttl is None else ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._device: Optional[DeviceMetadata] = None
+        self._grainbins: list[GrainbinMetadata] = []
+        self._connection_address: Optional[str] = None
+        self._loaded_at: Optional[float] = None
+
+    def invalidate(self):
+        """Load the rows from the database again on next use."""
+
+        with self._lock:
+            self._loaded_at = None
+
+    def is_stale(self) -> bool:
+        """Return True if the rows need to be loaded again."""
+
+        if self._loaded_at is None:
+            return True
+        return self._clock() - self._loaded_at > self.ttl
+
+    def get_device(self, session: Optional[Session] = None) -> Optional[DeviceMetadata]:
+        """Return the device, or None if it has not been set up."""
+
+        self._load(session)
+        return self._device
+
+    def get_grainbins(
+        self, session: Optional[Session] = None
+    ) -> list[GrainbinMetadata]:
+        """Return the grainbins ordered by id."""
+
+        self._load(session)
+        return list(self._grainbins)
+
+    def get_connection_address(
+        self, session: Optional[Session] = None
+    ) -> Optional[str]:
+        """Return the address of the server, or None if it is not known."""
+
+        self._load(session)
+        return self._connection_address
+
+    def _load(self, session: Optional[Session] = None):
+        """Load every cached row if the cache is stale."""
+
+        with self._lock:
+            if not self.is_stale():
+                return
+
+            close_session = False
+            if not session:
+                close_session = True
+                session = get_session()
+
+            device = session.scalars(select(Device).limit(1)).first()
+            self._device = (
+                None
+                if device is None
+                else DeviceMetadata(
+                    id=device.id,
+                    device_id=device.device_id,
+                    hardware_version=device.hardware_version,
+                    software_version=device.software_version,
+                    interior_sensor=device.interior_sensor,
+                    exterior_sensor=device.exterior_sensor,
+                    grainbin_count=device.grainbin_count,
+                )
+            )
+            self._grainbins = [
+                GrainbinMetadata(
+                    id=grainbin.id,
+                    name=grainbin.name,
+                    bus_number=grainbin.bus_number,
+                    bus_number_string=grainbin.bus_number_string,
+                )
+                for grainbin in session.scalars(select(Grainbin).order_by(Grainbin.id))
+            ]
+            self._connection_address = session.scalar(
+                select(Connection.address).limit(1)
+            )
+            self._loaded_at = self._clock()
+            LOGGER.debug(f"Loaded the metadata of {len(self._grainbins)} grainbins")
+
+            if close_session:
+                session.close()
+
+
+METADATA = MetadataCache()
+
+
+@on_model_change
+def _invalidate_metadata(model: type):
+    """Invalidate the cache when a cached model is saved or deleted."""
+
+    if issubclass(model, CACHED_MODELS):
+        METADATA.invalidate()
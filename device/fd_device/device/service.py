@@ -8,8 +8,7 @@ import pika
 from fd_device.celery_runner import app
 from fd_device.controller.connection import Connection, Message
 from fd_device.database.database import get_session
-from fd_device.database.device import Connection as db_Connection
-from fd_device.database.device import Device
+from fd_device.database.metadata import METADATA
 from fd_device.device.update import get_device_info
 
 LOGGER = logging.getLogger("fd.device.service")
@@ -27,7 +26,7 @@ class DeviceConnection(Connection):
         self.SERVER_MESSAGES = None
 
         self._session = get_session()
-        self._host = self._session.query(db_Connection.address).scalar()
+        self._host = METADATA.get_connection_address(self._session)
 
     def on_channel_open(self, channel):
         """Overwrite the on_channel_open method.
@@ -135,7 +134,8 @@ class HeartbeatMessage(Message):
         self._corr_id = None
         self._timeouts_missed = 0
         self._session = session
-        self.device_id = self._session.query(Device.device_id).scalar()
+        device = METADATA.get_device(self._session)
+        self.device_id = None if device is None else device.device_id
 
         # communication parameters
         self.exchange_name = "heartbeat_messages"
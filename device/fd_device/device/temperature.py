@@ -1,4 +1,80 @@
 """Module to interface with the temperature sensors connected directly to the device."""
+import datetime
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Callable, NamedTuple, Optional
+
+from fd_device.settings import get_config
+
+LOGGER = logging.getLogger("fd.device.temperature")
+CONFIG = get_config()
+
+W1_DEVICES_DIR = "/sys/bus/w1/devices"
+W1_MASTER_DIR = f"{W1_DEVICES_DIR}/w1_bus_master1"
+# the time a DS18B20 takes to convert a temperature at each resolution. In seconds
+CONVERSION_TIMES = {9: 0.094, 10: 0.188, 11: 0.375, 12: 0.75}
+DEFAULT_RESOLUTION = 12
+# how often therm_bulk_read is checked once a conversion should have finished
+BULK_READ_POLL_INTERVAL = 0.01
+
+
+class SensorMembership:
+    """Cache of the sensors listed in w1_master_slaves.
+
+    The list is read again when the modification time of w1_master_slaves
+    changes, when it is older than ttl seconds, or after invalidate. The
+    ttl is needed because sysfs does not always update modification times.
+    """
+
+    def __init__(
+        self, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic
+    ):
+        """Create the SensorMembership object."""
+
+        self.ttl = CONFIG.DEVICE_SENSOR_MEMBERSHIP_TTL if ttl is None else ttl
+        self._clock = clock
+        self._sensors: Optional[list[str]] = None
+        self._loaded_at = 0.0
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Read the list again the next time it is needed."""
+        self._sensors = None
+
+    def refresh(self) -> list[str]:
+        """Read the list of connected sensors and return it."""
+
+        mtime = self._get_mtime()
+        sensors = _get_sensors()
+        with self._lock:
+            self._sensors = sensors
+            self._mtime = mtime
+            self._loaded_at = self._clock()
+        return list(sensors)
+
+    def get(self) -> list[str]:
+        """Return the connected sensors, reading the list again if it changed."""
+
+        with self._lock:
+            sensors = self._sensors
+            fresh = sensors is not None and self._clock() - self._loaded_at <= self.ttl
+            mtime = self._mtime
+        if fresh and self._get_mtime() == mtime:
+            return list(sensors)  # type: ignore[arg-type]
+        return self.refresh()
+
+    @staticmethod
+    def _get_mtime() -> Optional[float]:
+        """Return the modification time of w1_master_slaves, if it exists."""
+        try:
+            return os.stat(f"{W1_MASTER_DIR}/w1_master_slaves").st_mtime
+        except OSError:
+            return None
 
 
 def temperature(sensor_name, sample_number=3, percision=2):
@@ -6,10 +82,40 @@ def temperature(sensor_name, sample_number=3, percision=2):
 
     temp_values = []
     for _ in range(sample_number):
-        temp = _read_temperature(sensor_name)
-        if temp != "U":
-            temp_values.append(temp)
+        temp_values.append(_read_temperature(sensor_name))
+
+    return _average(temp_values, percision)
+
+
+def read_many(names: list[str], converted: bool = False) -> dict:
+    """Read the temperature of each sensor once.
+
+    Whether the sensors are connected is checked once for the whole batch.
+
+    Args:
+        names (list[str]): the sensor names
+        converted (bool, optional, default = False): read the value of the
+        last bulk conversion instead of converting each sensor.
+
+    Returns:
+        dict: the temperature of each sensor, or 'U' if it could not be read
+    """
+
+    connected = MEMBERSHIP.get()
+    read = _read_converted_temperature if converted else _read_w1_slave
+
+    values = {}
+    for name in names:
+        values[name] = read(name) if name in connected else "U"
+        if name in connected and values[name] == "U":
+            MEMBERSHIP.invalidate()
+    return values
 
+
+def _average(temp_values: list, percision=2):
+    """Average the valid temperatures, or return 'U' if there are none."""
+
+    temp_values = [temp for temp in temp_values if temp != "U"]
     if len(temp_values) > 0:
         return round(sum(temp_values) / len(temp_values), percision)
 
@@ -19,7 +125,7 @@ def temperature(sensor_name, sample_number=3, percision=2):
 def _get_sensors() -> list:
     """Get a list of sensors currently connected to the device."""
 
-    w1_master_devices = "/sys/bus/w1/devices/w1_bus_master1/w1_master_slaves"
+    w1_master_devices = f"{W1_MASTER_DIR}/w1_master_slaves"
     with open(w1_master_devices) as f:
         content = [line.rstrip("\n") for line in f]
 
@@ -29,39 +135,344 @@ def _get_sensors() -> list:
 def _read_temperature(name):
     """Low level read the temperatures of a sensor."""
 
-    if name in _get_sensors():
+    if name in MEMBERSHIP.get():
         # sensor is connected
-        sensor_file = "/sys/bus/w1/devices/" + name + "/w1_slave"
-        try:
-            with open(sensor_file) as f:
-                lines = f.readlines()
+        temp_c = _read_w1_slave(name)
+        if temp_c == "U":
+            # the sensor may have been removed
+            MEMBERSHIP.invalidate()
+        return temp_c
+
+    # problem reading sensor
+    return "U"
 
-            temp_output = lines[1].find("t=")
-            if temp_output != -1:
-                temp_string = lines[1].strip()[temp_output + 2 :]
-                temp_c = float(temp_string) / 1000.0
-                return temp_c
 
-        except IOError:
-            return "U"
+def _read_w1_slave(name):
+    """Convert and read the temperature of a sensor from w1_slave."""
+
+    sensor_file = f"{W1_DEVICES_DIR}/{name}/w1_slave"
+    try:
+        with open(sensor_file) as f:
+            lines = f.readlines()
+
+        temp_output = lines[1].find("t=")
+        if temp_output != -1:
+            temp_string = lines[1].strip()[temp_output + 2 :]
+            temp_c = float(temp_string) / 1000.0
+            return temp_c
+
+    except IOError:
+        return "U"
 
     # problem reading sensor
     return "U"
 
 
+def _read_converted_temperature(name):
+    """Read the temperature of the last conversion of a sensor.
+
+    After a bulk conversion the w1_therm 'temperature' attribute returns the
+    converted value without starting a new conversion.
+    """
+
+    try:
+        with open(f"{W1_DEVICES_DIR}/{name}/temperature") as f:
+            return float(f.read().strip()) / 1000.0
+    except (IOError, ValueError):
+        return "U"
+
+
+def set_resolution(name: str, resolution: int) -> bool:
+    """Set the conversion resolution of a sensor, from 9 to 12 bits.
+
+    Returns:
+        bool: True if the resolution was set
+    """
+
+    try:
+        with open(f"{W1_DEVICES_DIR}/{name}/resolution", "w") as f:
+            f.write(f"{resolution}\n")
+    except IOError as error:
+        LOGGER.warning(f"Could not set the resolution of sensor {name}: {error}")
+        return False
+    return True
+
+
+def bulk_convert(resolution: int = DEFAULT_RESOLUTION) -> bool:
+    """Convert the temperature of every sensor on the bus at the same time.
+
+    The kernel w1_therm 'therm_bulk_read' attribute of the bus master
+    starts the conversion. It reads -1 while any sensor is still converting.
+
+    Args:
+        resolution (int, optional): the highest resolution of the sensors on
+        the bus, which sets how long to wait. Defaults to 12 bits.
+
+    Returns:
+        bool: True if the converted values are ready to be read
+    """
+
+    bulk_read_file = f"{W1_MASTER_DIR}/therm_bulk_read"
+    conversion_time = CONVERSION_TIMES[resolution]
+    try:
+        with open(bulk_read_file, "w") as f:
+            f.write("trigger\n")
+
+        time.sleep(conversion_time)
+        deadline = time.monotonic() + conversion_time
+        while True:
+            with open(bulk_read_file) as f:
+                if f.read().strip() != "-1":
+                    return True
+            if time.monotonic() > deadline:
+                LOGGER.warning("Bulk temperature conversion did not finish in time")
+                return False
+            time.sleep(BULK_READ_POLL_INTERVAL)
+    except IOError as error:
+        LOGGER.debug(f"Bulk temperature conversion is not available: {error}")
+        return False
+
+
+def get_role_resolution(role: Optional[str]) -> Optional[int]:
+    """Return the configured resolution of a sensor role, or None to leave it."""
+    if role is None:
+        return None
+    return getattr(CONFIG, f"DEVICE_{role.upper()}_SENSOR_RESOLUTION", None)
+
+
+def get_role_samples(role: Optional[str]) -> Optional[int]:
+    """Return the configured number of samples averaged for a sensor role."""
+    if role is None:
+        return None
+    return getattr(CONFIG, f"DEVICE_{role.upper()}_SENSOR_SAMPLES", None)
+
+
 def get_connected_sensors(values=False) -> list[dict]:
     """Return all of the sensores connected to the device."""
 
     connected_sensors: list[dict] = []
 
-    for sensor in _get_sensors():
+    sensors = MEMBERSHIP.refresh()
+    samples = [read_many(sensors) for _ in range(2)] if values else []
+
+    for sensor in sensors:
         sensor_info = {"name": sensor}
         if values:
-            sensor_info["temperature"] = temperature(sensor, sample_number=2)
+            sensor_info["temperature"] = _average(
+                [sample[sensor] for sample in samples]
+            )
         connected_sensors.append(sensor_info)
 
     return connected_sensors
 
 
+class SensorReading(NamedTuple):
+    """A smoothed temperature of a sensor."""
+
+    # the average of the latest samples, or None if there are none
+    temperature: Optional[float]
+    # when the latest sample was taken, or None if there are none
+    timestamp: Optional[datetime.datetime]
+    # how many samples were averaged
+    sample_count: int
+
+
+class TemperatureSampler:
+    """Sample sensors continuously in a background thread.
+
+    Each watched sensor is read once every interval seconds and the valid
+    samples are kept in a ring buffer of buffer_size samples. A reading is
+    the average of the latest smoothing samples that are not older than
+    max_age seconds, so it can be returned without reading the sensor.
+
+    Sensors are watched by role, for example 'interior'. The resolution and
+    number of samples averaged of each role can be configured with
+    DEVICE_<ROLE>_SENSOR_RESOLUTION and DEVICE_<ROLE>_SENSOR_SAMPLES. If
+    bulk_read is True every sensor is converted at the same time.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        buffer_size: Optional[int] = None,
+        smoothing: Optional[int] = None,
+        max_age: Optional[float] = None,
+        bulk_read: Optional[bool] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """Create the TemperatureSampler object."""
+
+        self.interval = (
+            CONFIG.DEVICE_SENSOR_SAMPLE_INTERVAL if interval is None else interval
+        )
+        self.buffer_size = (
+            CONFIG.DEVICE_SENSOR_BUFFER_SIZE if buffer_size is None else buffer_size
+        )
+        self.smoothing = (
+            CONFIG.DEVICE_SENSOR_SMOOTHING_SAMPLES if smoothing is None else smoothing
+        )
+        self.max_age = CONFIG.DEVICE_SENSOR_MAX_AGE if max_age is None else max_age
+        self.bulk_read = (
+            CONFIG.DEVICE_SENSOR_BULK_READ if bulk_read is None else bulk_read
+        )
+        self._clock = clock
+
+        # sensor name -> deque of (timestamp, temperature)
+        self.samples: dict[str, deque] = {}
+        # sensor name -> role
+        self.roles: dict[str, str] = {}
+        # sensor name -> resolution set on the sensor
+        self.resolutions: dict[str, int] = {}
+        self._sampled: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        """Return True if the sampling thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def watch(self, **sensors_by_role: Optional[str]):
+        """Sample the given sensors and start the sampling thread if needed.
+
+        The sensors are given by role, eg. watch(interior="28-0001").
+        Roles without a sensor are ignored, and a sensor given for several
+        roles is watched once with the first role. Sensors that are no
+        longer given are dropped. The configured resolution of a role is
+        set when its sensor is first watched.
+        """
+
+        roles: dict[str, str] = {}
+        for role, name in sensors_by_role.items():
+            if name is not None:
+                roles.setdefault(name, role)
+        added = []
+        with self._lock:
+            for name in list(self.samples):
+                if name not in roles:
+                    del self.samples[name]
+                    self.resolutions.pop(name, None)
+                    self._sampled.discard(name)
+            for name, role in roles.items():
+                if name not in self.samples:
+                    self.samples[name] = deque(maxlen=self.buffer_size)
+                    added.append(name)
+            self.roles = roles
+
+        for name in added:
+            resolution = get_role_resolution(roles[name])
+            if resolution is not None and set_resolution(name, resolution):
+                with self._lock:
+                    self.resolutions[name] = resolution
+
+        if not self.is_running:
+            self.start()
+
+    def start(self):
+        """Start the sampling thread."""
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="temperature_sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the sampling thread and wait for it to finish."""
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        """Sample every watched sensor until stopped."""
+
+        LOGGER.debug("Temperature sampler started")
+        while not self._stop.is_set():
+            try:
+                self.sample_all()
+            except OSError as error:
+                LOGGER.error(f"Error sampling the device temperature sensors: {error}")
+            self._stop.wait(self.interval)
+        LOGGER.debug("Temperature sampler stopped")
+
+    def sample_all(self):
+        """Read every watched sensor once.
+
+        With bulk_read every sensor is converted at once and the converted
+        values are read. Each sensor is converted on its own if bulk
+        conversion is not available.
+        """
+
+        with self._lock:
+            sensor_names = list(self.samples)
+            resolution = max(
+                (
+                    self.resolutions.get(name, DEFAULT_RESOLUTION)
+                    for name in sensor_names
+                ),
+                default=DEFAULT_RESOLUTION,
+            )
+
+        if self.bulk_read and sensor_names and bulk_convert(resolution):
+            for name, value in read_many(sensor_names, converted=True).items():
+                self._add_sample(name, value)
+            return
+
+        for name in sensor_names:
+            self.sample(name)
+
+    def sample(self, sensor_name: str):
+        """Read a sensor once and keep the sample if it is valid."""
+        self._add_sample(sensor_name, _read_temperature(sensor_name))
+
+    def _add_sample(self, sensor_name: str, value):
+        """Keep a sample of a sensor if it is valid."""
+
+        timestamp = self._clock()
+        with self._lock:
+            self._sampled.add(sensor_name)
+            buffer = self.samples.get(sensor_name)
+            if buffer is not None and value != "U":
+                buffer.append((timestamp, value))
+
+    def get_reading(self, sensor_name: Optional[str], percision=2) -> SensorReading:
+        """Return the smoothed temperature of a sensor.
+
+        A sensor that has never been sampled is read once, so the first
+        reading after starting does not have to wait for the thread. There
+        is no reading if sensor_name is None.
+        """
+
+        if sensor_name is None:
+            return SensorReading(None, None, 0)
+
+        with self._lock:
+            sampled = sensor_name in self._sampled
+        if not sampled:
+            self.sample(sensor_name)
+
+        oldest = self._clock() - self.max_age
+        with self._lock:
+            buffer = self.samples.get(sensor_name, ())
+            recent = [sample for sample in buffer if sample[0] >= oldest]
+            smoothing = get_role_samples(self.roles.get(sensor_name)) or self.smoothing
+        recent = recent[-smoothing:]
+
+        if not recent:
+            return SensorReading(None, None, 0)
+
+        value = round(statistics.mean(value for _, value in recent), percision)
+        timestamp = datetime.datetime.fromtimestamp(recent[-1][0])
+        return SensorReading(value, timestamp, len(recent))
+
+
+MEMBERSHIP = SensorMembership()
+SAMPLER = TemperatureSampler()
+
+
 if __name__ == "__main__":
     print(get_connected_sensors(values=True))
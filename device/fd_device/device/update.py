@@ -1,11 +1,13 @@
 """Create a device update object."""
 import datetime
+from typing import Any
 
-from sqlalchemy import select
+from sqlalchemy import update
 
 from fd_device.database.database import get_session
 from fd_device.database.device import Device
-from fd_device.device.temperature import temperature
+from fd_device.database.metadata import METADATA
+from fd_device.device.temperature import SAMPLER
 
 
 def get_device_info(session=None) -> dict:
@@ -16,27 +18,41 @@ def get_device_info(session=None) -> dict:
         close_session = True
         session = get_session()
 
-    device = session.scalars(select(Device).limit(1)).first()
+    device = METADATA.get_device(session)
     if device is None:
         # this is an error, there should always be a device
+        if close_session:
+            session.close()
         return {}
 
-    device.interior_temp = temperature(device.interior_sensor)
-    device.exterior_temp = temperature(device.exterior_sensor)
+    # the sensors are sampled in the background, so the readings are instant
+    SAMPLER.watch(interior=device.interior_sensor, exterior=device.exterior_sensor)
+    interior = SAMPLER.get_reading(device.interior_sensor)
+    exterior = SAMPLER.get_reading(device.exterior_sensor)
+    last_updated = session.execute(
+        update(Device)
+        .where(Device.id == device.id)
+        .values(interior_temp=interior.temperature, exterior_temp=exterior.temperature)
+        .returning(Device.last_updated)
+    ).scalar_one()
     session.commit()
 
     info: dict = {}
     info["created_at"] = datetime.datetime.now()
     info["id"] = device.device_id
 
-    device_info = {}
+    device_info: dict[str, Any] = {}
     device_info["device_id"] = device.device_id
     device_info["hardware_version"] = device.hardware_version
     device_info["software_version"] = device.software_version
-    device_info["interior_temp"] = device.interior_temp
-    device_info["exterior_temp"] = device.exterior_temp
+    device_info["interior_temp"] = interior.temperature
+    device_info["exterior_temp"] = exterior.temperature
+    device_info["interior_temp_timestamp"] = interior.timestamp
+    device_info["interior_temp_samples"] = interior.sample_count
+    device_info["exterior_temp_timestamp"] = exterior.timestamp
+    device_info["exterior_temp_samples"] = exterior.sample_count
     device_info["grainbin_count"] = device.grainbin_count
-    device_info["last_updated"] = device.last_updated
+    device_info["last_updated"] = last_updated
 
     info["data"] = device_info
 
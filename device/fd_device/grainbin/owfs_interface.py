@@ -1,105 +1,212 @@
 """Interface with owfs to read connected sensor temperatures."""
+import functools
 import logging
-from typing import Union
+import threading
+from typing import Optional, Union
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from fd_device.grainbin.owhttpd_parser import parse_owhttpd_page
+from fd_device.grainbin.owserver import OwserverClient, OwserverError
+from fd_device.settings import get_config
 
 LOGGER = logging.getLogger("fd.grainbin.owfs_interface")
+CONFIG = get_config()
+_THREAD_LOCAL = threading.local()
+
+# the sensor properties that are read for each grainbin sensor
+SENSOR_PROPERTIES = ("temperature", "temphigh", "templow")
+
+
+class OwfsError(Exception):
+    """A bus or sensor listing could not be read from owfs."""
+
+
+def parse_temperature(value) -> Optional[float]:
+    """Convert a temperature read from OWFS to a float, or None if it is not a number."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _base_url() -> str:
+    """Return the base url of the owhttpd server."""
+    return f"http://{CONFIG.OWFS_HOST}:{CONFIG.OWFS_HTTP_PORT}"
+
+
+def _use_owserver() -> bool:
+    """Return True if the owserver backend is configured."""
+    return bool(CONFIG.OWFS_BACKEND == "owserver")
+
+
+def get_owserver_client() -> OwserverClient:
+    """Return the owserver client of the current thread.
+
+    Each thread gets its own connection so that different busses can be
+    read at the same time.
+    """
+    client: Optional[OwserverClient] = getattr(_THREAD_LOCAL, "owserver_client", None)
+    if client is None:
+        client = OwserverClient(CONFIG.OWFS_HOST, CONFIG.OWFS_SERVER_PORT)
+        _THREAD_LOCAL.owserver_client = client
+    return client
+
+
+def create_http_session(
+    pool_size: Optional[int] = None, retries: Optional[int] = None
+) -> requests.Session:
+    """Create a keep-alive HTTP session for talking to owhttpd.
 
+    Args:
+        pool_size (int, optional): the number of connections kept open.
+        Defaults to OWFS_HTTP_POOL_SIZE.
+        retries (int, optional): how many times a failed request is retried.
+        Defaults to OWFS_HTTP_RETRIES.
+
+    Returns:
+        requests.Session: the session
+    """
+
+    pool_size = CONFIG.OWFS_HTTP_POOL_SIZE if pool_size is None else pool_size
+    retries = CONFIG.OWFS_HTTP_RETRIES if retries is None else retries
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=CONFIG.OWFS_HTTP_RETRY_BACKOFF,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=("GET",),
+        # return the last response instead of raising once the retries are used up
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=True
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    return session
+
+
+@functools.cache
+def get_http_session() -> requests.Session:
+    """Return the shared owhttpd HTTP session."""
+    return create_http_session()
 
-def fetch_and_parse_page(url: str) -> Union[list[list[str]], None]:
+
+def fetch_and_parse_page(
+    url: str, http_session: Optional[requests.Session] = None
+) -> Union[list[list[str]], None]:
     """Fetch a page from the given url parse the result into a list.
 
     The parsing is designed specifically for the layout of the OWFS
-    HTTPD pages.
+    HTTPD pages. The shared HTTP session is used unless one is given.
     """
-    page = requests.get(url, timeout=5)
+    if http_session is None:
+        http_session = get_http_session()
+    page = http_session.get(url, timeout=CONFIG.OWFS_HTTP_TIMEOUT)
 
     if page.status_code != 200:
         LOGGER.error(f"Error fetching page from fd_1wire. URL is: {url}")
         return None
 
-    data = []
-    soup = BeautifulSoup(page.text, "html.parser")
-    tables = soup.find_all("table")
-    if not tables:
-        return []
-    # we care about the rows in second table
-    rows = tables[1].find_all("tr")
-    for row in rows:
-        cols = row.find_all("td")
-        col_as_list = []
-        for col in cols:
-            # parse a form element if needed by getting the value from the
-            # input tag where the type is 'TEXT'
-            form = col.find("form")
-            if form:
-                for tag in form.find_all("input"):
-                    if tag["type"] == "TEXT":
-                        col_as_list.append(tag["value"])
-            else:
-                col_as_list.append(col.get_text())
-        data.append(col_as_list)
-
-    return data
-
-
-def get_all_busses(ignore_all_bus=True) -> list[str]:
+    return parse_owhttpd_page(page.text)
+
+
+def _list_directory(
+    path: str,
+    prefix: str,
+    raise_errors: bool,
+    http_session: Optional[requests.Session] = None,
+) -> list[str]:
+    """Return the names in an owfs directory that start with prefix.
+
+    A directory that can not be listed gives an empty list, or raises
+    OwfsError if raise_errors is True.
+    """
+
+    if _use_owserver():
+        try:
+            entries = get_owserver_client().dir(path or "/")
+        except OwserverError as error:
+            if raise_errors:
+                raise OwfsError(f"Could not list '{path or '/'}': {error}") from error
+            LOGGER.error(f"Error listing '{path or '/'}' from owserver: {error}")
+            return []
+        names = [entry.rstrip("/").rsplit("/", 1)[-1] for entry in entries]
+        return [name for name in names if name.startswith(prefix)]
+
+    data = fetch_and_parse_page(_base_url() + path, http_session)
+    if data is None and raise_errors:
+        raise OwfsError(f"Could not list '{path or '/'}'")
+    return [row[1] for row in data or [] if row[0].startswith(prefix)]
+
+
+def get_all_busses(
+    ignore_all_bus=True,
+    raise_errors=False,
+    http_session: Optional[requests.Session] = None,
+) -> list[str]:
     """Get all busses and return them as a list.
 
     Args:
         ignore_all_bus (str, optional, default = True): Whether or
         not to exclude the all bus. The all bus includes every other bus and sensor.
+        raise_errors (bool, optional, default = False): raise OwfsError if the
+        busses can not be listed instead of returning an empty list.
+        http_session (requests.Session, optional): the owhttpd session to use.
+        Defaults to the shared session.
 
     Returns:
         list[str]: all the connected bus names in the form of 'bus.X' where X is an integer
     """
 
-    url = "http://fd_1wire:2121"
-
-    data = fetch_and_parse_page(url)
-
-    list_of_buses = []
+    list_of_buses = _list_directory("", "bus", raise_errors, http_session)
 
-    if data:
-        for row in data:
-            if row[0].startswith("bus"):
-                list_of_buses.append(row[1])
-
-    if ignore_all_bus:
+    if ignore_all_bus and "bus.0" in list_of_buses:
         list_of_buses.remove("bus.0")
     return sorted(list_of_buses)
 
 
-def get_all_sensors_of_bus(bus_name: str) -> list[str]:
-    """Get all sensors of a given bus."""
-
-    base_url = "http://fd_1wire:2121"
-
-    url = base_url + f"/{bus_name}"
+def get_all_sensors_of_bus(
+    bus_name: str,
+    raise_errors: bool = False,
+    http_session: Optional[requests.Session] = None,
+) -> list[str]:
+    """Get all sensors of a given bus.
 
-    data = fetch_and_parse_page(url)
+    If raise_errors is True, OwfsError is raised if the sensors can not be
+    listed instead of returning an empty list. The shared owhttpd session is
+    used unless one is given.
+    """
 
-    list_of_sensors = []
+    return _list_directory(f"/{bus_name}", "28.", raise_errors, http_session)
 
-    if data:
-        for row in data:
-            if row[0].startswith("28."):
-                list_of_sensors.append(row[1])
-    return list_of_sensors
 
+def read_sensor_of_bus(
+    bus_name: str, sensor: str, http_session: Optional[requests.Session] = None
+) -> dict:
+    """Read the properties of a sensor of a given bus.
 
-def read_sensor_of_bus(bus_name: str, sensor: str) -> dict:
-    """Get all sensors of a given bus."""
+    The shared owhttpd session is used unless one is given.
+    """
 
-    base_url = "http://fd_1wire:2121"
+    sensor_data = {}
 
-    url = base_url + f"/{bus_name}/{sensor}"
+    if _use_owserver():
+        client = get_owserver_client()
+        try:
+            for prop in SENSOR_PROPERTIES:
+                sensor_data[prop] = client.read(f"/{bus_name}/{sensor}/{prop}")
+        except OwserverError as error:
+            LOGGER.error(f"Error reading {bus_name}/{sensor} from owserver: {error}")
+        return sensor_data
 
-    data = fetch_and_parse_page(url)
+    url = _base_url() + f"/{bus_name}/{sensor}"
 
-    sensor_data = {}
+    data = fetch_and_parse_page(url, http_session)
 
     if data:
         for row in data:
@@ -115,6 +222,85 @@ def read_sensor_of_bus(bus_name: str, sensor: str) -> dict:
     return sensor_data
 
 
+def read_sensor_temperature(
+    bus_name: str,
+    sensor: str,
+    latest: bool = False,
+    http_session: Optional[requests.Session] = None,
+) -> Optional[str]:
+    """Read only the temperature of a sensor of a given bus.
+
+    Args:
+        bus_name (str): the bus the sensor is on
+        sensor (str): the sensor name
+        latest (bool, optional, default = False): read the value of the last
+        conversion ('latesttemp') instead of starting a new conversion. Used
+        after start_simultaneous_conversion.
+        http_session (requests.Session, optional): the owhttpd session to use.
+        Defaults to the shared session.
+
+    Returns:
+        Optional[str]: the temperature, or None if it could not be read
+    """
+
+    prop = "latesttemp" if latest else "temperature"
+
+    if _use_owserver():
+        try:
+            return get_owserver_client().read(f"/{bus_name}/{sensor}/{prop}")
+        except OwserverError as error:
+            LOGGER.error(f"Error reading {bus_name}/{sensor} from owserver: {error}")
+            return None
+
+    url = _base_url() + f"/{bus_name}/{sensor}/{prop}"
+
+    data = fetch_and_parse_page(url, http_session)
+
+    if data:
+        for row in data:
+            if row and row[0] == prop:
+                return row[1]
+    return None
+
+
+def start_simultaneous_conversion(
+    bus_name: str, http_session: Optional[requests.Session] = None
+) -> bool:
+    """Start a temperature conversion on every sensor of a bus at once.
+
+    The converted values can then be read with
+    read_sensor_temperature(latest=True) without waiting for a conversion
+    of each sensor. The shared owhttpd session is used unless one is given.
+
+    Returns:
+        bool: True if the conversion was started
+    """
+
+    if _use_owserver():
+        try:
+            get_owserver_client().write(f"/{bus_name}/simultaneous/temperature", b"1")
+        except OwserverError as error:
+            LOGGER.error(
+                f"Error starting simultaneous conversion on {bus_name}: {error}"
+            )
+            return False
+        return True
+
+    url = _base_url() + f"/{bus_name}/simultaneous"
+
+    if http_session is None:
+        http_session = get_http_session()
+    page = http_session.get(
+        url, params={"temperature": "1"}, timeout=CONFIG.OWFS_HTTP_TIMEOUT
+    )
+    if page.status_code != 200:
+        LOGGER.error(
+            f"Error starting simultaneous conversion on {bus_name}. URL is: {url}"
+        )
+        return False
+    return True
+
+
 if __name__ == "__main__":
     all_busses = get_all_busses()
     print(all_busses)
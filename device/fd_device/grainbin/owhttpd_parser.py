@@ -0,0 +1,91 @@
+"""Single pass parser for the pages rendered by owhttpd."""
+from html.parser import HTMLParser
+from typing import Optional
+
+# owhttpd renders a navigation table first. The rows we care about are
+# in the second table of the page.
+DATA_TABLE_NUMBER = 2
+
+
+class OwhttpdPageParser(HTMLParser):
+    """Collect the cells of every row in the data table of an owhttpd page.
+
+    No document tree is built. Each cell is reduced to its text, or to the
+    values of the 'TEXT' inputs of its form if it has one, as soon as it
+    closes.
+    """
+
+    def __init__(self):
+        """Create the OwhttpdPageParser object."""
+        super().__init__(convert_charrefs=True)
+
+        self.rows: list[list[str]] = []
+        self._table_count = 0
+        self._table_depth = 0
+        self._row: Optional[list[str]] = None
+        self._cell_text: Optional[list[str]] = None
+        self._form_values: Optional[list[str]] = None
+
+    def _in_data_table(self) -> bool:
+        """Return True while inside the data table."""
+        return bool(self._table_count == DATA_TABLE_NUMBER and self._table_depth > 0)
+
+    def handle_starttag(self, tag, attrs):
+        """Track tables, rows, cells, forms and text inputs."""
+
+        if tag == "table":
+            if self._table_depth == 0:
+                self._table_count += 1
+            self._table_depth += 1
+            return
+
+        if not self._in_data_table():
+            return
+
+        if tag == "tr":
+            self._row = []
+        elif tag == "td" and self._row is not None:
+            self._cell_text = []
+            self._form_values = None
+        elif tag == "form" and self._cell_text is not None:
+            self._form_values = []
+        elif tag == "input" and self._form_values is not None:
+            attributes = dict(attrs)
+            if attributes.get("type") == "TEXT":
+                self._form_values.append(attributes.get("value") or "")
+
+    def handle_endtag(self, tag):
+        """Close cells and rows as their end tags are seen."""
+
+        if tag == "table":
+            self._table_depth = max(self._table_depth - 1, 0)
+            return
+
+        if not self._in_data_table():
+            return
+
+        if tag == "td" and self._row is not None and self._cell_text is not None:
+            if self._form_values is not None:
+                self._row.extend(self._form_values)
+            else:
+                self._row.append("".join(self._cell_text))
+            self._cell_text = None
+            self._form_values = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        """Collect the text of the current cell."""
+
+        if self._cell_text is not None:
+            self._cell_text.append(data)
+
+
+def parse_owhttpd_page(text: str) -> list[list[str]]:
+    """Parse an owhttpd page into a list of rows of cell values."""
+
+    parser = OwhttpdPageParser()
+    parser.feed(text)
+    parser.close()
+    return parser.rows
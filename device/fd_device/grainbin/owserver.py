@@ -0,0 +1,164 @@
+"""Client for the owserver network protocol.
+
+owserver listens on TCP port 4304 and answers small binary messages. Every
+request and every response starts with a header of six big-endian 32 bit
+integers, followed by an optional payload. Talking to owserver directly avoids
+fetching and parsing the HTML pages that owhttpd renders.
+
+Protocol reference: https://owfs.org/index_php_page_owserver-protocol.html
+"""
+import logging
+import socket
+import struct
+import threading
+from typing import Optional
+
+LOGGER = logging.getLogger("fd.grainbin.owserver")
+
+# message types
+MSG_READ = 2
+MSG_WRITE = 3
+MSG_PRESENCE = 6
+MSG_DIRALL = 7
+
+# control flags
+# include the 'bus.X' entries in directory listings
+FLG_BUS_RET = 0x00000002
+# ask owserver to keep the socket open after answering
+FLG_PERSISTENCE = 0x00000004
+
+# version, payload length, type or return value, flags, size, offset
+HEADER = struct.Struct(">iiiiii")
+# a payload length of -1 is a keepalive ping sent during slow operations
+PING_PAYLOAD = -1
+MAX_READ_SIZE = 65536
+
+
+class OwserverError(Exception):
+    """An error returned by owserver or raised while talking to it."""
+
+
+class OwserverClient:
+    """A small owserver client supporting dir, read, write and presence messages.
+
+    A single socket is kept open between requests when owserver grants
+    persistence. Requests are serialized, so one client can be shared
+    between threads.
+    """
+
+    def __init__(self, host: str, port: int = 4304, timeout: float = 5.0):
+        """Create the OwserverClient object."""
+
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.flags = FLG_BUS_RET | FLG_PERSISTENCE
+
+        self._socket: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        """Use the client as a context manager."""
+        return self
+
+    def __exit__(self, *args):
+        """Close the connection when leaving the context manager."""
+        self.close()
+
+    def dir(self, path: str = "/") -> list[str]:
+        """Return the full paths of every entry in the directory at path."""
+
+        data = self._request(MSG_DIRALL, path)
+        listing = data.decode("ascii").rstrip("\x00")
+        if not listing:
+            return []
+        return listing.split(",")
+
+    def read(self, path: str, size: int = MAX_READ_SIZE) -> str:
+        """Read the property at path and return it as a stripped string."""
+
+        data = self._request(MSG_READ, path, size=size)
+        return data.decode("ascii").rstrip("\x00").strip()
+
+    def write(self, path: str, data: bytes):
+        """Write data to the property at path."""
+
+        self._request(MSG_WRITE, path, data=data)
+
+    def present(self, path: str) -> bool:
+        """Return True if the device or property at path exists."""
+
+        try:
+            self._request(MSG_PRESENCE, path)
+        except OwserverError:
+            return False
+        return True
+
+    def close(self):
+        """Close the socket to owserver if it is open."""
+
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            finally:
+                self._socket = None
+
+    def _request(
+        self, msg_type: int, path: str, size: int = 0, data: bytes = b""
+    ) -> bytes:
+        """Send a single message to owserver and return the response payload."""
+
+        payload = path.encode("ascii") + b"\x00" + data
+        if data:
+            size = len(data)
+        header = HEADER.pack(0, len(payload), msg_type, self.flags, size, 0)
+
+        with self._lock:
+            try:
+                if self._socket is None:
+                    self._socket = socket.create_connection(
+                        (self.host, self.port), timeout=self.timeout
+                    )
+                self._socket.sendall(header + payload)
+                ret, flags, response = self._read_response(self._socket)
+            except OSError as error:
+                self.close()
+                raise OwserverError(
+                    f"Error talking to owserver at {self.host}:{self.port}: {error}"
+                ) from error
+
+            if not flags & FLG_PERSISTENCE:
+                # owserver did not grant a persistent connection
+                self.close()
+
+        if ret < 0:
+            raise OwserverError(f"owserver returned error {-ret} for '{path}'")
+        return response
+
+    def _read_response(self, sock: socket.socket) -> tuple[int, int, bytes]:
+        """Read one response, skipping any keepalive pings."""
+
+        while True:
+            header = _recv_exact(sock, HEADER.size)
+            _, payload_len, ret, flags, size, offset = HEADER.unpack(header)
+            if payload_len == PING_PAYLOAD:
+                continue
+
+            data = _recv_exact(sock, payload_len) if payload_len > 0 else b""
+            if 0 <= offset and 0 < size <= len(data) - offset:
+                data = data[offset : offset + size]
+            return ret, flags, data
+
+
+def _recv_exact(sock: socket.socket, length: int) -> bytes:
+    """Read exactly length bytes from the socket."""
+
+    chunks = []
+    remaining = length
+    while remaining > 0:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            raise ConnectionError("owserver closed the connection")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
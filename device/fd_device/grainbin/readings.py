@@ -0,0 +1,117 @@
+"""Store the temperature of every grainbin sensor in the local reading history."""
+import csv
+import io
+import logging
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm.session import Session
+
+from fd_device.database.database import get_session
+from fd_device.database.device import GrainbinReading
+from fd_device.grainbin.owfs_interface import parse_temperature
+
+LOGGER = logging.getLogger("fd.grainbin.readings")
+
+# the columns written for each reading, in COPY order
+COLUMNS = (
+    "timestamp",
+    "grainbin_id",
+    "sensor_name",
+    "cable",
+    "position",
+    "temperature",
+)
+
+
+def _to_int(value) -> Optional[int]:
+    """Convert a sensor value to an int, or None if it is not a number."""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def readings_from_updates(
+    updates: list[dict], grainbin_ids: dict[str, int]
+) -> list[dict]:
+    """Create a reading row for every sensor of every grainbin update.
+
+    Args:
+        updates (list[dict]): the grainbin updates of one cycle
+        grainbin_ids (dict[str, int]): the database id of each grainbin by name
+
+    Returns:
+        list[dict]: the rows, one per sensor
+    """
+
+    rows = []
+    for update in updates:
+        grainbin_id = grainbin_ids.get(update["name"])
+        if grainbin_id is None:
+            continue
+        for sensor in update.get("sensor_data", []):
+            rows.append(
+                {
+                    "timestamp": update["created_at"],
+                    "grainbin_id": grainbin_id,
+                    "sensor_name": sensor["sensor_name"],
+                    "cable": _to_int(sensor.get("temphigh")),
+                    "position": _to_int(sensor.get("templow")),
+                    "temperature": parse_temperature(sensor.get("temperature")),
+                }
+            )
+    return rows
+
+
+def write_readings(rows: list[dict], session: Optional[Session] = None) -> int:
+    """Insert the reading rows in a single batched statement.
+
+    PostgreSQL uses COPY. Other databases use an executemany insert.
+
+    Returns:
+        int: the number of rows written
+    """
+
+    if not rows:
+        return 0
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    if session.get_bind().dialect.name == "postgresql":
+        _copy_readings(session, rows)
+    else:
+        session.execute(insert(GrainbinReading), rows)
+    session.commit()
+    LOGGER.debug(f"Stored {len(rows)} grainbin readings")
+
+    if close_session:
+        session.close()
+
+    return len(rows)
+
+
+def _copy_readings(session: Session, rows: list[dict]):
+    """Write the rows with PostgreSQL COPY in the transaction of the session."""
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # an unquoted empty value is NULL in the csv format
+        writer.writerow(
+            ["" if row[column] is None else row[column] for column in COLUMNS]
+        )
+    buffer.seek(0)
+
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {GrainbinReading.__tablename__} ({', '.join(COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
@@ -0,0 +1,376 @@
+"""Hourly and daily rollups of the grainbin readings, and their retention.
+
+Each run adds only the readings stored since the previous run to the
+rollups. Readings are deleted once they are older than the retention and
+included in the rollups, so long range trends should be read from the
+rollups with get_rollups.
+"""
+import datetime
+import logging
+from typing import Optional, Sequence
+
+from sqlalchemy import Row, and_, delete, func, select
+from sqlalchemy.orm.session import Session
+
+from fd_device.database.database import get_session
+from fd_device.database.device import (
+    GrainbinReading,
+    GrainbinReadingRollup,
+    RollupState,
+)
+from fd_device.settings import get_config
+
+LOGGER = logging.getLogger("fd.grainbin.rollup")
+CONFIG = get_config()
+
+PERIODS = ("hour", "day")
+# the name of the rollup state of the grainbin readings
+STATE_NAME = "grainbin_reading"
+
+
+def period_start(timestamp: datetime.datetime, period: str) -> datetime.datetime:
+    """Return the start of the hour or day that the timestamp is in."""
+
+    if period == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _get_state(session: Session) -> RollupState:
+    """Return the rollup state of the grainbin readings, creating it if needed."""
+
+    state = session.scalars(
+        select(RollupState).where(RollupState.name == STATE_NAME)
+    ).first()
+    if state is None:
+        state = RollupState(STATE_NAME)
+        session.add(state)
+        session.flush()
+    return state
+
+
+def update_rollups(
+    batch_size: Optional[int] = None, session: Optional[Session] = None
+) -> int:
+    """Add the readings stored since the last run to the rollups.
+
+    The readings are processed in batches of batch_size rows and each batch
+    is committed with the id of its last reading, so an interrupted run
+    continues where it stopped.
+
+    Returns:
+        int: the number of readings processed
+    """
+
+    batch_size = CONFIG.GRAINBIN_ROLLUP_BATCH_SIZE if batch_size is None else batch_size
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    state = _get_state(session)
+    processed = 0
+    while True:
+        readings = session.execute(
+            select(
+                GrainbinReading.id,
+                GrainbinReading.timestamp,
+                GrainbinReading.grainbin_id,
+                GrainbinReading.sensor_name,
+                GrainbinReading.temperature,
+            )
+            .where(GrainbinReading.id > state.last_id)
+            .order_by(GrainbinReading.id)
+            .limit(batch_size)
+        ).all()
+        if not readings:
+            break
+
+        _add_to_rollups(readings, session)
+        state.last_id = readings[-1].id
+        session.commit()
+        processed += len(readings)
+
+        if len(readings) < batch_size:
+            break
+
+    LOGGER.debug(f"Added {processed} grainbin readings to the rollups")
+
+    if close_session:
+        session.close()
+
+    return processed
+
+
+def _add_to_rollups(readings: Sequence[Row], session: Session):
+    """Summarize a batch of readings and merge them into the stored rollups."""
+
+    # (period, period_start, grainbin_id, sensor_name) -> [min, max, total, count]
+    summaries: dict[tuple, list] = {}
+    for reading in readings:
+        if reading.temperature is None:
+            continue
+        for period in PERIODS:
+            start = period_start(reading.timestamp, period)
+            for sensor_name in (reading.sensor_name, None):
+                key = (period, start, reading.grainbin_id, sensor_name)
+                summary = summaries.get(key)
+                if summary is None:
+                    summaries[key] = [reading.temperature, reading.temperature, 0.0, 0]
+                    summary = summaries[key]
+                summary[0] = min(summary[0], reading.temperature)
+                summary[1] = max(summary[1], reading.temperature)
+                summary[2] += reading.temperature
+                summary[3] += 1
+
+    if not summaries:
+        return
+
+    starts = [key[1] for key in summaries]
+    existing = {
+        (
+            rollup.period,
+            rollup.period_start,
+            rollup.grainbin_id,
+            rollup.sensor_name,
+        ): rollup
+        for rollup in session.scalars(
+            select(GrainbinReadingRollup).where(
+                GrainbinReadingRollup.period_start >= min(starts),
+                GrainbinReadingRollup.period_start <= max(starts),
+                GrainbinReadingRollup.grainbin_id.in_({key[2] for key in summaries}),
+            )
+        )
+    }
+
+    for key, (min_temp, max_temp, total, count) in summaries.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            period, start, grainbin_id, sensor_name = key
+            session.add(
+                GrainbinReadingRollup(
+                    period=period,
+                    period_start=start,
+                    grainbin_id=grainbin_id,
+                    sensor_name=sensor_name,
+                    min_temp=min_temp,
+                    max_temp=max_temp,
+                    mean_temp=total / count,
+                    count=count,
+                )
+            )
+            continue
+        rollup.mean_temp = (rollup.mean_temp * rollup.count + total) / (
+            rollup.count + count
+        )
+        rollup.count += count
+        rollup.min_temp = min(rollup.min_temp, min_temp)
+        rollup.max_temp = max(rollup.max_temp, max_temp)
+
+
+def _delete_in_batches(model, condition, batch_size: int, session: Session) -> int:
+    """Delete the rows matching the condition, batch_size rows at a time."""
+
+    deleted = 0
+    while True:
+        ids = session.scalars(select(model.id).where(condition).limit(batch_size)).all()
+        if not ids:
+            break
+        session.execute(delete(model).where(model.id.in_(ids)))
+        session.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+    return deleted
+
+
+def prune_readings(
+    days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    session: Optional[Session] = None,
+) -> int:
+    """Delete the readings older than days that are included in the rollups.
+
+    Returns:
+        int: the number of readings deleted
+    """
+
+    days = CONFIG.GRAINBIN_READING_RETENTION_DAYS if days is None else days
+    batch_size = CONFIG.GRAINBIN_PRUNE_BATCH_SIZE if batch_size is None else batch_size
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+    last_id = _get_state(session).last_id
+    deleted = _delete_in_batches(
+        GrainbinReading,
+        and_(GrainbinReading.timestamp < cutoff, GrainbinReading.id <= last_id),
+        batch_size,
+        session,
+    )
+    LOGGER.debug(f"Deleted {deleted} grainbin readings older than {days} days")
+
+    if close_session:
+        session.close()
+
+    return deleted
+
+
+def prune_rollups(
+    days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    session: Optional[Session] = None,
+) -> int:
+    """Delete the hourly rollups older than days. Daily rollups are kept.
+
+    Returns:
+        int: the number of rollups deleted
+    """
+
+    days = CONFIG.GRAINBIN_HOURLY_ROLLUP_RETENTION_DAYS if days is None else days
+    batch_size = CONFIG.GRAINBIN_PRUNE_BATCH_SIZE if batch_size is None else batch_size
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+    deleted = _delete_in_batches(
+        GrainbinReadingRollup,
+        and_(
+            GrainbinReadingRollup.period == "hour",
+            GrainbinReadingRollup.period_start < cutoff,
+        ),
+        batch_size,
+        session,
+    )
+    LOGGER.debug(f"Deleted {deleted} hourly rollups older than {days} days")
+
+    if close_session:
+        session.close()
+
+    return deleted
+
+
+def delete_reading_history(grainbin_ids: Sequence[int], session: Session):
+    """Delete the readings and rollups of the grainbins, and the rollup state.
+
+    The readings and rollups reference their grainbin, so they are deleted
+    before the grainbins are. The rollup state is reset as well, as the ids
+    of the deleted readings can be used again by new readings. The caller
+    commits.
+    """
+
+    session.execute(
+        delete(GrainbinReading).where(GrainbinReading.grainbin_id.in_(grainbin_ids))
+    )
+    session.execute(
+        delete(GrainbinReadingRollup).where(
+            GrainbinReadingRollup.grainbin_id.in_(grainbin_ids)
+        )
+    )
+    session.execute(delete(RollupState).where(RollupState.name == STATE_NAME))
+
+
+def maintain_reading_history(session: Optional[Session] = None) -> dict:
+    """Update the rollups, then prune the old readings and hourly rollups."""
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    result = {
+        "rolled_up": update_rollups(session=session),
+        "pruned_readings": prune_readings(session=session),
+        "pruned_rollups": prune_rollups(session=session),
+    }
+    LOGGER.info(f"Maintained the grainbin reading history: {result}")
+
+    if close_session:
+        session.close()
+
+    return result
+
+
+def get_rollups(
+    period: str,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    grainbin_id: Optional[int] = None,
+    sensor_name: Optional[str] = None,
+    session: Optional[Session] = None,
+) -> list[GrainbinReadingRollup]:
+    """Return the rollups of a period starting between start and end.
+
+    Without a sensor_name the rollups of the whole grainbin are returned.
+    """
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    query = (
+        select(GrainbinReadingRollup)
+        .where(
+            GrainbinReadingRollup.period == period,
+            GrainbinReadingRollup.period_start >= start,
+            GrainbinReadingRollup.period_start < end,
+            GrainbinReadingRollup.sensor_name.is_(None)
+            if sensor_name is None
+            else GrainbinReadingRollup.sensor_name == sensor_name,
+        )
+        .order_by(GrainbinReadingRollup.period_start)
+    )
+    if grainbin_id is not None:
+        query = query.where(GrainbinReadingRollup.grainbin_id == grainbin_id)
+    rollups = list(session.scalars(query).all())
+
+    if close_session:
+        session.close()
+
+    return rollups
+
+
+def get_history_status(session: Optional[Session] = None) -> dict:
+    """Return the size and range of the readings and rollups."""
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    readings = session.execute(
+        select(
+            func.count(GrainbinReading.id),
+            func.min(GrainbinReading.timestamp),
+            func.max(GrainbinReading.timestamp),
+        )
+    ).one()
+    status = {
+        "readings": readings[0],
+        "oldest_reading": readings[1],
+        "newest_reading": readings[2],
+        "last_rolled_up_id": _get_state(session).last_id,
+    }
+    for period in PERIODS:
+        rollups = session.execute(
+            select(
+                func.count(GrainbinReadingRollup.id),
+                func.min(GrainbinReadingRollup.period_start),
+            ).where(GrainbinReadingRollup.period == period)
+        ).one()
+        status[f"{period}_rollups"] = rollups[0]
+        status[f"oldest_{period}_rollup"] = rollups[1]
+    session.commit()
+
+    if close_session:
+        session.close()
+
+    return status
@@ -0,0 +1,83 @@
+"""Persistent store of the static identity of each grainbin sensor."""
+import logging
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm.session import Session
+
+from fd_device.database.database import get_session
+from fd_device.database.device import GrainbinSensor
+
+LOGGER = logging.getLogger("fd.grainbin.sensor_identity")
+
+
+def load_sensor_identities(session: Optional[Session] = None) -> dict[str, dict]:
+    """Return the stored temphigh and templow values keyed by sensor name."""
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    identities = {}
+    for sensor in session.scalars(select(GrainbinSensor)):
+        identity = {}
+        if sensor.temphigh is not None:
+            identity["temphigh"] = sensor.temphigh
+        if sensor.templow is not None:
+            identity["templow"] = sensor.templow
+        identities[sensor.sensor_name] = identity
+
+    if close_session:
+        session.close()
+
+    return identities
+
+
+def save_sensor_identities(
+    identities: dict[str, dict], session: Optional[Session] = None
+):
+    """Create or update the stored identity of each given sensor."""
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    existing = {
+        sensor.sensor_name: sensor
+        for sensor in session.scalars(
+            select(GrainbinSensor).where(
+                GrainbinSensor.sensor_name.in_(list(identities))
+            )
+        )
+    }
+
+    for sensor_name, identity in identities.items():
+        sensor = existing.get(sensor_name)
+        if sensor is None:
+            sensor = GrainbinSensor(sensor_name)
+            session.add(sensor)
+        sensor.temphigh = identity.get("temphigh")
+        sensor.templow = identity.get("templow")
+
+    session.commit()
+    LOGGER.debug(f"Saved the identity of {len(identities)} grainbin sensors")
+
+    if close_session:
+        session.close()
+
+
+def clear_sensor_identities(session: Optional[Session] = None):
+    """Remove every stored sensor identity so they are read again."""
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    session.execute(delete(GrainbinSensor))
+    session.commit()
+
+    if close_session:
+        session.close()
@@ -0,0 +1,500 @@
+"""Simulated OWFS servers for benchmarks and testing without 1-Wire hardware.
+
+A model answers dir, read and write requests for OWFS paths. SimulatedOwfs
+generates a topology of busses and DS18B20 sensors, while ReplayOwfs answers
+from a recording of a real OWFS tree made with record_owfs. Either model can
+be served with the owserver protocol by SimulatedOwserver and as owhttpd
+pages by SimulatedOwhttpd.
+"""
+import errno
+import html
+import json
+import logging
+import random
+import re
+import socketserver
+import threading
+import time
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from fd_device.grainbin.owserver import (
+    FLG_PERSISTENCE,
+    HEADER,
+    MSG_DIRALL,
+    MSG_PRESENCE,
+    MSG_READ,
+    MSG_WRITE,
+    OwserverClient,
+)
+
+LOGGER = logging.getLogger("fd.grainbin.simulator")
+
+# the properties shown for every simulated sensor
+SENSOR_PROPERTIES = ("latesttemp", "temperature", "temphigh", "templow", "type")
+# the properties that can be changed with a form in owhttpd
+WRITABLE_PROPERTIES = ("temphigh", "templow")
+# the entries of a bus directory that are not sensors
+BUS_ENTRIES = ("interface", "simultaneous", "alarm")
+# the directory name of a 1-Wire device, a family code and a 48 bit serial
+SENSOR_PATTERN = re.compile(r"^[0-9A-F]{2}\.[0-9A-F]{12}$")
+
+
+class SimulatedError(Exception):
+    """An error injected into a simulated request."""
+
+
+def _split_path(path: str) -> list[str]:
+    """Split an OWFS path into its parts."""
+    return [part for part in path.split("/") if part and part != "uncached"]
+
+
+def _format_temperature(value: float) -> str:
+    """Format a temperature the way owserver does."""
+    return f"{value:12g}"
+
+
+class OwfsModel(ABC):
+    """Base class of the simulated OWFS trees.
+
+    Every request can be slowed down by latency seconds and fails with a
+    probability of error_rate.
+    """
+
+    def __init__(
+        self, latency: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None
+    ):
+        """Create the OwfsModel object."""
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.request_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def simulate_request(self, delay: float = 0.0):
+        """Wait for the request latency and raise any injected error."""
+
+        with self._lock:
+            self.request_count += 1
+            failed = self._random.random() < self.error_rate
+        if self.latency or delay:
+            time.sleep(self.latency + delay)
+        if failed:
+            raise SimulatedError("injected error")
+
+    @abstractmethod
+    def dir(self, path: str) -> Optional[list[str]]:
+        """Return the full paths of the entries of a directory, or None."""
+
+    @abstractmethod
+    def read(self, path: str) -> Optional[str]:
+        """Return the value of a property, or None if it does not exist."""
+
+    @abstractmethod
+    def write(self, path: str, data: str) -> bool:
+        """Write a property and return True if it exists."""
+
+
+class SimulatedOwfs(OwfsModel):
+    """A generated OWFS tree of bus_count busses with sensors_per_bus sensors each.
+
+    bus.0 is the bus that includes every other bus, as on the device. The
+    sensors of bus X have temphigh set to X and templow set to their
+    position, starting at 1. A temperature conversion takes
+    conversion_time seconds, whether it is for a single sensor or for
+    every sensor of a bus at once.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        bus_count: int = 2,
+        sensors_per_bus: int = 3,
+        temperature: Optional[Callable[[str], float]] = None,
+        conversion_time: float = 0.0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        """Create the SimulatedOwfs object."""
+        super().__init__(latency=latency, error_rate=error_rate, seed=seed)
+
+        self.conversion_time = conversion_time
+        self.temperature = temperature or self.random_walk_temperature
+
+        self.busses: dict[str, list[str]] = {}
+        self.properties: dict[str, dict[str, str]] = {}
+        self.latest: dict[str, float] = {}
+        for bus_number in range(1, bus_count + 1):
+            bus_name = f"bus.{bus_number}"
+            self.busses[bus_name] = []
+            for position in range(1, sensors_per_bus + 1):
+                sensor = f"28.{bus_number:04X}{position:04X}0000"
+                self.busses[bus_name].append(sensor)
+                self.properties[sensor] = {
+                    "temphigh": str(bus_number),
+                    "templow": str(position),
+                    "type": "DS18B20",
+                }
+                # DS18B20 power on value
+                self.latest[sensor] = 85.0
+
+    def random_walk_temperature(self, sensor: str) -> float:
+        """Return the next temperature of a sensor, at DS18B20 resolution."""
+
+        previous = self.latest.get(sensor, 85.0)
+        if previous == 85.0:
+            previous = self._random.uniform(5.0, 25.0)
+        value = previous + self._random.gauss(0.0, 0.25)
+        return round(value * 16) / 16
+
+    def _all_sensors(self) -> list[str]:
+        """Return every sensor of every bus."""
+        return [sensor for sensors in self.busses.values() for sensor in sensors]
+
+    def _bus_sensors(self, bus_name: str) -> Optional[list[str]]:
+        """Return the sensors of a bus, including bus.0."""
+
+        if bus_name == "bus.0":
+            return self._all_sensors()
+        return self.busses.get(bus_name)
+
+    def _convert(self, sensors: list[str]):
+        """Convert the temperature of the given sensors."""
+        for sensor in sensors:
+            self.latest[sensor] = self.temperature(sensor)
+
+    def _find_sensor(self, parts: list[str]) -> Optional[tuple[str, list[str]]]:
+        """Return the sensor and the remaining parts of a sensor path."""
+
+        if parts and parts[0] in self.properties:
+            return parts[0], parts[1:]
+        if len(parts) >= 2 and parts[1] in (self._bus_sensors(parts[0]) or []):
+            return parts[1], parts[2:]
+        return None
+
+    def dir(self, path: str) -> Optional[list[str]]:
+        """Return the full paths of the entries of a directory, or None."""
+
+        self.simulate_request()
+        parts = _split_path(path)
+        prefix = "/" + "/".join(parts) if parts else ""
+
+        if not parts:
+            names = ["bus.0"] + list(self.busses) + self._all_sensors()
+        elif len(parts) == 1 and self._bus_sensors(parts[0]) is not None:
+            names = (self._bus_sensors(parts[0]) or []) + list(BUS_ENTRIES)
+        elif parts[1:] == ["simultaneous"] and self._bus_sensors(parts[0]) is not None:
+            names = ["present", "temperature"]
+        elif (found := self._find_sensor(parts)) is not None and not found[1]:
+            names = list(SENSOR_PROPERTIES)
+        else:
+            return None
+        return [f"{prefix}/{name}" for name in names]
+
+    def read(self, path: str) -> Optional[str]:
+        """Return the value of a property, or None if it does not exist."""
+
+        found = self._find_sensor(_split_path(path))
+        if found is None or len(found[1]) != 1:
+            self.simulate_request()
+            return None
+        sensor, (prop,) = found
+
+        if prop == "temperature":
+            self.simulate_request(delay=self.conversion_time)
+            self._convert([sensor])
+            return _format_temperature(self.latest[sensor])
+
+        self.simulate_request()
+        if prop == "latesttemp":
+            return _format_temperature(self.latest[sensor])
+        return self.properties[sensor].get(prop)
+
+    def write(self, path: str, data: str) -> bool:
+        """Write a property and return True if it exists."""
+
+        parts = _split_path(path)
+        if parts[-2:] == ["simultaneous", "temperature"]:
+            sensors = self._bus_sensors(parts[0]) if len(parts) == 3 else None
+            if sensors is None:
+                self.simulate_request()
+                return False
+            self.simulate_request(delay=self.conversion_time)
+            self._convert(sensors)
+            return True
+
+        self.simulate_request()
+        found = self._find_sensor(parts)
+        if found is None or len(found[1]) != 1:
+            return False
+        sensor, (prop,) = found
+        if prop not in WRITABLE_PROPERTIES:
+            return False
+        self.properties[sensor][prop] = data.strip()
+        return True
+
+
+class ReplayOwfs(OwfsModel):
+    """Answer requests from a recording made with record_owfs."""
+
+    def __init__(
+        self,
+        recording: dict,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        """Create the ReplayOwfs object."""
+        super().__init__(latency=latency, error_rate=error_rate, seed=seed)
+
+        self.directories: dict[str, list[str]] = recording["dir"]
+        self.values: dict[str, str] = recording["read"]
+
+    @classmethod
+    def from_file(cls, filename: str, **kwargs) -> "ReplayOwfs":
+        """Create the ReplayOwfs object from a recording file."""
+        return cls(load_recording(filename), **kwargs)
+
+    def dir(self, path: str) -> Optional[list[str]]:
+        """Return the recorded directory listing, or None."""
+
+        self.simulate_request()
+        return self.directories.get("/" + "/".join(_split_path(path)))
+
+    def read(self, path: str) -> Optional[str]:
+        """Return the recorded value, or None."""
+
+        self.simulate_request()
+        return self.values.get("/" + "/".join(_split_path(path)))
+
+    def write(self, path: str, data: str) -> bool:
+        """Accept writes to recorded simultaneous conversions only."""
+
+        self.simulate_request()
+        parts = _split_path(path)
+        return parts[-2:] == ["simultaneous", "temperature"] and (
+            "/" + parts[0] in self.directories
+        )
+
+
+def record_owfs(client: OwserverClient, properties=SENSOR_PROPERTIES) -> dict:
+    """Walk a real OWFS tree through owserver and record the responses.
+
+    The root, every bus and every sensor directory is listed, and the given
+    properties of every sensor are read.
+    """
+
+    recording: dict[str, dict] = {"dir": {}, "read": {}}
+    root = client.dir("/")
+    recording["dir"]["/"] = root
+    for bus_path in root:
+        if not bus_path.rsplit("/", 1)[-1].startswith("bus."):
+            continue
+        bus_entries = client.dir(bus_path)
+        recording["dir"][bus_path] = bus_entries
+        for sensor_path in bus_entries:
+            if not sensor_path.rsplit("/", 1)[-1].startswith("28."):
+                continue
+            recording["dir"][sensor_path] = client.dir(sensor_path)
+            for prop in properties:
+                recording["read"][f"{sensor_path}/{prop}"] = client.read(
+                    f"{sensor_path}/{prop}"
+                )
+    return recording
+
+
+def save_recording(recording: dict, filename: str):
+    """Save a recording to a json file."""
+
+    with open(filename, "w") as f:
+        json.dump(recording, f, indent=2, sort_keys=True)
+
+
+def load_recording(filename: str) -> dict:
+    """Load a recording from a json file."""
+
+    with open(filename) as f:
+        recording: dict = json.load(f)
+    return recording
+
+
+class _OwserverRequestHandler(socketserver.BaseRequestHandler):
+    """Answer owserver protocol messages from the model of the server."""
+
+    def _recv_exact(self, length: int) -> Optional[bytes]:
+        """Read exactly length bytes, or None if the client disconnected."""
+
+        data = b""
+        while len(data) < length:
+            chunk = self.request.recv(length - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def handle(self):
+        """Answer messages until the client disconnects or asks not to persist."""
+
+        while True:
+            header = self._recv_exact(HEADER.size)
+            if header is None:
+                return
+            _, payload_len, msg_type, flags, size, _ = HEADER.unpack(header)
+            payload = self._recv_exact(payload_len) if payload_len > 0 else b""
+            if payload is None:
+                return
+
+            path, _, data = payload.partition(b"\x00")
+            ret, body = self.server.answer(  # type: ignore[attr-defined]
+                msg_type, path.decode("ascii"), data[:size].decode("ascii")
+            )
+
+            persistent = flags & FLG_PERSISTENCE
+            self.request.sendall(
+                HEADER.pack(0, len(body), ret, persistent, len(body), 0) + body
+            )
+            if not persistent:
+                return
+
+
+class SimulatedOwserver(socketserver.ThreadingTCPServer):
+    """Serve a model with the owserver protocol."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, model: OwfsModel, host: str = "127.0.0.1", port: int = 0):
+        """Create the SimulatedOwserver object. Port 0 picks a free port."""
+        super().__init__((host, port), _OwserverRequestHandler)
+        self.model = model
+
+    def answer(self, msg_type: int, path: str, data: str) -> tuple[int, bytes]:
+        """Return the return value and payload for a message."""
+
+        try:
+            if msg_type == MSG_DIRALL:
+                entries = self.model.dir(path)
+                if entries is None:
+                    return -errno.ENOENT, b""
+                return 0, ",".join(entries).encode("ascii") + b"\x00"
+            if msg_type == MSG_READ:
+                value = self.model.read(path)
+                if value is None:
+                    return -errno.ENOENT, b""
+                body = value.encode("ascii")
+                return len(body), body
+            if msg_type == MSG_WRITE:
+                return (0 if self.model.write(path, data) else -errno.ENOENT), b""
+            if msg_type == MSG_PRESENCE:
+                found = self.model.dir(path) is not None
+                found = found or self.model.read(path) is not None
+                return (0 if found else -errno.ENOENT), b""
+        except SimulatedError:
+            return -errno.EIO, b""
+        return -errno.ENOTSUP, b""
+
+
+class _OwhttpdRequestHandler(BaseHTTPRequestHandler):
+    """Render the model of the server as owhttpd pages."""
+
+    NAVIGATION = (
+        "<TABLE WIDTH='100%' BGCOLOR='#DDDDDD' BORDER='1'><TR><TD>OWFS</TD>"
+        "<TD><A HREF='/'>Bus listing</A></TD></TR></TABLE>"
+    )
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Log requests at debug level instead of printing them."""
+        LOGGER.debug(format, *args)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Answer a page request, applying any form values first."""
+
+        model = self.server.model  # type: ignore[attr-defined]
+        url = urlsplit(self.path)
+        path = "/" + "/".join(_split_path(url.path))
+
+        try:
+            for key, value in parse_qsl(url.query):
+                if not model.write(f"{path}/{key}", value):
+                    self.send_error(404)
+                    return
+            rows = self._rows(model, path)
+        except SimulatedError:
+            self.send_error(500)
+            return
+        if rows is None:
+            self.send_error(404)
+            return
+
+        page = (
+            f"<HTML><HEAD><TITLE>1-Wire Web: {html.escape(path)}</TITLE></HEAD>"
+            f"<BODY>{self.NAVIGATION}<H1>{html.escape(path)}</H1><HR>"
+            f"<TABLE BGCOLOR=\"#DDDDDD\" BORDER=1>{''.join(rows)}</TABLE></BODY></HTML>"
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    @staticmethod
+    def _rows(model: OwfsModel, path: str) -> Optional[list[str]]:
+        """Return the table rows for a directory or property page."""
+
+        entries = model.dir(path)
+        if entries is not None:
+            names = [entry.rsplit("/", 1)[-1] for entry in entries]
+            if SENSOR_PATTERN.match(path.rsplit("/", 1)[-1]):
+                return [
+                    _property_row(path, name, model.read(entry))
+                    for entry, name in zip(entries, names)
+                ]
+            return [
+                f"<TR><TD><A HREF='{html.escape(entry)}'><CODE><B><BIG>{html.escape(name)}"
+                f"</BIG></B></CODE></A></TD><TD>{html.escape(name)}</TD><TD>directory</TD></TR>"
+                for entry, name in zip(entries, names)
+            ]
+
+        value = model.read(path)
+        if value is None:
+            return None
+        parent, name = path.rsplit("/", 1)
+        return [_property_row(parent, name, value)]
+
+
+def _property_row(sensor_path: str, name: str, value: Optional[str]) -> str:
+    """Return the table row of a sensor property."""
+
+    value = html.escape((value or "").strip())
+    if name in WRITABLE_PROPERTIES:
+        cell = (
+            f"<FORM METHOD='GET' ACTION='{html.escape(sensor_path)}'>"
+            f"<INPUT TYPE='TEXT' NAME='{name}' VALUE='{value}'>"
+            "<INPUT TYPE='SUBMIT' VALUE='CHANGE'></FORM>"
+        )
+    else:
+        cell = value
+    return f"<TR><TD><B>{name}</B></TD><TD>{cell}</TD></TR>"
+
+
+class SimulatedOwhttpd(ThreadingHTTPServer):
+    """Serve a model as owhttpd pages."""
+
+    daemon_threads = True
+
+    def __init__(self, model: OwfsModel, host: str = "127.0.0.1", port: int = 0):
+        """Create the SimulatedOwhttpd object. Port 0 picks a free port."""
+        super().__init__((host, port), _OwhttpdRequestHandler)
+        self.model = model
+
+
+def start_in_thread(server: socketserver.BaseServer) -> threading.Thread:
+    """Serve forever in a daemon thread. Stop with server.shutdown()."""
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,192 @@
+"""Cache of the grainbin bus and sensor topology."""
+import logging
+import time
+from typing import Callable, Collection, Optional
+
+from sqlalchemy.orm.session import Session
+
+from fd_device.grainbin.owfs_interface import (
+    OwfsError,
+    get_all_busses,
+    get_all_sensors_of_bus,
+    read_sensor_of_bus,
+)
+from fd_device.grainbin.sensor_identity import (
+    load_sensor_identities,
+    save_sensor_identities,
+)
+from fd_device.settings import get_config
+
+LOGGER = logging.getLogger("fd.grainbin.topology")
+CONFIG = get_config()
+
+# the sensor properties that never change unless a sensor is reprogrammed.
+# temphigh holds the cable number and templow the sensor position.
+STATIC_PROPERTIES = ("temphigh", "templow")
+
+
+class GrainbinTopology:
+    """Hold the connected busses, the sensors of each bus and static sensor attributes.
+
+    The topology is discovered once and then reused until it is older than
+    the ttl, it is invalidated, or a cheap check of the directory listings
+    every check_every cycles shows that it changed. A discovery whose
+    listings failed is discovered again on the next cycle.
+
+    The static attributes are kept in the sensor identity store. They are
+    only read from a sensor the first time it is seen, when the topology
+    changes, or when a reload is asked for.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        check_every: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Create the GrainbinTopology object."""
+
+        self.ttl = CONFIG.GRAINBIN_TOPOLOGY_TTL if ttl is None else ttl
+        self.check_every = (
+            CONFIG.GRAINBIN_TOPOLOGY_CHECK_CYCLES
+            if check_every is None
+            else check_every
+        )
+        self._clock = clock
+
+        self.sensors: dict[str, list[str]] = {}
+        self.attributes: dict[str, dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._reload_attributes = False
+        self._cycle = 0
+
+    @property
+    def busses(self) -> list[str]:
+        """Return the connected busses."""
+        return list(self.sensors)
+
+    def get_sensors(self, bus_name: str) -> list[str]:
+        """Return the sensors of a bus."""
+        return self.sensors.get(bus_name, [])
+
+    def get_attributes(self, sensor: str) -> dict:
+        """Return a copy of the static attributes of a sensor."""
+        return dict(self.attributes.get(sensor, {}))
+
+    def invalidate(self, reload_attributes: bool = False):
+        """Force the topology to be discovered again on the next cycle.
+
+        If reload_attributes is True, the static attributes of every sensor
+        are read again instead of being taken from the identity store.
+        """
+        self._loaded_at = None
+        self._reload_attributes = self._reload_attributes or reload_attributes
+
+    def is_stale(self) -> bool:
+        """Return True if the topology needs to be discovered again."""
+
+        if self._loaded_at is None:
+            return True
+        return self._clock() - self._loaded_at > self.ttl
+
+    def has_changed(self) -> bool:
+        """Compare the cached topology against the current directory listings."""
+
+        busses = get_all_busses()
+        if busses != sorted(self.sensors):
+            return True
+        for bus_name in busses:
+            if sorted(get_all_sensors_of_bus(bus_name)) != sorted(
+                self.sensors[bus_name]
+            ):
+                return True
+        return False
+
+    def start_cycle(
+        self, session: Optional[Session] = None, grainbin_busses: Collection[str] = ()
+    ):
+        """Prepare the topology for an update cycle.
+
+        Discover the topology if it is stale, and every check_every cycles
+        check whether the directory listings have changed.
+
+        Args:
+            session: the session used for the sensor identity store
+            grainbin_busses: the busses that have a grainbin. See refresh
+        """
+
+        self._cycle += 1
+        if self.is_stale():
+            self.refresh(
+                reload_attributes=self._reload_attributes,
+                session=session,
+                grainbin_busses=grainbin_busses,
+            )
+        elif self.check_every and self._cycle % self.check_every == 0:
+            if self.has_changed():
+                LOGGER.info("Grainbin topology changed")
+                self.refresh(
+                    reload_attributes=True,
+                    session=session,
+                    grainbin_busses=grainbin_busses,
+                )
+
+    def refresh(
+        self,
+        reload_attributes: bool = False,
+        session: Optional[Session] = None,
+        grainbin_busses: Collection[str] = (),
+    ):
+        """Discover every bus and sensor and load the static sensor attributes.
+
+        The attributes of sensors already in the identity store are not read
+        again unless reload_attributes is True.
+
+        If a listing fails, the previous topology is kept. If it fails, or a
+        bus in grainbin_busses has no sensors, the topology stays stale and is
+        discovered again on the next cycle.
+        """
+
+        LOGGER.debug("Discovering grainbin topology")
+        stored = {} if reload_attributes else load_sensor_identities(session)
+
+        sensors: dict[str, list[str]] = {}
+        attributes: dict[str, dict] = {}
+        read_attributes: dict[str, dict] = {}
+        try:
+            for bus_name in get_all_busses(raise_errors=True):
+                sensors[bus_name] = get_all_sensors_of_bus(bus_name, raise_errors=True)
+                for sensor in sensors[bus_name]:
+                    if sensor in stored:
+                        attributes[sensor] = stored[sensor]
+                        continue
+                    sensor_info = read_sensor_of_bus(bus_name, sensor)
+                    attributes[sensor] = {
+                        prop: sensor_info[prop]
+                        for prop in STATIC_PROPERTIES
+                        if prop in sensor_info
+                    }
+                    if len(attributes[sensor]) == len(STATIC_PROPERTIES):
+                        read_attributes[sensor] = attributes[sensor]
+        except OwfsError as error:
+            LOGGER.warning(f"Grainbin topology discovery failed: {error}")
+            self._loaded_at = None
+            return
+
+        if read_attributes:
+            save_sensor_identities(read_attributes, session)
+
+        self.sensors = sensors
+        self.attributes = attributes
+        self._reload_attributes = False
+        self._cycle = 0
+
+        empty = sorted(bus for bus in grainbin_busses if sensors.get(bus) == [])
+        if empty:
+            LOGGER.warning(f"No sensors found on {', '.join(empty)}")
+            self._loaded_at = None
+        else:
+            self._loaded_at = self._clock()
+
+
+TOPOLOGY = GrainbinTopology()
@@ -2,20 +2,29 @@
 import datetime
 import logging
 import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import case, cast, update
 from sqlalchemy.orm.session import Session
 
 from fd_device.database.database import get_session
 from fd_device.database.device import Grainbin
+from fd_device.database.metadata import METADATA, GrainbinMetadata
 from fd_device.grainbin.owfs_interface import (
-    get_all_busses,
     get_all_sensors_of_bus,
+    parse_temperature,
     read_sensor_of_bus,
+    read_sensor_temperature,
+    start_simultaneous_conversion,
 )
+from fd_device.grainbin.readings import readings_from_updates, write_readings
+from fd_device.grainbin.topology import TOPOLOGY, GrainbinTopology
+from fd_device.settings import get_config
 
 LOGGER = logging.getLogger("fd.grainbin.update")
+CONFIG = get_config()
 
 
 def get_grainbin_updates(session: Optional[Session] = None) -> list:
@@ -28,19 +37,52 @@ def get_grainbin_updates(session: Optional[Session] = None) -> list:
 
     all_updates: list = []
 
-    grainbins: list[Grainbin] = list(session.scalars(select(Grainbin)).all())
+    grainbins = METADATA.get_grainbins(session)
 
-    all_busses = get_all_busses()
+    all_busses: list[str] = []
+    if grainbins:
+        TOPOLOGY.start_cycle(
+            session,
+            [
+                grainbin.bus_number_string
+                for grainbin in grainbins
+                if grainbin.bus_number_string is not None
+            ],
+        )
+        all_busses = TOPOLOGY.busses
 
+    # group the grainbins by bus. Each bus is read by one worker so that
+    # access to a single 1-Wire bus is never concurrent.
+    grainbins_by_bus: dict[str, list[GrainbinMetadata]] = {}
     for grainbin in grainbins:
-        if grainbin.bus_number_string in all_busses:
-            update = get_indivudual_grainbin_update(grainbin)
-            all_updates.append(update)
+        if grainbin.bus_number_string is None:
+            LOGGER.warning(f"Grainbin {grainbin.name} has no bus, it is not updated.")
+        elif grainbin.bus_number_string in all_busses:
+            grainbins_by_bus.setdefault(grainbin.bus_number_string, []).append(grainbin)
         else:
             LOGGER.warning(
                 f"Bus {grainbin.bus_number_string} not currently connected when trying to create update."
             )
 
+    if grainbins_by_bus:
+        max_workers = min(CONFIG.GRAINBIN_UPDATE_MAX_WORKERS, len(grainbins_by_bus))
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="grainbin_update"
+        ) as executor:
+            results = executor.map(
+                get_bus_grainbin_updates,
+                grainbins_by_bus.values(),
+                [TOPOLOGY] * len(grainbins_by_bus),
+            )
+            for bus_updates in results:
+                all_updates.extend(bus_updates)
+
+    grainbin_ids = {grainbin.name: grainbin.id for grainbin in grainbins}
+    store_average_temperatures(all_updates, grainbin_ids, session)
+
+    if CONFIG.GRAINBIN_STORE_READINGS and all_updates:
+        write_readings(readings_from_updates(all_updates, grainbin_ids), session)
+
     session.commit()
     if close_session:
         session.close()
@@ -48,49 +90,173 @@ def get_grainbin_updates(session: Optional[Session] = None) -> list:
     return all_updates
 
 
-def get_indivudual_grainbin_update(grainbin: Grainbin) -> dict:
-    """Create and retrieve an update for an individual grainbin."""
+def get_grainbin_batch(
+    updates: list, device_id: str, created_at: Optional[datetime.datetime] = None
+) -> dict:
+    """Combine the grainbin updates of a cycle into one batch payload.
+
+    The device id and the cycle timestamp are sent once for the batch
+    instead of a created_at in every grainbin update. The cycle timestamp
+    defaults to when the first grainbin was read.
+    """
+
+    if created_at is None:
+        created_at = min(
+            (update["created_at"] for update in updates if "created_at" in update),
+            default=None,
+        )
+    grainbins = []
+    for grainbin_update in updates:
+        grainbin_update = dict(grainbin_update)
+        grainbin_update.pop("created_at", None)
+        grainbins.append(grainbin_update)
+
+    return {
+        "device_id": device_id,
+        "created_at": created_at or datetime.datetime.now(),
+        "grainbins": grainbins,
+    }
 
+
+def store_average_temperatures(
+    updates: list[dict], grainbin_ids: dict[str, int], session: Session
+) -> int:
+    """Write the average temperature of every grainbin update in a single UPDATE.
+
+    The new values are selected by grainbin id with a CASE expression, so
+    the number of statements does not grow with the number of grainbins.
+    Grainbin objects loaded in the session are expired by the next commit.
+
+    Returns:
+        int: the number of grainbins updated
+    """
+
+    averages = {
+        grainbin_ids[grainbin_update["name"]]: grainbin_update["average_temp"]
+        for grainbin_update in updates
+        if grainbin_update["name"] in grainbin_ids and "average_temp" in grainbin_update
+    }
+    if not averages:
+        return 0
+
+    session.execute(
+        update(Grainbin)
+        .where(Grainbin.id.in_(averages))
+        .values(
+            # the cast types the CASE when every new value is NULL
+            average_temp=cast(
+                case(averages, value=Grainbin.id), Grainbin.average_temp.type
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return len(averages)
+
+
+def get_bus_grainbin_updates(
+    grainbins: list[GrainbinMetadata], topology: Optional[GrainbinTopology] = None
+) -> list[dict]:
+    """Create the updates for all grainbins of one bus, one after another.
+
+    If a topology is given and GRAINBIN_SIMULTANEOUS_CONVERSION is enabled,
+    every sensor on the bus converts its temperature at the same time and
+    the converted values are read afterwards.
+    """
+
+    latest = False
+    bus_name = grainbins[0].bus_number_string if grainbins else None
+    simultaneous = topology is not None and CONFIG.GRAINBIN_SIMULTANEOUS_CONVERSION
+    if simultaneous and bus_name is not None:
+        latest = start_simultaneous_conversion(bus_name)
+        if latest:
+            time.sleep(CONFIG.GRAINBIN_CONVERSION_TIME)
+
+    return [
+        get_indivudual_grainbin_update(grainbin, topology, latest)
+        for grainbin in grainbins
+    ]
+
+
+def get_indivudual_grainbin_update(
+    grainbin: GrainbinMetadata,
+    topology: Optional[GrainbinTopology] = None,
+    latest: bool = False,
+) -> dict:
+    """Create and retrieve an update for an individual grainbin.
+
+    If a topology is given, the sensors of the bus and their static
+    attributes come from it and only the temperatures are read. If latest
+    is True, the values of the last simultaneous conversion are read.
+    Otherwise every sensor is discovered and read in full. A grainbin
+    without a bus has no sensors.
+    """
+
+    bus_name = grainbin.bus_number_string
     info: dict = {}
     info["created_at"] = datetime.datetime.now()
     info["name"] = grainbin.name
     info["bus_number"] = grainbin.bus_number
     info["bus_number_string"] = grainbin.bus_number_string
-    all_sensors = get_all_sensors_of_bus(grainbin.bus_number_string)
+    if bus_name is None:
+        LOGGER.warning(f"Grainbin {grainbin.name} has no bus, it has no sensors.")
+        info["sensor_names"] = []
+        info["sensor_data"] = []
+        info["average_temp"] = None
+        return info
+
+    if topology is None:
+        all_sensors = get_all_sensors_of_bus(bus_name)
+    else:
+        all_sensors = topology.get_sensors(bus_name)
     info["sensor_names"] = all_sensors
 
     temperature = []
     sensor_data = []
     for sensor in all_sensors:
-        sensor_info = read_sensor_of_bus(grainbin.bus_number_string, sensor)
+        if topology is None:
+            sensor_info = read_sensor_of_bus(bus_name, sensor)
+            sensor_info["temperature"] = parse_temperature(
+                sensor_info.get("temperature")
+            )
+        else:
+            sensor_temperature = read_sensor_temperature(
+                bus_name, sensor, latest=latest
+            )
+            if sensor_temperature is None:
+                LOGGER.warning(
+                    f"Could not read sensor {sensor} on {grainbin.bus_number_string}."
+                )
+                # the sensor may have been removed, discover it again next cycle
+                topology.invalidate()
+            sensor_info = {"temperature": parse_temperature(sensor_temperature)}
+            sensor_info.update(topology.get_attributes(sensor))
         sensor_info["sensor_name"] = sensor
-        temperature.append(sensor_info["temperature"])
+        if sensor_info["temperature"] is not None:
+            temperature.append(sensor_info["temperature"])
         sensor_data.append(sensor_info)
 
     avg_temperature = get_average_temperature(temperature)
     info["sensor_data"] = sensor_data
     info["average_temp"] = avg_temperature
-    grainbin.average_temp = avg_temperature
 
     return info
 
 
-def get_average_temperature(temperatures: list, percision: int = 4) -> str:
-    """Get the average temperature from a list of temperature strings.
+def get_average_temperature(temperatures: list, percision: int = 4) -> Optional[float]:
+    """Get the average temperature from a list of temperatures.
 
     Args:
-        temperatures (list): A list of temperature strings.
+        temperatures (list): A list of temperatures.
         percision (int, optional): The number of decimal places to round the average temperature to. Defaults to 4.
 
     Returns:
-        str: The average temperature as a string. If the list is empty, returns "N/A".
+        Optional[float]: The average temperature. If the list is empty, returns None.
     """
 
     if len(temperatures) == 0:
-        return "N/A"
+        return None
 
-    avg = round(statistics.mean([float(i) for i in temperatures]), percision)
-    return str(avg)
+    return round(statistics.mean([float(i) for i in temperatures]), percision)
 
 
 if __name__ == "__main__":
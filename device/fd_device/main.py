@@ -7,7 +7,7 @@ from multiprocessing import Process
 from multiprocessing_logging import install_mp_handler
 
 from fd_device.celery_runner import run_scheduled_tasks
-from fd_device.database.database import get_session
+from fd_device.database.database import dispose_engine, get_session
 
 from .settings import get_config
 from .startup import check_if_setup, get_rabbitmq_address
@@ -62,6 +62,11 @@ def main():
         time.sleep(5)
         return
 
+    # release the connections of the main process so they are not shared
+    # with the child processes
+    session.close()
+    dispose_engine()
+
     # device_connection = Process(target=run_connection)
     scheduler_process = Process(target=run_scheduled_tasks)
 
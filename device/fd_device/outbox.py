@@ -0,0 +1,158 @@
+"""Store updates that could not be sent and send them again later.
+
+Updates that fail to publish are written to the outbox_message table.
+drain_outbox sends them again, oldest first, in batches and at a limited
+rate, and stops at the first failure so an unreachable server is not
+retried message after message.
+"""
+import datetime
+import logging
+import time
+from typing import Callable, Optional, Sequence
+
+from kombu.utils.json import dumps, loads
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm.session import Session
+
+from fd_device.database.database import get_session
+from fd_device.database.device import OutboxMessage
+from fd_device.settings import get_config
+
+LOGGER = logging.getLogger("fd.outbox")
+CONFIG = get_config()
+
+
+def store_message(task_name: str, payload, session: Optional[Session] = None) -> int:
+    """Store an update in the outbox.
+
+    The payload is serialized with the same json encoder as celery, so
+    datetimes are sent again unchanged.
+
+    Returns:
+        int: the id of the stored message
+    """
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    message = OutboxMessage(task_name, dumps(payload))
+    session.add(message)
+    session.commit()
+    message_id = message.id
+    LOGGER.info(f"Stored '{task_name}' update {message_id} in the outbox")
+
+    if close_session:
+        session.close()
+
+    return message_id
+
+
+def drain_outbox(
+    send: Callable[[str, object], bool],
+    batch_size: Optional[int] = None,
+    rate: Optional[float] = None,
+    max_messages: Optional[int] = None,
+    session: Optional[Session] = None,
+) -> int:
+    """Send the stored updates again, oldest first.
+
+    Args:
+        send: sends a task name and payload and returns True if it was sent
+        batch_size: how many messages are loaded and deleted at a time
+        rate: how many messages are sent per second at most
+        max_messages: the most messages sent in one call
+
+    Returns:
+        int: the number of messages sent
+    """
+
+    batch_size = CONFIG.OUTBOX_DRAIN_BATCH_SIZE if batch_size is None else batch_size
+    rate = CONFIG.OUTBOX_DRAIN_RATE if rate is None else rate
+    max_messages = (
+        CONFIG.OUTBOX_DRAIN_MAX_MESSAGES if max_messages is None else max_messages
+    )
+    interval = 1 / rate if rate else 0
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    sent = 0
+    failed = False
+    while not failed and sent < max_messages:
+        messages = session.scalars(
+            select(OutboxMessage)
+            .order_by(OutboxMessage.id)
+            .limit(min(batch_size, max_messages - sent))
+        ).all()
+        if not messages:
+            break
+
+        sent_ids = _send_batch(messages, send, interval, wait_first=sent > 0)
+        failed = len(sent_ids) < len(messages)
+        if sent_ids:
+            session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(sent_ids)))
+        session.commit()
+        sent += len(sent_ids)
+
+    if failed:
+        LOGGER.info(f"Sent {sent} updates from the outbox, stopped at a failed send")
+    elif sent:
+        LOGGER.info(f"Sent {sent} updates from the outbox")
+
+    if close_session:
+        session.close()
+
+    return sent
+
+
+def _send_batch(
+    messages: Sequence[OutboxMessage],
+    send: Callable[[str, object], bool],
+    interval: float,
+    wait_first: bool,
+) -> list[int]:
+    """Send the messages one after another, waiting interval seconds between them.
+
+    Sending stops at the first failure, which is counted on the message.
+
+    Returns:
+        list[int]: the ids of the messages that were sent
+    """
+
+    sent_ids: list[int] = []
+    for message in messages:
+        if interval and (wait_first or sent_ids):
+            time.sleep(interval)
+        if not send(message.task_name, loads(message.payload)):
+            message.attempts += 1
+            message.last_attempt = datetime.datetime.now()
+            break
+        sent_ids.append(message.id)
+    return sent_ids
+
+
+def get_outbox_status(session: Optional[Session] = None) -> dict:
+    """Return the number and age of the stored updates."""
+
+    close_session = False
+    if not session:
+        close_session = True
+        session = get_session()
+
+    count, oldest, last_attempt = session.execute(
+        select(
+            func.count(OutboxMessage.id),
+            func.min(OutboxMessage.created_at),
+            func.max(OutboxMessage.last_attempt),
+        )
+    ).one()
+    session.commit()
+
+    if close_session:
+        session.close()
+
+    return {"messages": count, "oldest": oldest, "last_attempt": last_attempt}
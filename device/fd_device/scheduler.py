@@ -0,0 +1,287 @@
+"""Run the scheduled jobs at a fixed rate, each on its own thread.
+
+Every job has its own worker thread, so a slow grainbin update does not
+delay the device update. Run times are multiples of the job interval on
+the wall clock, shifted by a random offset that is chosen once per job.
+By default the offset is anywhere in the interval, so devices started at
+the same time spread their sends over the whole interval instead of all
+sending at the same moment. Run times are computed from the clock and not
+from the end of the previous run, so the schedule does not drift.
+
+If a job is still running when it is due again, its overlap policy
+decides what happens to the new run:
+
+    skip: the run is dropped
+    queue: the run waits for the running one. Every run is kept
+    coalesce: the run waits for the running one. At most one is kept
+"""
+import json
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+LOGGER = logging.getLogger("fd.scheduler")
+
+SKIP = "skip"
+QUEUE = "queue"
+COALESCE = "coalesce"
+OVERLAP_POLICIES = (SKIP, QUEUE, COALESCE)
+
+# the longest the scheduler sleeps before looking at the clock again, so a
+# clock that is set (eg. by NTP after boot) is noticed. In seconds
+MAX_SLEEP = 60
+
+
+class JobStats:
+    """The runtime statistics of a job."""
+
+    def __init__(self):
+        """Create the JobStats object."""
+
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_started: Optional[float] = None
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        # how long after its due time the latest run started. In seconds
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+
+    def add_run(self, started: float, duration: float, lateness: float, failed: bool):
+        """Add a finished run to the statistics."""
+
+        self.runs += 1
+        if failed:
+            self.failures += 1
+        self.last_started = started
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        self.total_duration += duration
+        self.last_lateness = lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+
+    def as_dict(self) -> dict:
+        """Return the statistics as a dictionary."""
+
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_started": self.last_started,
+            "last_duration": round(self.last_duration, 6),
+            "max_duration": round(self.max_duration, 6),
+            "mean_duration": round(self.total_duration / self.runs, 6)
+            if self.runs
+            else 0.0,
+            "last_lateness": round(self.last_lateness, 6),
+            "max_lateness": round(self.max_lateness, 6),
+        }
+
+
+class Job:
+    """A function that is run every interval seconds on its own thread."""
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        func: Callable[[], object],
+        interval: float,
+        name: Optional[str] = None,
+        overlap: str = SKIP,
+        offset: float = 0.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """Create the Job object."""
+
+        if interval <= 0:
+            raise ValueError(f"The interval must be positive, not {interval}")
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"Unknown overlap policy '{overlap}'")
+
+        self.func = func
+        self.interval = interval
+        self.name = name or func.__name__
+        self.overlap = overlap
+        self.offset = offset
+        self.next_run: Optional[float] = None
+        self.stats = JobStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+        # runs that are running or waiting to run
+        self._active = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"job_{self.name}"
+        )
+
+    def schedule_next(self, now: float):
+        """Set next_run to the first run time after now."""
+
+        slot = math.floor((now - self.offset) / self.interval) + 1
+        self.next_run = slot * self.interval + self.offset
+
+    def submit(self, due: float) -> bool:
+        """Start a run that was due at due, following the overlap policy.
+
+        Returns:
+            bool: False if the run was dropped
+        """
+
+        with self._lock:
+            limit = {SKIP: 1, COALESCE: 2}.get(self.overlap)
+            if limit is not None and self._active >= limit:
+                self.stats.skipped += 1
+                LOGGER.warning(f"Job '{self.name}' is still running, run dropped")
+                return False
+            self._active += 1
+        self._executor.submit(self._run, due)
+        return True
+
+    def shutdown(self, wait: bool = True):
+        """Stop the job thread once the submitted runs are done."""
+
+        self._executor.shutdown(wait=wait)
+
+    def get_stats(self) -> dict:
+        """Return the statistics of the job as a dictionary."""
+
+        with self._lock:
+            return self.stats.as_dict()
+
+    def _run(self, due: float):
+        """Run the job and add the run to the statistics."""
+
+        started = self._clock()
+        start = time.perf_counter()
+        failed = False
+        try:
+            self.func()
+        except Exception:  # pylint: disable=broad-except
+            failed = True
+            LOGGER.exception(f"Job '{self.name}' failed")
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self._active -= 1
+                self.stats.add_run(started, duration, max(started - due, 0), failed)
+            LOGGER.debug(
+                f"Job '{self.name}' took {duration:.3f} seconds, "
+                f"started {started - due:.3f} seconds late"
+            )
+
+
+class Scheduler:
+    """Run jobs at a fixed rate until stopped."""
+
+    def __init__(
+        self, jitter: Optional[float] = None, clock: Callable[[], float] = time.time
+    ):
+        """Create the Scheduler object.
+
+        Args:
+            jitter: the largest random offset added to the run times of a job.
+                In seconds. None for up to the interval of the job
+            clock: returns the current wall clock time
+        """
+
+        self.jitter = jitter
+        self.jobs: list[Job] = []
+        self._clock = clock
+        self._stop = threading.Event()
+
+    # pylint: disable=too-many-arguments
+    def add_job(
+        self,
+        func: Callable[[], object],
+        interval: float,
+        name: Optional[str] = None,
+        overlap: str = SKIP,
+        jitter: Optional[float] = None,
+    ) -> Job:
+        """Run func every interval seconds.
+
+        Args:
+            func: the function to run
+            interval: how often to run it. In seconds
+            name: the name used in the logs and statistics. Defaults to the
+                name of the function
+            overlap: what to do when it is still running when it is due again.
+                One of 'skip', 'queue' or 'coalesce'
+            jitter: the largest random offset of the run times. Defaults to the
+                jitter of the scheduler
+
+        Returns:
+            Job: the added job
+        """
+
+        jitter = self.jitter if jitter is None else jitter
+        offset = random.uniform(
+            0, interval if jitter is None else min(jitter, interval)
+        )
+        job = Job(func, interval, name, overlap, offset, self._clock)
+        self.jobs.append(job)
+        return job
+
+    def run_pending(self) -> Optional[float]:
+        """Start every job that is due.
+
+        A job that missed several run times, for example while the clock
+        was set forward, is started once.
+
+        Returns:
+            Optional[float]: the next time a job is due, or None if there are
+            no jobs
+        """
+
+        now = self._clock()
+        for job in self.jobs:
+            if job.next_run is not None and job.next_run <= now:
+                job.submit(job.next_run)
+                job.next_run = None
+            if job.next_run is None or job.next_run - now > job.interval:
+                # first run, or the clock was set back
+                job.schedule_next(now)
+
+        return min(
+            (job.next_run for job in self.jobs if job.next_run is not None),
+            default=None,
+        )
+
+    def run(self):
+        """Run the jobs until stop is called."""
+
+        self._stop.clear()
+        while not self._stop.is_set():
+            next_run = self.run_pending()
+            if next_run is None:
+                LOGGER.warning("No more jobs for scheduler to run")
+                break
+            sleep = min(max(next_run - self._clock(), 0), MAX_SLEEP)
+            LOGGER.debug(f"scheduler sleeping for {sleep:.3f} seconds.")
+            self._stop.wait(sleep)
+
+    def stop(self):
+        """Stop run after the current loop."""
+
+        self._stop.set()
+
+    def shutdown(self, wait: bool = True):
+        """Stop the job threads once their submitted runs are done."""
+
+        for job in self.jobs:
+            job.shutdown(wait)
+
+    def snapshot(self) -> dict:
+        """Return the statistics of every job."""
+
+        return {job.name: job.get_stats() for job in self.jobs}
+
+    def log_stats(self):
+        """Log the statistics of every job as one json line."""
+
+        LOGGER.info(f"scheduler_stats {json.dumps(self.snapshot())}")
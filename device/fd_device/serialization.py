@@ -0,0 +1,90 @@
+"""Compact columnar serializer for the updates sent to the server.
+
+Every grainbin update has a list of sensor dictionaries that repeat the
+same keys for every sensor. The fd_columnar serializer sends a list of
+dictionaries that all have the same keys as one dictionary of parallel
+arrays, {"__columns__": {"sensor_name": [...], "temperature": [...]}},
+and turns it back into a list of dictionaries when the message is
+loaded. Everything else is encoded with the kombu json encoder, so
+datetimes are kept.
+
+The server has to call register_serializer and accept CONTENT_TYPE to
+receive these messages. Compression is set separately on each message
+and is decompressed by every kombu consumer.
+"""
+from kombu.serialization import register
+from kombu.utils.json import dumps as json_dumps
+from kombu.utils.json import loads as json_loads
+
+SERIALIZER_NAME = "fd_columnar"
+CONTENT_TYPE = "application/x-fd-columnar+json"
+COLUMNS_KEY = "__columns__"
+
+
+def to_columns(value):
+    """Replace every list of dictionaries with the same keys by parallel arrays."""
+
+    if isinstance(value, dict):
+        return {key: to_columns(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if _is_table(value):
+            return {
+                COLUMNS_KEY: {
+                    key: [to_columns(row[key]) for row in value] for key in value[0]
+                }
+            }
+        return [to_columns(item) for item in value]
+    return value
+
+
+def from_columns(value):
+    """Turn the parallel arrays made by to_columns back into lists of dictionaries."""
+
+    if isinstance(value, dict):
+        if len(value) == 1 and COLUMNS_KEY in value:
+            columns = value[COLUMNS_KEY]
+            keys = list(columns)
+            return [
+                {key: from_columns(item) for key, item in zip(keys, row)}
+                for row in zip(*columns.values())
+            ]
+        return {key: from_columns(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [from_columns(item) for item in value]
+    return value
+
+
+def _is_table(value) -> bool:
+    """Return True if value is at least two dictionaries with the same keys."""
+
+    if len(value) < 2 or not all(isinstance(row, dict) for row in value):
+        return False
+    keys = value[0].keys()
+    return bool(keys) and all(row.keys() == keys for row in value)
+
+
+def dumps(value) -> str:
+    """Serialize a message body with the columnar layout."""
+
+    data: str = json_dumps(to_columns(value))
+    return data
+
+
+def loads(data):
+    """Load a message body serialized with dumps."""
+
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    return from_columns(json_loads(data))
+
+
+def register_serializer():
+    """Register the fd_columnar serializer with kombu."""
+
+    register(
+        SERIALIZER_NAME,
+        dumps,
+        loads,
+        content_type=CONTENT_TYPE,
+        content_encoding="utf-8",
+    )
@@ -28,21 +28,140 @@ class Config:
     POSTGRES_USER = env("POSTGRES_USER", default="fd")
     POSTGRES_DB = env("POSTGRES_DB", default="farm_device.db")
     POSTGRES_HOST = env("POSTGRES_HOST", default="fd_database")
-    SQLALCHEMY_DATABASE_URI = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}/{POSTGRES_DB}"
+    # Where the device data is stored. Either 'postgresql' or 'sqlite'.
+    # 'sqlite' does not need the database container, which suits standalone devices
+    DATABASE_BACKEND = env.str("FD_DATABASE_BACKEND", default="postgresql")
+    SQLITE_DATABASE_PATH = env.str(
+        "FD_SQLITE_DATABASE_PATH", default="/data/farm_device.sqlite"
+    )
+    if DATABASE_BACKEND == "sqlite":
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{SQLITE_DATABASE_PATH}"
+    else:
+        SQLALCHEMY_DATABASE_URI = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}/{POSTGRES_DB}"
     # SQLALCHEMY_DATABASE_URI = "postgresql://fd:farm_device@fd_database/farm_device.db"
+    # SQLite connection settings. The journal is always in WAL mode.
+    # NORMAL only syncs at WAL checkpoints, which is safe from corruption in WAL mode
+    SQLITE_SYNCHRONOUS = "NORMAL"
+    # Bytes of the database file read through memory mapping
+    SQLITE_MMAP_SIZE = 64 * 1024 * 1024
+    # How long to wait for a lock held by another process. In milliseconds
+    SQLITE_BUSY_TIMEOUT = 5000
+    # How long the device, grainbin and connection rows are cached in memory.
+    # The cache is also cleared when they change in the same process. In seconds
+    METADATA_CACHE_TTL = 10 * 60
+    # Count the queries of each scheduled job and log them when the job finishes
+    DATABASE_QUERY_STATS = True
+    # Database connection pool. Each process has its own pool
+    SQLALCHEMY_POOL_SIZE = 2
+    SQLALCHEMY_MAX_OVERFLOW = 3
+    # Test connections before use and replace connections older than x seconds
+    SQLALCHEMY_POOL_PRE_PING = True
+    SQLALCHEMY_POOL_RECYCLE = 30 * 60
 
     RABBITMQ_USER = "fd"
     RABBITMQ_PASSWORD = "farm_monitor"
     RABBITMQ_VHOST = "farm_monitor"
 
     RABBITMQ_HOST_ADDRESS = env.str("RABBITMQ_HOST_ADDRESS", default=None)
+    # How many broker connections are kept open to publish updates. Sending
+    # waits for a free connection when all of them are in use. One for each
+    # scheduled job that sends to the server
+    BROKER_POOL_LIMIT = 4
+    # Heartbeat interval negotiated with the broker. In seconds
+    BROKER_HEARTBEAT = 60
+    # How long to wait to connect to the broker. In seconds
+    BROKER_CONNECTION_TIMEOUT = 5
+    # How often the pooled broker connection is checked and sends its heartbeat.
+    # Keep it below BROKER_HEARTBEAT / 2. In seconds
+    SCHEDULER_BROKER_CHECK_INTERVAL = 20
+
+    # OWFS (1-Wire) settings
+    OWFS_HOST = env.str("FD_OWFS_HOST", default="fd_1wire")
+    OWFS_HTTP_PORT = 2121
+    OWFS_SERVER_PORT = 4304
+    # How to talk to OWFS. Either 'http' (owhttpd) or 'owserver'
+    OWFS_BACKEND = env.str("FD_OWFS_BACKEND", default="http")
+    # owhttpd connection settings. Timeout is in seconds
+    OWFS_HTTP_TIMEOUT = 5
+    OWFS_HTTP_RETRIES = 2
+    OWFS_HTTP_RETRY_BACKOFF = 0.2
+    OWFS_HTTP_POOL_SIZE = 8
 
     # Scheduler settings
+    # Serializer of the updates sent to the server. 'fd_columnar' is smaller but
+    # the server has to register fd_device.serialization to read it
+    UPDATE_SERIALIZER = env.str("FD_UPDATE_SERIALIZER", default="json")
+    # Compression of the updates sent to the server. 'zlib', 'bzip2', 'lzma' or
+    # empty for none
+    UPDATE_COMPRESSION = env.str("FD_UPDATE_COMPRESSION", default="zlib") or None
+    # How long to wait for the results of the tasks sent together. In seconds
     SEND_TASK_GET_TIMEOUT = 5
+    # How many times a task without a result is sent again on its own
+    SEND_TASK_RETRIES = 1
+    # Send all grainbin updates of a cycle in one grainbin.update_batch task.
+    # Falls back to one grainbin.update task per grainbin if the server does not
+    # have the batch task
+    GRAINBIN_UPDATE_BATCH = True
+    # How long to use one task per grainbin before trying the batch task again. In seconds
+    GRAINBIN_UPDATE_BATCH_RETRY = 24 * 60 * 60
+    # The largest random offset added to the run times of each scheduled job, so
+    # devices do not all send at the same moment. In seconds. None spreads the
+    # run times over the whole interval of the job
+    SCHEDULER_JITTER = None
+    # How often the run time statistics of the scheduled jobs are logged. Every x minutes
+    SCHEDULER_STATS_INTERVAL = 60
     # How often to send the device update. Every x minutes
     SCHEDULER_DEVICE_UPDATE_INTERVAL = 60
     # How often to send the grainbin update. Every x minutes
     SCHEDULER_GRAINBIN_UPDATE_INTERVAL = 30
+    # How often to update the reading rollups and prune old readings. Every x minutes
+    SCHEDULER_ROLLUP_INTERVAL = 60
+    # Maximum number of grainbin busses to read at the same time
+    GRAINBIN_UPDATE_MAX_WORKERS = 8
+    # How long the grainbin bus and sensor topology is cached for. In seconds
+    GRAINBIN_TOPOLOGY_TTL = 6 * 60 * 60
+    # Check the cached topology against the bus listings every x grainbin updates
+    GRAINBIN_TOPOLOGY_CHECK_CYCLES = 4
+    # Convert the temperature of every sensor on a bus at the same time
+    GRAINBIN_SIMULTANEOUS_CONVERSION = True
+    # How long to wait for a 12 bit temperature conversion to finish. In seconds
+    GRAINBIN_CONVERSION_TIME = 0.75
+    # Store the temperature of every grainbin sensor in the grainbin_reading table
+    GRAINBIN_STORE_READINGS = True
+    # How many readings are added to the hourly and daily rollups per batch
+    GRAINBIN_ROLLUP_BATCH_SIZE = 5000
+    # Readings older than this are deleted once they are in the rollups. In days
+    GRAINBIN_READING_RETENTION_DAYS = 14
+    # Hourly rollups older than this are deleted. Daily rollups are kept. In days
+    GRAINBIN_HOURLY_ROLLUP_RETENTION_DAYS = 365
+    # How many rows are deleted per batch when pruning
+    GRAINBIN_PRUNE_BATCH_SIZE = 1000
+    # How often updates stored in the outbox are sent again. Every x minutes
+    SCHEDULER_OUTBOX_DRAIN_INTERVAL = 1
+    # How many stored updates are loaded per batch, sent per second at most,
+    # and sent per drain at most
+    OUTBOX_DRAIN_BATCH_SIZE = 50
+    OUTBOX_DRAIN_RATE = 5
+    OUTBOX_DRAIN_MAX_MESSAGES = 500
+    # How often the device interior and exterior sensors are sampled. In seconds
+    DEVICE_SENSOR_SAMPLE_INTERVAL = 15
+    # How many samples of each device sensor are kept
+    DEVICE_SENSOR_BUFFER_SIZE = 20
+    # How many of the latest samples are averaged into the reported temperature,
+    # unless it is set for the sensor role below
+    DEVICE_SENSOR_SMOOTHING_SAMPLES = 3
+    # Samples older than this are not reported. In seconds
+    DEVICE_SENSOR_MAX_AGE = 120
+    # How long the list of connected device sensors is cached for. In seconds
+    DEVICE_SENSOR_MEMBERSHIP_TTL = 60
+    # Convert every device sensor at the same time with the w1_therm therm_bulk_read
+    DEVICE_SENSOR_BULK_READ = True
+    # Resolution in bits (9 to 12) and number of samples averaged for each sensor role.
+    # A 9 bit conversion takes 94 ms, 10 bit 188 ms, 11 bit 375 ms and 12 bit 750 ms
+    DEVICE_INTERIOR_SENSOR_RESOLUTION = 10
+    DEVICE_INTERIOR_SENSOR_SAMPLES = 3
+    DEVICE_EXTERIOR_SENSOR_RESOLUTION = 10
+    DEVICE_EXTERIOR_SENSOR_SAMPLES = 3
 
 
 class DevConfig(Config):
@@ -94,7 +213,11 @@ class CeleryConfig:
         "interval_max": 30,
     }
 
-    broker_pool_limit = 0
+    # keep the broker connections open between updates instead of connecting
+    # for every task. fd_device.broker sends their heartbeats
+    broker_pool_limit = Config.BROKER_POOL_LIMIT
+    broker_heartbeat = Config.BROKER_HEARTBEAT
+    broker_connection_timeout = Config.BROKER_CONNECTION_TIMEOUT
 
 
 def get_config(override_default=None):
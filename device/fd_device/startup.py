@@ -8,6 +8,7 @@ from sqlalchemy import select as sql_select
 from sqlalchemy.orm import Session
 
 from fd_device.database.device import Connection
+from fd_device.database.metadata import METADATA
 from fd_device.database.system import Interface, SystemSetup
 from fd_device.settings import get_config
 from fd_device.system.info import get_ip_of_interface
@@ -55,6 +56,7 @@ def get_rabbitmq_address(logger, session: Session):  # noqa: C901
             )
             connection.address = config.RABBITMQ_HOST_ADDRESS
             session.commit()
+            METADATA.invalidate()
             return True
 
     # try previously found address (if available) to see if it is still working
@@ -74,6 +76,7 @@ def get_rabbitmq_address(logger, session: Session):  # noqa: C901
                 logger.info(f"'{address}' host was found and the url was valid")
                 connection.address = address
                 session.commit()
+                METADATA.invalidate()
                 return True
 
         except socket.gaierror:
@@ -126,6 +129,7 @@ def search_on_socket(logger, session, connection):
                     logger.debug(f"Found FarmMonitor at {addrinfo[0]}:{addrinfo[1]}")
                     connection.address = addrinfo[0]
                     session.commit()
+                    METADATA.invalidate()
                     return True
                 logger.debug(
                     f"Reply from {addrinfo[0]}:{addrinfo[1]}, but no rabbitmq server present"
@@ -66,7 +66,9 @@ def run_migrations_online():
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
-            target_metadata=target_metadata
+            target_metadata=target_metadata,
+            # SQLite can only alter columns by recreating the table
+            render_as_batch=connection.dialect.name == 'sqlite'
         )
 
         with context.begin_transaction():
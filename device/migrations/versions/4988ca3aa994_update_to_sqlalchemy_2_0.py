@@ -18,64 +18,71 @@ depends_on = None
 
 def upgrade():
     # ### commands auto generated by Alembic - please adjust! ###
-    op.alter_column('connection', 'first_connected',
+    with op.batch_alter_table('connection') as batch_op:
+        batch_op.alter_column('first_connected',
                existing_type=postgresql.TIMESTAMP(),
                nullable=False)
-    op.alter_column('connection', 'is_connected',
+        batch_op.alter_column('is_connected',
                existing_type=sa.BOOLEAN(),
                nullable=False)
-    op.alter_column('device', 'device_id',
+    with op.batch_alter_table('device') as batch_op:
+        batch_op.alter_column('device_id',
                existing_type=sa.VARCHAR(length=20),
                nullable=False)
-    op.alter_column('device', 'creation_time',
+        batch_op.alter_column('creation_time',
                existing_type=postgresql.TIMESTAMP(),
                nullable=False)
-    op.alter_column('device', 'last_updated',
+        batch_op.alter_column('last_updated',
                existing_type=postgresql.TIMESTAMP(),
                nullable=False)
-    op.alter_column('device', 'grainbin_count',
+        batch_op.alter_column('grainbin_count',
                existing_type=sa.INTEGER(),
                nullable=False)
-    op.alter_column('grainbin', 'name',
+    with op.batch_alter_table('grainbin') as batch_op:
+        batch_op.alter_column('name',
                existing_type=sa.VARCHAR(length=20),
                nullable=False)
-    op.alter_column('grainbin', 'creation_time',
+        batch_op.alter_column('creation_time',
                existing_type=postgresql.TIMESTAMP(),
                nullable=False)
-    op.alter_column('grainbin', 'last_updated',
+        batch_op.alter_column('last_updated',
                existing_type=postgresql.TIMESTAMP(),
                nullable=False)
-    op.alter_column('grainbin', 'average_temp',
+        batch_op.alter_column('average_temp',
                existing_type=sa.VARCHAR(length=7),
                nullable=False)
-    op.alter_column('system_hardware', 'grainbin_reader_count',
+    with op.batch_alter_table('system_hardware') as batch_op:
+        batch_op.alter_column('grainbin_reader_count',
                existing_type=sa.INTEGER(),
                nullable=False)
-    op.alter_column('system_interface', 'is_active',
+    with op.batch_alter_table('system_interface') as batch_op:
+        batch_op.alter_column('is_active',
                existing_type=sa.BOOLEAN(),
                nullable=False)
-    op.alter_column('system_interface', 'is_for_fm',
+        batch_op.alter_column('is_for_fm',
                existing_type=sa.BOOLEAN(),
                nullable=False)
-    op.alter_column('system_interface', 'is_external',
+        batch_op.alter_column('is_external',
                existing_type=sa.BOOLEAN(),
                nullable=False)
-    op.alter_column('system_setup', 'first_setup',
+    with op.batch_alter_table('system_setup') as batch_op:
+        batch_op.alter_column('first_setup',
                existing_type=sa.BOOLEAN(),
                nullable=False)
-    op.alter_column('system_setup', 'first_setup_time',
+        batch_op.alter_column('first_setup_time',
                existing_type=postgresql.TIMESTAMP(),
                nullable=False)
-    op.alter_column('system_setup', 'standalone_configuration',
+        batch_op.alter_column('standalone_configuration',
                existing_type=sa.BOOLEAN(),
                nullable=False)
-    op.alter_column('system_wifi', 'name',
+    with op.batch_alter_table('system_wifi') as batch_op:
+        batch_op.alter_column('name',
                existing_type=sa.VARCHAR(length=20),
                nullable=False)
-    op.alter_column('system_wifi', 'password',
+        batch_op.alter_column('password',
                existing_type=sa.VARCHAR(length=20),
                nullable=False)
-    op.alter_column('system_wifi', 'mode',
+        batch_op.alter_column('mode',
                existing_type=sa.VARCHAR(length=20),
                nullable=False)
     # ### end Alembic commands ###
@@ -83,64 +90,71 @@ def upgrade():
 
 def downgrade():
     # ### commands auto generated by Alembic - please adjust! ###
-    op.alter_column('system_wifi', 'mode',
+    with op.batch_alter_table('system_wifi') as batch_op:
+        batch_op.alter_column('mode',
                existing_type=sa.VARCHAR(length=20),
                nullable=True)
-    op.alter_column('system_wifi', 'password',
+        batch_op.alter_column('password',
                existing_type=sa.VARCHAR(length=20),
                nullable=True)
-    op.alter_column('system_wifi', 'name',
+        batch_op.alter_column('name',
                existing_type=sa.VARCHAR(length=20),
                nullable=True)
-    op.alter_column('system_setup', 'standalone_configuration',
+    with op.batch_alter_table('system_setup') as batch_op:
+        batch_op.alter_column('standalone_configuration',
                existing_type=sa.BOOLEAN(),
                nullable=True)
-    op.alter_column('system_setup', 'first_setup_time',
+        batch_op.alter_column('first_setup_time',
                existing_type=postgresql.TIMESTAMP(),
                nullable=True)
-    op.alter_column('system_setup', 'first_setup',
+        batch_op.alter_column('first_setup',
                existing_type=sa.BOOLEAN(),
                nullable=True)
-    op.alter_column('system_interface', 'is_external',
+    with op.batch_alter_table('system_interface') as batch_op:
+        batch_op.alter_column('is_external',
                existing_type=sa.BOOLEAN(),
                nullable=True)
-    op.alter_column('system_interface', 'is_for_fm',
+        batch_op.alter_column('is_for_fm',
                existing_type=sa.BOOLEAN(),
                nullable=True)
-    op.alter_column('system_interface', 'is_active',
+        batch_op.alter_column('is_active',
                existing_type=sa.BOOLEAN(),
                nullable=True)
-    op.alter_column('system_hardware', 'grainbin_reader_count',
+    with op.batch_alter_table('system_hardware') as batch_op:
+        batch_op.alter_column('grainbin_reader_count',
                existing_type=sa.INTEGER(),
                nullable=True)
-    op.alter_column('grainbin', 'average_temp',
+    with op.batch_alter_table('grainbin') as batch_op:
+        batch_op.alter_column('average_temp',
                existing_type=sa.VARCHAR(length=7),
                nullable=True)
-    op.alter_column('grainbin', 'last_updated',
+        batch_op.alter_column('last_updated',
                existing_type=postgresql.TIMESTAMP(),
                nullable=True)
-    op.alter_column('grainbin', 'creation_time',
+        batch_op.alter_column('creation_time',
                existing_type=postgresql.TIMESTAMP(),
                nullable=True)
-    op.alter_column('grainbin', 'name',
+        batch_op.alter_column('name',
                existing_type=sa.VARCHAR(length=20),
                nullable=True)
-    op.alter_column('device', 'grainbin_count',
+    with op.batch_alter_table('device') as batch_op:
+        batch_op.alter_column('grainbin_count',
                existing_type=sa.INTEGER(),
                nullable=True)
-    op.alter_column('device', 'last_updated',
+        batch_op.alter_column('last_updated',
                existing_type=postgresql.TIMESTAMP(),
                nullable=True)
-    op.alter_column('device', 'creation_time',
+        batch_op.alter_column('creation_time',
                existing_type=postgresql.TIMESTAMP(),
                nullable=True)
-    op.alter_column('device', 'device_id',
+        batch_op.alter_column('device_id',
                existing_type=sa.VARCHAR(length=20),
                nullable=True)
-    op.alter_column('connection', 'is_connected',
+    with op.batch_alter_table('connection') as batch_op:
+        batch_op.alter_column('is_connected',
                existing_type=sa.BOOLEAN(),
                nullable=True)
-    op.alter_column('connection', 'first_connected',
+        batch_op.alter_column('first_connected',
                existing_type=postgresql.TIMESTAMP(),
                nullable=True)
     # ### end Alembic commands ###
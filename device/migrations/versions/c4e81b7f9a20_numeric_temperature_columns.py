@@ -0,0 +1,99 @@
+"""numeric temperature columns
+
+Revision ID: c4e81b7f9a20
+Revises: a61f0c8d2e94
+Create Date: 2026-10-18 15:20:08.563112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e81b7f9a20'
+down_revision = 'a61f0c8d2e94'
+branch_labels = None
+depends_on = None
+
+# table -> temperature columns stored as strings before this revision
+COLUMNS = {
+    'device': ('interior_temp', 'exterior_temp'),
+    'grainbin': ('average_temp',),
+}
+
+
+def _to_float(value):
+    """Convert a stored temperature string. Sentinels like 'U', 'N/A' and 'unknown' become NULL."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def upgrade():
+    connection = op.get_bind()
+
+    # read the existing values before the column types change
+    values = {}
+    for table, columns in COLUMNS.items():
+        rows = connection.execute(
+            sa.text(f"SELECT id, {', '.join(columns)} FROM {table}")
+        ).all()
+        values[table] = [
+            {'id': row[0], **{column: _to_float(row[i + 1]) for i, column in enumerate(columns)}}
+            for row in rows
+        ]
+
+    with op.batch_alter_table('device') as batch_op:
+        batch_op.alter_column('interior_temp',
+               existing_type=sa.String(length=7),
+               type_=sa.Float(),
+               existing_nullable=True,
+               postgresql_using='NULL')
+        batch_op.alter_column('exterior_temp',
+               existing_type=sa.String(length=7),
+               type_=sa.Float(),
+               existing_nullable=True,
+               postgresql_using='NULL')
+
+    with op.batch_alter_table('grainbin') as batch_op:
+        batch_op.alter_column('average_temp',
+               existing_type=sa.String(length=7),
+               type_=sa.Float(),
+               nullable=True,
+               postgresql_using='NULL')
+
+    # write the converted values back
+    for table, columns in COLUMNS.items():
+        if values[table]:
+            assignments = ', '.join(f"{column} = :{column}" for column in columns)
+            connection.execute(
+                sa.text(f"UPDATE {table} SET {assignments} WHERE id = :id"),
+                values[table],
+            )
+
+
+def downgrade():
+    with op.batch_alter_table('grainbin') as batch_op:
+        batch_op.alter_column('average_temp',
+               existing_type=sa.Float(),
+               type_=sa.String(length=7),
+               existing_nullable=True,
+               postgresql_using='average_temp::varchar(7)')
+    op.execute("UPDATE grainbin SET average_temp = 'unknown' WHERE average_temp IS NULL")
+    with op.batch_alter_table('grainbin') as batch_op:
+        batch_op.alter_column('average_temp',
+               existing_type=sa.String(length=7),
+               nullable=False)
+
+    with op.batch_alter_table('device') as batch_op:
+        batch_op.alter_column('interior_temp',
+               existing_type=sa.Float(),
+               type_=sa.String(length=7),
+               existing_nullable=True,
+               postgresql_using='interior_temp::varchar(7)')
+        batch_op.alter_column('exterior_temp',
+               existing_type=sa.Float(),
+               type_=sa.String(length=7),
+               existing_nullable=True,
+               postgresql_using='exterior_temp::varchar(7)')
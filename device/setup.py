@@ -7,7 +7,7 @@ __version__ = "0.1"
 setup(
     name="fd_device",
     version=__version__,
-    packages=find_packages(exclude=["tests"]),
+    packages=find_packages(exclude=["tests", "benchmarks"]),
     install_requires=[
         "click",
         "sqlalchemy",
@@ -5,12 +5,17 @@
 # It will wait for the database to be ready, then run any migrations
 # and then start fd_device.
 
-# Wait for the database to be ready
-echo "Waiting for database to be ready..."
-while ! nc -z fd_database 5432; do
-  sleep 0.1
-done
-echo "Database is ready!"
+# Wait for the database to be ready. The SQLite database is a local file,
+# so there is nothing to wait for.
+if [ "$FD_DATABASE_BACKEND" = "sqlite" ]; then
+  echo "Using the SQLite database, not waiting for the database container"
+else
+  echo "Waiting for database to be ready..."
+  while ! nc -z fd_database 5432; do
+    sleep 0.1
+  done
+  echo "Database is ready!"
+fi
 
 # Run migrations
 echo "Running database migrations..."
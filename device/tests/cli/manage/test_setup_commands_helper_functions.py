@@ -1,14 +1,38 @@
 """Tests for the helper functions of the setup_commands module."""
+import datetime
 import random
 
 import pytest
-from sqlalchemy import select
+from sqlalchemy import event, func, select
 
 from fd_device.cli.manage.setup_commands import initialize_device, initialize_grainbin
-from fd_device.database.device import Device
+from fd_device.database.database import dispose_engine, get_engine
+from fd_device.database.device import (
+    Device,
+    GrainbinReading,
+    GrainbinReadingRollup,
+    RollupState,
+)
+from fd_device.grainbin.readings import write_readings
+from fd_device.grainbin.rollup import update_rollups
 from fd_device.system.control import set_hardware_info, set_software_info
 
 
+@pytest.fixture()
+def foreign_keys():
+    """Enforce the foreign keys on SQLite, as PostgreSQL does."""
+
+    def enable(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    engine = get_engine()
+    event.listen(engine, "connect", enable)
+    dispose_engine()
+    yield
+    event.remove(engine, "connect", enable)
+    dispose_engine()
+
+
 @pytest.mark.usefixtures("tables")
 def test_initialize_grainbin():
     """Test the initialize_grainbin function."""
@@ -71,3 +95,36 @@ def test_initialize_device_twice(dbsession):
     initialize_device()
     device_second = dbsession.execute(select(Device)).scalar_one()
     assert len(device_second.grainbins) == number_of_grainbins_second_time
+
+
+@pytest.mark.usefixtures("tables", "foreign_keys")
+def test_initialize_device_twice_with_readings(dbsession):
+    """The readings and rollups of the grainbins are deleted with them."""
+
+    set_hardware_info("TEST_HARDWARE_VERSION", "2")
+    set_software_info("TEST_SOFTWARE_VERSION")
+    initialize_device()
+    device = dbsession.execute(select(Device)).scalar_one()
+    write_readings(
+        [
+            {
+                "timestamp": datetime.datetime(2024, 5, 1, 12, 0),
+                "grainbin_id": grainbin.id,
+                "sensor_name": "sensor_1",
+                "cable": 1,
+                "position": 1,
+                "temperature": 20.0,
+            }
+            for grainbin in device.grainbins
+        ],
+        session=dbsession,
+    )
+    update_rollups(session=dbsession)
+    dbsession.close()
+
+    initialize_device()
+
+    device = dbsession.execute(select(Device)).scalar_one()
+    assert len(device.grainbins) == 2
+    for model in (GrainbinReading, GrainbinReadingRollup, RollupState):
+        assert dbsession.scalar(select(func.count()).select_from(model)) == 0
@@ -4,6 +4,7 @@
 import pytest
 
 from fd_device.database.database import create_all_tables, drop_all_tables, get_session
+from fd_device.database.metadata import METADATA
 
 
 @pytest.fixture(scope="session")
@@ -16,6 +17,7 @@ def dbsession():
 def tables(dbsession):
     """Create all tables for testing. Delete when done."""
     create_all_tables()
+    METADATA.invalidate()
     yield
     dbsession.close()
     drop_all_tables()
@@ -0,0 +1,111 @@
+"""Test the database engine and session management."""
+import os
+
+import pytest
+
+from fd_device.database import database
+from fd_device.database.database import (
+    dispose_engine,
+    get_engine,
+    get_session,
+    remove_session,
+)
+from fd_device.settings import get_config
+
+
+@pytest.fixture()
+def scoped_session():
+    """Restore the session of the current scope after the test replaces it."""
+
+    session = get_session()
+    yield session
+    database.db_session.registry.set(session)
+
+
+def test_get_engine_is_created_once():
+    """The engine is created on first use and reused."""
+
+    engine = get_engine()
+
+    assert get_engine() is engine
+    assert get_session().get_bind() is engine
+
+
+def test_get_engine_pool_settings():
+    """The connection pool is configured from the settings."""
+
+    config = get_config()
+    pool = get_engine().pool
+
+    assert pool.size() == config.SQLALCHEMY_POOL_SIZE
+    assert pool._pre_ping is config.SQLALCHEMY_POOL_PRE_PING
+    assert pool._recycle == config.SQLALCHEMY_POOL_RECYCLE
+
+
+def test_sqlite_connection_settings():
+    """Test SQLite connections use WAL mode and the configured settings."""
+
+    config = get_config()
+    with get_engine().connect() as connection:
+        pragma = connection.exec_driver_sql
+
+        assert pragma("PRAGMA journal_mode").scalar() == "wal"
+        assert pragma("PRAGMA synchronous").scalar() == 1
+        assert pragma("PRAGMA busy_timeout").scalar() == config.SQLITE_BUSY_TIMEOUT
+
+
+def test_remove_session(scoped_session):
+    """A new session is created after the scope is released."""
+
+    remove_session()
+
+    assert get_session() is not scoped_session
+
+
+def test_dispose_engine(mocker):
+    """Disposing keeps the engine and discards its connections."""
+
+    engine = get_engine()
+    dispose = mocker.patch.object(engine, "dispose")
+
+    dispose_engine(close=False)
+
+    dispose.assert_called_once_with(close=False)
+    assert get_engine() is engine
+
+
+def test_after_fork_in_child(mocker, scoped_session):
+    """The inherited session is dropped without closing it."""
+
+    close = mocker.patch.object(scoped_session, "close")
+    dispose = mocker.patch("fd_device.database.database.dispose_engine")
+
+    database._after_fork_in_child()  # pylint: disable=protected-access
+
+    assert get_session() is not scoped_session
+    close.assert_not_called()
+    dispose.assert_called_once_with(close=False)
+
+
+def test_fork_child_gets_new_connections():
+    """A forked child does not inherit the pooled connections of the parent."""
+
+    engine = get_engine()
+    with engine.connect():
+        pass
+    assert engine.pool.checkedin() == 1
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        os.close(read_fd)
+        os.write(write_fd, str(engine.pool.checkedin()).encode())
+        os._exit(0)  # pylint: disable=protected-access
+
+    os.close(write_fd)
+    result = os.read(read_fd, 8)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+
+    assert result == b"0"
+    assert engine.pool.checkedin() == 1
@@ -3,7 +3,7 @@ import datetime as dt
 
 import pytest
 
-from fd_device.database.device import Connection, Device, Grainbin
+from fd_device.database.device import Connection, Device, Grainbin, GrainbinSensor
 
 from ..factories import DeviceFactory, GrainbinFactory
 
@@ -150,4 +150,22 @@ class TestGrainbin:
         assert isinstance(grainbin.bus_number, int)
         assert isinstance(grainbin.creation_time, dt.datetime)
         assert isinstance(grainbin.last_updated, dt.datetime)
-        assert grainbin.average_temp == "unknown"
+        assert grainbin.average_temp is None
+
+
+@pytest.mark.usefixtures("tables")
+class TestGrainbinSensor:
+    """GrainbinSensor model tests."""
+
+    @staticmethod
+    def test_create_grainbin_sensor():
+        """Create a GrainbinSensor instance."""
+
+        sensor = GrainbinSensor.create(
+            sensor_name="28.CC9A290D0000", temphigh="1", templow="2"
+        )
+
+        assert repr(sensor) == "<GrainbinSensor sensor_name=28.CC9A290D0000>"
+        assert sensor.temphigh == "1"
+        assert sensor.templow == "2"
+        assert isinstance(sensor.last_updated, dt.datetime)
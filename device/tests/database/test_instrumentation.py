@@ -0,0 +1,106 @@
+"""Test the query instrumentation."""
+import json
+import logging
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+
+from fd_device.database.database import get_session
+from fd_device.database.device import Grainbin
+from fd_device.database.instrumentation import QUERY_STATS, QueryStats, track_queries
+
+from ..factories import GrainbinFactory
+
+pytestmark = pytest.mark.usefixtures("tables")
+
+
+@pytest.fixture(autouse=True)
+def clear_stats():
+    """Start every test with an empty registry."""
+    QUERY_STATS.clear()
+    yield
+    QUERY_STATS.clear()
+
+
+def test_track_queries(dbsession):
+    """The queries in the block are counted for the job."""
+
+    GrainbinFactory.create_batch(2)
+    dbsession.commit()
+
+    with track_queries("job") as stats:
+        dbsession.scalars(select(Grainbin)).all()
+        dbsession.execute(text("UPDATE grainbin SET average_temp = 1.5"))
+        dbsession.commit()
+
+    assert stats.query_count == 2
+    assert stats.row_count == 2
+    assert stats.total_time >= stats.max_time > 0
+    assert stats.slowest_statement is not None
+    assert QUERY_STATS.get("job") is stats
+
+
+def test_queries_outside_a_job_are_not_counted(dbsession):
+    """Only queries inside the block are counted."""
+
+    dbsession.scalars(select(Grainbin)).all()
+    with track_queries("job") as stats:
+        pass
+    dbsession.scalars(select(Grainbin)).all()
+
+    assert stats.query_count == 0
+
+
+def test_track_queries_failed_statement(dbsession):
+    """A failed statement is not counted and the job is still recorded."""
+
+    with pytest.raises(OperationalError):
+        with track_queries("job") as stats:
+            dbsession.execute(text("SELECT * FROM missing_table"))
+    dbsession.rollback()
+
+    assert stats.query_count == 0
+    assert QUERY_STATS.get("job") is stats
+
+
+def test_track_queries_logs(caplog):
+    """The statistics are logged as a json line."""
+
+    with caplog.at_level(logging.INFO, logger="fd.database.instrumentation"):
+        with track_queries("job"):
+            get_session().scalars(select(Grainbin)).all()
+
+    line = caplog.records[-1].getMessage()
+    assert line.startswith("query_stats ")
+    assert json.loads(line.split(" ", 1)[1])["query_count"] == 1
+
+
+def test_registry_snapshot():
+    """The registry keeps the latest run and the totals of each job."""
+
+    for count in (2, 3):
+        stats = QueryStats("job")
+        for _ in range(count):
+            stats.add_query("SELECT 1", 0.1, 1)
+        QUERY_STATS.record(stats)
+
+    snapshot = QUERY_STATS.snapshot()
+
+    assert snapshot["job"]["latest"]["query_count"] == 3
+    assert snapshot["job"]["totals"]["runs"] == 2
+    assert snapshot["job"]["totals"]["query_count"] == 5
+    assert snapshot["job"]["totals"]["row_count"] == 5
+
+
+def test_slowest_statement():
+    """The slowest statement is kept with its whitespace collapsed."""
+
+    stats = QueryStats("job")
+    stats.add_query("SELECT 1", 0.1, -1)
+    stats.add_query("SELECT\n    2", 0.3, -1)
+    stats.add_query("SELECT 3", 0.2, -1)
+
+    assert stats.max_time == 0.3
+    assert stats.slowest_statement == "SELECT 2"
+    assert stats.row_count == 0
@@ -0,0 +1,79 @@
+"""Test the metadata cache."""
+import pytest
+from sqlalchemy import update
+
+from fd_device.database.device import Connection, Device
+from fd_device.database.metadata import MetadataCache
+
+from ..factories import DeviceFactory, GrainbinFactory
+
+pytestmark = pytest.mark.usefixtures("tables")
+
+
+def test_get_device_is_cached(dbsession):
+    """The device is read once and kept until the cache is invalidated."""
+
+    device = DeviceFactory(interior_sensor="sensor_1")
+    device_pk = device.id
+    cache = MetadataCache()
+
+    assert cache.get_device(dbsession).interior_sensor == "sensor_1"
+
+    dbsession.execute(
+        update(Device).where(Device.id == device_pk).values(interior_sensor="other")
+    )
+    assert cache.get_device(dbsession).interior_sensor == "sensor_1"
+
+    cache.invalidate()
+    assert cache.get_device(dbsession).interior_sensor == "other"
+
+
+def test_get_device_not_setup(dbsession):
+    """No device is returned before setup."""
+
+    assert MetadataCache().get_device(dbsession) is None
+
+
+def test_get_grainbins(dbsession):
+    """The grainbins are returned in id order."""
+
+    grainbins = GrainbinFactory.create_batch(2)
+    names = [grainbin.name for grainbin in grainbins]
+
+    cached = MetadataCache().get_grainbins(dbsession)
+
+    assert [grainbin.name for grainbin in cached] == names
+    assert cached[0].bus_number_string == f"bus.{cached[0].bus_number}"
+
+
+def test_get_connection_address(dbsession):
+    """The server address is returned."""
+
+    Connection.create(address="10.0.0.1")
+
+    assert MetadataCache().get_connection_address(dbsession) == "10.0.0.1"
+
+
+def test_save_invalidates(dbsession, mocker):
+    """Saving a cached model through the CRUDMixin invalidates the cache."""
+
+    cache = MetadataCache()
+    mocker.patch("fd_device.database.metadata.METADATA", cache)
+    grainbin = GrainbinFactory()
+    assert len(cache.get_grainbins(dbsession)) == 1
+
+    grainbin.update(bus_number_string="bus.9")
+
+    assert cache.get_grainbins(dbsession)[0].bus_number_string == "bus.9"
+
+
+def test_ttl():
+    """The cache is stale once it is older than the ttl."""
+
+    now = [0.0]
+    cache = MetadataCache(ttl=10, clock=lambda: now[0])
+    cache.get_device()
+
+    assert not cache.is_stale()
+    now[0] = 11.0
+    assert cache.is_stale()
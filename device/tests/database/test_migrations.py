@@ -0,0 +1,27 @@
+"""Test the alembic migrations."""
+from alembic import command
+from alembic.config import Config as AlConfig
+from sqlalchemy import create_engine, inspect
+
+from fd_device.database.database import Base
+from fd_device.settings import get_config
+
+
+def test_migrations_on_sqlite(tmp_path, mocker):
+    """The migrations upgrade and downgrade a SQLite database."""
+
+    config = get_config()
+    url = f"sqlite:///{tmp_path / 'migrations.sqlite'}"
+    mocker.patch.object(config, "SQLALCHEMY_DATABASE_URI", url)
+    alembic_cnf = AlConfig(config.PROJECT_ROOT + "/migrations/alembic.ini")
+    alembic_cnf.set_main_option("script_location", config.PROJECT_ROOT + "/migrations")
+    engine = create_engine(url)
+
+    command.upgrade(alembic_cnf, "head")
+    tables = set(inspect(engine).get_table_names())
+    command.downgrade(alembic_cnf, "base")
+    remaining = set(inspect(engine).get_table_names())
+    engine.dispose()
+
+    assert tables == set(Base.metadata.tables) | {"alembic_version"}
+    assert remaining == {"alembic_version"}
@@ -1,7 +1,22 @@
 """Temperature module tests."""
+import os
 import random
+from collections import deque
 
-from fd_device.device.temperature import get_connected_sensors, temperature
+import pytest
+
+from fd_device.device.temperature import (
+    MEMBERSHIP,
+    SensorMembership,
+    TemperatureSampler,
+    bulk_convert,
+    get_connected_sensors,
+    read_many,
+    set_resolution,
+    temperature,
+)
+
+from ..helpers import FakeClock
 
 
 def test_temperature(mocker):
@@ -76,7 +91,7 @@ def test_get_connected_sensors_with_temp(mocker):
     )
 
     mocker.patch(
-        "fd_device.device.temperature._read_temperature",
+        "fd_device.device.temperature._read_w1_slave",
         return_value=random.uniform(-40, 100),
         autospec=True,
     )
@@ -84,3 +99,260 @@ def test_get_connected_sensors_with_temp(mocker):
     sensors = get_connected_sensors(values=True)
 
     assert isinstance(sensors[0]["temperature"], float)
+
+
+def test_sampler_smooths_latest_samples(mocker):
+    """The reading is the average of the latest samples."""
+
+    mocker.patch(
+        "fd_device.device.temperature._read_temperature",
+        side_effect=[10.0, 20.0, 30.0, 40.0],
+        autospec=True,
+    )
+    clock = FakeClock(1_700_000_000.0)
+    sampler = TemperatureSampler(
+        buffer_size=3, smoothing=2, max_age=60, bulk_read=False, clock=clock
+    )
+    sampler.samples["sensor_1"] = deque(maxlen=3)
+
+    for _ in range(4):
+        clock.now += 1
+        sampler.sample_all()
+
+    reading = sampler.get_reading("sensor_1")
+
+    assert list(value for _, value in sampler.samples["sensor_1"]) == [20.0, 30.0, 40.0]
+    assert reading.temperature == 35.0
+    assert reading.sample_count == 2
+    assert reading.timestamp.timestamp() == clock.now
+
+
+def test_sampler_ignores_old_and_invalid_samples(mocker):
+    """Samples older than max_age and failed reads are not reported."""
+
+    mocked_read = mocker.patch(
+        "fd_device.device.temperature._read_temperature",
+        return_value=10.0,
+        autospec=True,
+    )
+    clock = FakeClock(1_700_000_000.0)
+    sampler = TemperatureSampler(max_age=60, bulk_read=False, clock=clock)
+    sampler.watch(interior="sensor_1")
+    sampler.stop()
+
+    mocked_read.return_value = "U"
+    clock.now += 61
+    sampler.sample_all()
+
+    reading = sampler.get_reading("sensor_1")
+
+    assert reading.temperature is None
+    assert reading.timestamp is None
+    assert reading.sample_count == 0
+
+
+def test_sampler_first_reading_is_sampled(mocker):
+    """A sensor that was never sampled is read when asked for."""
+
+    mocked_read = mocker.patch(
+        "fd_device.device.temperature._read_temperature",
+        return_value=12.345,
+        autospec=True,
+    )
+    sampler = TemperatureSampler()
+    sampler.samples["sensor_1"] = deque()
+
+    reading = sampler.get_reading("sensor_1")
+
+    assert reading.temperature == 12.35
+    assert reading.sample_count == 1
+    mocked_read.assert_called_once_with("sensor_1")
+
+
+def test_sampler_watch_starts_thread(mocker):
+    """Watching sensors starts the thread and drops unwatched sensors."""
+
+    mocker.patch(
+        "fd_device.device.temperature._read_temperature",
+        return_value=10.0,
+        autospec=True,
+    )
+    sampler = TemperatureSampler(interval=60, bulk_read=False)
+
+    sampler.watch(interior="sensor_1", exterior="sensor_2")
+    assert sampler.is_running
+    sampler.watch(exterior="sensor_2")
+    sampler.stop()
+
+    assert not sampler.is_running
+    assert list(sampler.samples) == ["sensor_2"]
+    assert sampler.roles == {"sensor_2": "exterior"}
+
+
+@pytest.fixture()
+def w1_devices(tmp_path, mocker):
+    """A fake w1 sysfs directory with two sensors."""
+
+    master = tmp_path / "w1_bus_master1"
+    master.mkdir()
+    (master / "w1_master_slaves").write_text("sensor_1\nsensor_2\n")
+    (master / "therm_bulk_read").write_text("0\n")
+    for name, value in (("sensor_1", "21500"), ("sensor_2", "-3125")):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "temperature").write_text(f"{value}\n")
+        (tmp_path / name / "resolution").write_text("12\n")
+
+    mocker.patch("fd_device.device.temperature.W1_DEVICES_DIR", str(tmp_path))
+    mocker.patch("fd_device.device.temperature.W1_MASTER_DIR", str(master))
+    MEMBERSHIP.invalidate()
+    mocker.patch.dict(
+        "fd_device.device.temperature.CONVERSION_TIMES", {10: 0.0, 12: 0.0}
+    )
+    return tmp_path
+
+
+def test_set_resolution(w1_devices):
+    """The resolution is written to the sensor."""
+
+    assert set_resolution("sensor_1", 10)
+    assert (w1_devices / "sensor_1" / "resolution").read_text() == "10\n"
+    assert not set_resolution("sensor_3", 10)
+
+
+def test_bulk_convert(w1_devices):
+    """The bulk conversion is triggered on the bus master."""
+
+    assert bulk_convert()
+    assert (w1_devices / "w1_bus_master1" / "therm_bulk_read").read_text() == (
+        "trigger\n"
+    )
+
+
+def test_bulk_convert_not_available(w1_devices, mocker):
+    """Bulk conversion fails when there is no bus master."""
+
+    mocker.patch(
+        "fd_device.device.temperature.W1_MASTER_DIR", str(w1_devices / "missing")
+    )
+
+    assert not bulk_convert()
+
+
+def test_sampler_bulk_read(w1_devices, mocker):
+    """The sampler reads the converted values after a bulk conversion."""
+
+    mocked_read = mocker.patch(
+        "fd_device.device.temperature._read_temperature",
+        autospec=True,
+    )
+    sampler = TemperatureSampler(bulk_read=True)
+    sampler.samples["sensor_1"] = deque()
+    sampler.samples["sensor_2"] = deque()
+
+    sampler.sample_all()
+
+    assert sampler.get_reading("sensor_1").temperature == 21.5
+    assert sampler.get_reading("sensor_2").temperature == -3.12
+    mocked_read.assert_not_called()
+
+
+def test_sampler_role_settings(w1_devices, mocker):
+    """The resolution and samples of a role come from the config."""
+
+    mocker.patch(
+        "fd_device.device.temperature.CONFIG.DEVICE_INTERIOR_SENSOR_RESOLUTION", 10
+    )
+    mocker.patch(
+        "fd_device.device.temperature.CONFIG.DEVICE_INTERIOR_SENSOR_SAMPLES", 1
+    )
+    sampler = TemperatureSampler(interval=60, smoothing=5, bulk_read=True)
+
+    sampler.watch(interior="sensor_1")
+    sampler.stop()
+    (w1_devices / "sensor_1" / "temperature").write_text("22000\n")
+    sampler.sample_all()
+
+    assert (w1_devices / "sensor_1" / "resolution").read_text() == "10\n"
+    assert sampler.resolutions == {"sensor_1": 10}
+    reading = sampler.get_reading("sensor_1")
+    assert reading.temperature == 22.0
+    assert reading.sample_count == 1
+
+
+def test_membership_is_cached(mocker):
+    """The sensor list is only read again when it is stale or invalidated."""
+
+    mocked_sensors = mocker.patch(
+        "fd_device.device.temperature._get_sensors",
+        return_value=["sensor_1"],
+        autospec=True,
+    )
+    clock = FakeClock(1_700_000_000.0)
+    membership = SensorMembership(ttl=60, clock=clock)
+
+    assert membership.get() == ["sensor_1"]
+    assert membership.get() == ["sensor_1"]
+    assert mocked_sensors.call_count == 1
+
+    membership.invalidate()
+    membership.get()
+    assert mocked_sensors.call_count == 2
+
+    clock.now += 61
+    membership.get()
+    assert mocked_sensors.call_count == 3
+
+
+def test_membership_refreshes_when_modified(w1_devices):
+    """A new modification time of w1_master_slaves refreshes the list."""
+
+    membership = SensorMembership(ttl=60)
+    slaves = w1_devices / "w1_bus_master1" / "w1_master_slaves"
+
+    assert membership.get() == ["sensor_1", "sensor_2"]
+    slaves.write_text("sensor_1\n")
+    os.utime(slaves, (1, 1))
+
+    assert membership.get() == ["sensor_1"]
+
+
+def test_read_many(w1_devices):
+    """Connected sensors are read and missing ones are 'U'."""
+
+    for name, value in (("sensor_1", "21500"), ("sensor_2", "-3125")):
+        (w1_devices / name / "w1_slave").write_text(
+            f"50 01 4b 46 7f ff 10 10 e1 : crc=e1 YES\n50 01 4b 46 7f ff t={value}\n"
+        )
+
+    values = read_many(["sensor_1", "sensor_2", "sensor_3"])
+
+    assert values == {"sensor_1": 21.5, "sensor_2": -3.125, "sensor_3": "U"}
+    assert read_many(["sensor_1"], converted=True) == {"sensor_1": 21.5}
+
+
+def test_sampler_watch_without_sensors(mocker):
+    """Roles without a sensor are ignored and a shared sensor is watched once."""
+
+    mocked_read = mocker.patch(
+        "fd_device.device.temperature._read_temperature",
+        return_value=10.0,
+        autospec=True,
+    )
+    mocked_resolution = mocker.patch(
+        "fd_device.device.temperature.set_resolution", return_value=True
+    )
+    sampler = TemperatureSampler(interval=60, bulk_read=False)
+
+    sampler.watch(interior=None, exterior=None)
+    assert sampler.roles == {}
+    assert not sampler.samples
+
+    sampler.watch(interior="sensor_1", exterior="sensor_1")
+    sampler.stop()
+
+    assert sampler.roles == {"sensor_1": "interior"}
+    assert list(sampler.samples) == ["sensor_1"]
+    assert None not in sampler.resolutions
+    for call in mocked_resolution.call_args_list + mocked_read.call_args_list:
+        assert call.args[0] == "sensor_1"
+    assert sampler.get_reading(None).sample_count == 0
@@ -3,6 +3,8 @@ import random
 
 import pytest
 
+from fd_device.database.device import Device
+from fd_device.device.temperature import TemperatureSampler
 from fd_device.device.update import get_device_info
 
 from ..factories import DeviceFactory
@@ -14,14 +16,25 @@ def test_get_device_info(mocker):
 
     device = DeviceFactory()
     device.update(interior_sensor="sensor_1", exterior_sensor="sensor_2")
+    device_id = device.device_id
+    device_pk = device.id
 
+    value = random.uniform(-40, 100)
     mocker.patch(
-        "fd_device.device.update.temperature",
-        return_value=random.uniform(-40, 100),
+        "fd_device.device.temperature._read_temperature",
+        return_value=value,
         autospec=True,
     )
+    sampler = TemperatureSampler(interval=60)
+    mocker.patch("fd_device.device.update.SAMPLER", sampler)
 
     update = get_device_info()
+    sampler.stop()
 
     assert isinstance(update, dict)
-    assert update["data"]["device_id"] == device.device_id
+    assert update["data"]["device_id"] == device_id
+    assert update["data"]["interior_temp"] == round(value, 2)
+    assert update["data"]["interior_temp_samples"] >= 1
+    assert update["data"]["exterior_temp_timestamp"] is not None
+    assert update["data"]["last_updated"] is not None
+    assert Device.get_by_id(device_pk).interior_temp == round(value, 2)
@@ -1,10 +1,22 @@
 """OWFS interface module tests."""
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
 from fd_device.grainbin.owfs_interface import (
+    OwfsError,
+    create_http_session,
     fetch_and_parse_page,
     get_all_busses,
     get_all_sensors_of_bus,
+    get_http_session,
+    parse_temperature,
     read_sensor_of_bus,
+    read_sensor_temperature,
+    start_simultaneous_conversion,
 )
+from fd_device.grainbin.owserver import OwserverError
 from fd_device.settings import get_config
 
 CONFIG = get_config()
@@ -18,7 +30,7 @@ def test_fetch_and_parse_page(mocker):
         test_text = "/n".join(text_as_list)
 
     mocker.patch(
-        "fd_device.grainbin.owfs_interface.requests.get",
+        "fd_device.grainbin.owfs_interface.requests.Session.get",
         return_value=mocker.Mock(status_code=200, text=test_text),
         autospec=True,
     )
@@ -33,7 +45,7 @@ def test_fetch_and_parse_page_not_200(mocker):
     """Test the fetch_and_parse_page function returns None if not 200."""
 
     mocker.patch(
-        "fd_device.grainbin.owfs_interface.requests.get",
+        "fd_device.grainbin.owfs_interface.requests.Session.get",
         return_value=mocker.Mock(status_code=400),
         autospec=True,
     )
@@ -47,7 +59,7 @@ def test_fetch_and_parse_page_no_text(mocker):
     """Test the fetch_and_parse_page function if improper text is given."""
 
     mocker.patch(
-        "fd_device.grainbin.owfs_interface.requests.get",
+        "fd_device.grainbin.owfs_interface.requests.Session.get",
         return_value=mocker.Mock(status_code=200, text="Test text no table"),
         autospec=True,
     )
@@ -58,6 +70,92 @@ def test_fetch_and_parse_page_no_text(mocker):
     assert len(data) == 0
 
 
+def test_fetch_and_parse_page_with_http_session(mocker):
+    """Test the fetch_and_parse_page function uses the given session."""
+
+    http_session = mocker.Mock()
+    http_session.get.return_value = mocker.Mock(
+        status_code=200, text="Test text no table"
+    )
+
+    data = fetch_and_parse_page("test_page", http_session=http_session)
+
+    assert data == []
+    http_session.get.assert_called_once_with(
+        "test_page", timeout=CONFIG.OWFS_HTTP_TIMEOUT
+    )
+
+
+def test_functions_with_http_session(mocker):
+    """Test every owhttpd request is sent with the given session."""
+
+    shared_session = mocker.patch("fd_device.grainbin.owfs_interface.get_http_session")
+    http_session = mocker.Mock()
+    http_session.get.return_value = mocker.Mock(
+        status_code=200, text="Test text no table"
+    )
+
+    assert get_all_busses(http_session=http_session) == []
+    assert get_all_sensors_of_bus("bus.1", http_session=http_session) == []
+    assert read_sensor_of_bus("bus.1", "28.1", http_session=http_session) == {}
+    assert read_sensor_temperature("bus.1", "28.1", http_session=http_session) is None
+    assert start_simultaneous_conversion("bus.1", http_session=http_session)
+
+    assert http_session.get.call_count == 5
+    shared_session.assert_not_called()
+
+
+def test_create_http_session():
+    """Test the create_http_session function configures the pool and retries."""
+
+    http_session = create_http_session(pool_size=3, retries=4)
+    adapter = http_session.get_adapter("http://fd_1wire:2121")
+
+    assert adapter._pool_maxsize == 3  # pylint: disable=protected-access
+    assert adapter.max_retries.total == 4
+
+
+def test_fetch_and_parse_page_server_error():
+    """Test the fetch_and_parse_page function returns None if owhttpd keeps failing."""
+
+    requests_seen = []
+
+    class ErrorHandler(BaseHTTPRequestHandler):
+        """Answer every request with a 503."""
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            """Send a 503 response."""
+            requests_seen.append(self.path)
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):  # pylint: disable=arguments-differ
+            """Do not log the requests."""
+
+    server = HTTPServer(("127.0.0.1", 0), ErrorHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        data = fetch_and_parse_page(
+            f"http://127.0.0.1:{server.server_port}/bus.0",
+            http_session=create_http_session(retries=1),
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert data is None
+    # the request was retried once
+    assert len(requests_seen) == 2
+
+
+def test_get_http_session():
+    """Test the get_http_session function returns a shared session."""
+
+    assert get_http_session() is get_http_session()
+
+
 def test_get_all_busses(mocker):
     """Test the get_all_busses function."""
 
@@ -66,7 +164,7 @@ def test_get_all_busses(mocker):
         test_text = "/n".join(text_as_list)
 
     mocker.patch(
-        "fd_device.grainbin.owfs_interface.requests.get",
+        "fd_device.grainbin.owfs_interface.requests.Session.get",
         return_value=mocker.Mock(status_code=200, text=test_text),
         autospec=True,
     )
@@ -85,7 +183,7 @@ def test_get_all_busses_including_all(mocker):
         test_text = "/n".join(text_as_list)
 
     mocker.patch(
-        "fd_device.grainbin.owfs_interface.requests.get",
+        "fd_device.grainbin.owfs_interface.requests.Session.get",
         return_value=mocker.Mock(status_code=200, text=test_text),
         autospec=True,
     )
@@ -104,7 +202,7 @@ def test_get_all_sensors_of_bus(mocker):
         test_text = "/n".join(text_as_list)
 
     mocker.patch(
-        "fd_device.grainbin.owfs_interface.requests.get",
+        "fd_device.grainbin.owfs_interface.requests.Session.get",
         return_value=mocker.Mock(status_code=200, text=test_text),
         autospec=True,
     )
@@ -123,7 +221,7 @@ def test_read_sensor_of_bus(mocker):
         test_text = "/n".join(text_as_list)
 
     mocker.patch(
-        "fd_device.grainbin.owfs_interface.requests.get",
+        "fd_device.grainbin.owfs_interface.requests.Session.get",
         return_value=mocker.Mock(status_code=200, text=test_text),
         autospec=True,
     )
@@ -134,3 +232,211 @@ def test_read_sensor_of_bus(mocker):
     assert "temperature" in sensor_info
     assert "temphigh" in sensor_info
     assert "templow" in sensor_info
+
+
+def test_get_all_busses_owserver(mocker):
+    """Test the get_all_busses function using the owserver backend."""
+
+    mocker.patch("fd_device.grainbin.owfs_interface.CONFIG.OWFS_BACKEND", "owserver")
+    client = mocker.patch("fd_device.grainbin.owfs_interface.get_owserver_client")
+    client.return_value.dir.return_value = [
+        "/28.CC9A290D0000",
+        "/bus.2",
+        "/bus.0",
+        "/bus.1",
+        "/uncached",
+    ]
+
+    all_busses = get_all_busses()
+
+    assert all_busses == ["bus.1", "bus.2"]
+
+
+def test_get_all_sensors_of_bus_owserver(mocker):
+    """Test the get_all_sensors_of_bus function using the owserver backend."""
+
+    mocker.patch("fd_device.grainbin.owfs_interface.CONFIG.OWFS_BACKEND", "owserver")
+    client = mocker.patch("fd_device.grainbin.owfs_interface.get_owserver_client")
+    client.return_value.dir.return_value = [
+        "/bus.1/interface",
+        "/bus.1/28.CC9A290D0000",
+        "/bus.1/28.BC9A290D0000",
+        "/bus.1/simultaneous",
+    ]
+
+    all_sensors = get_all_sensors_of_bus(bus_name="bus.1")
+
+    assert all_sensors == ["28.CC9A290D0000", "28.BC9A290D0000"]
+    client.return_value.dir.assert_called_once_with("/bus.1")
+
+
+def test_get_all_busses_owserver_error(mocker):
+    """Test a failed owserver listing is an empty list, or raises if asked to."""
+
+    mocker.patch("fd_device.grainbin.owfs_interface.CONFIG.OWFS_BACKEND", "owserver")
+    client = mocker.patch("fd_device.grainbin.owfs_interface.get_owserver_client")
+    client.return_value.dir.side_effect = OwserverError("test error")
+
+    assert get_all_busses() == []
+    assert get_all_sensors_of_bus(bus_name="bus.1") == []
+    with pytest.raises(OwfsError):
+        get_all_busses(raise_errors=True)
+    with pytest.raises(OwfsError):
+        get_all_sensors_of_bus(bus_name="bus.1", raise_errors=True)
+
+
+def test_get_all_busses_not_200(mocker):
+    """Test a failed owhttpd listing raises if asked to."""
+
+    mocker.patch(
+        "fd_device.grainbin.owfs_interface.requests.Session.get",
+        return_value=mocker.Mock(status_code=503),
+        autospec=True,
+    )
+
+    assert get_all_busses() == []
+    with pytest.raises(OwfsError):
+        get_all_busses(raise_errors=True)
+    with pytest.raises(OwfsError):
+        get_all_sensors_of_bus(bus_name="bus.1", raise_errors=True)
+
+
+def test_read_sensor_of_bus_owserver(mocker):
+    """Test the read_sensor_of_bus function using the owserver backend."""
+
+    mocker.patch("fd_device.grainbin.owfs_interface.CONFIG.OWFS_BACKEND", "owserver")
+    client = mocker.patch("fd_device.grainbin.owfs_interface.get_owserver_client")
+    client.return_value.read.side_effect = ["22.1875", "1", "2"]
+
+    sensor_info = read_sensor_of_bus(bus_name="bus.1", sensor="28.CC9A290D0000")
+
+    assert sensor_info == {"temperature": "22.1875", "temphigh": "1", "templow": "2"}
+    client.return_value.read.assert_any_call("/bus.1/28.CC9A290D0000/temperature")
+
+
+def test_read_sensor_of_bus_owserver_error(mocker):
+    """Test the read_sensor_of_bus function handles owserver errors."""
+
+    mocker.patch("fd_device.grainbin.owfs_interface.CONFIG.OWFS_BACKEND", "owserver")
+    client = mocker.patch("fd_device.grainbin.owfs_interface.get_owserver_client")
+    client.return_value.read.side_effect = OwserverError("test error")
+
+    sensor_info = read_sensor_of_bus(bus_name="bus.1", sensor="28.CC9A290D0000")
+
+    assert sensor_info == {}
+
+
+def test_read_sensor_temperature(mocker):
+    """Test the read_sensor_temperature function."""
+
+    with open(
+        f"{CONFIG.TEST_DIR}/grainbin/test_sensor_1_1_temperature_owfs_page.txt"
+    ) as f:
+        test_text = f.read()
+
+    get = mocker.patch(
+        "fd_device.grainbin.owfs_interface.requests.Session.get",
+        return_value=mocker.Mock(status_code=200, text=test_text),
+        autospec=True,
+    )
+
+    temperature = read_sensor_temperature(bus_name="bus.1", sensor="28.CC9A290D0000")
+
+    assert temperature == "22.1875"
+    assert get.call_args.args[1].endswith("/bus.1/28.CC9A290D0000/temperature")
+
+
+def test_read_sensor_temperature_not_200(mocker):
+    """Test the read_sensor_temperature function returns None if not 200."""
+
+    mocker.patch(
+        "fd_device.grainbin.owfs_interface.requests.Session.get",
+        return_value=mocker.Mock(status_code=404),
+        autospec=True,
+    )
+
+    temperature = read_sensor_temperature(bus_name="bus.1", sensor="28.CC9A290D0000")
+
+    assert temperature is None
+
+
+def test_read_sensor_temperature_owserver(mocker):
+    """Test the read_sensor_temperature function using the owserver backend."""
+
+    mocker.patch("fd_device.grainbin.owfs_interface.CONFIG.OWFS_BACKEND", "owserver")
+    client = mocker.patch("fd_device.grainbin.owfs_interface.get_owserver_client")
+    client.return_value.read.return_value = "22.1875"
+
+    temperature = read_sensor_temperature(bus_name="bus.1", sensor="28.CC9A290D0000")
+
+    assert temperature == "22.1875"
+    client.return_value.read.assert_called_once_with(
+        "/bus.1/28.CC9A290D0000/temperature"
+    )
+
+
+def test_read_sensor_temperature_latest_owserver(mocker):
+    """Test the read_sensor_temperature function reading the latest conversion."""
+
+    mocker.patch("fd_device.grainbin.owfs_interface.CONFIG.OWFS_BACKEND", "owserver")
+    client = mocker.patch("fd_device.grainbin.owfs_interface.get_owserver_client")
+    client.return_value.read.return_value = "22.1875"
+
+    temperature = read_sensor_temperature(
+        bus_name="bus.1", sensor="28.CC9A290D0000", latest=True
+    )
+
+    assert temperature == "22.1875"
+    client.return_value.read.assert_called_once_with(
+        "/bus.1/28.CC9A290D0000/latesttemp"
+    )
+
+
+def test_start_simultaneous_conversion(mocker):
+    """Test the start_simultaneous_conversion function."""
+
+    get = mocker.patch(
+        "fd_device.grainbin.owfs_interface.requests.Session.get",
+        return_value=mocker.Mock(status_code=200),
+        autospec=True,
+    )
+
+    assert start_simultaneous_conversion("bus.1")
+    assert get.call_args.args[1].endswith("/bus.1/simultaneous")
+    assert get.call_args.kwargs["params"] == {"temperature": "1"}
+
+
+def test_start_simultaneous_conversion_not_200(mocker):
+    """Test the start_simultaneous_conversion function returns False if not 200."""
+
+    mocker.patch(
+        "fd_device.grainbin.owfs_interface.requests.Session.get",
+        return_value=mocker.Mock(status_code=404),
+        autospec=True,
+    )
+
+    assert not start_simultaneous_conversion("bus.1")
+
+
+def test_start_simultaneous_conversion_owserver(mocker):
+    """Test the start_simultaneous_conversion function using the owserver backend."""
+
+    mocker.patch("fd_device.grainbin.owfs_interface.CONFIG.OWFS_BACKEND", "owserver")
+    client = mocker.patch("fd_device.grainbin.owfs_interface.get_owserver_client")
+
+    assert start_simultaneous_conversion("bus.1")
+    client.return_value.write.assert_called_once_with(
+        "/bus.1/simultaneous/temperature", b"1"
+    )
+
+    client.return_value.write.side_effect = OwserverError("test error")
+    assert not start_simultaneous_conversion("bus.1")
+
+
+def test_parse_temperature():
+    """Test the parse_temperature function converts numbers and rejects sentinels."""
+
+    assert parse_temperature("     22.1875") == 22.1875
+    assert parse_temperature(-3.5) == -3.5
+    assert parse_temperature("N/A") is None
+    assert parse_temperature(None) is None
@@ -0,0 +1,60 @@
+"""owhttpd page parser tests."""
+from fd_device.grainbin.owhttpd_parser import parse_owhttpd_page
+from fd_device.settings import get_config
+
+CONFIG = get_config()
+
+
+def read_page(name: str) -> str:
+    """Read a captured owhttpd page."""
+    with open(f"{CONFIG.TEST_DIR}/grainbin/{name}") as f:
+        return f.read()
+
+
+def test_parse_owhttpd_page_root():
+    """Test parsing the root page."""
+
+    data = parse_owhttpd_page(read_page("test_root_owfs_page.txt"))
+
+    assert len(data) == 15
+    assert ["bus.1", "bus.1", "directory"] in [row[:3] for row in data]
+
+
+def test_parse_owhttpd_page_bus():
+    """Test parsing a bus page returns the sensor rows."""
+
+    data = parse_owhttpd_page(read_page("test_bus_1_owfs_page.txt"))
+
+    sensors = [row[1] for row in data if row[0].startswith("28.")]
+    assert sensors == ["28.CC9A290D0000", "28.BC9A290D0000", "28.BBE5290D0000"]
+
+
+def test_parse_owhttpd_page_sensor_form_values():
+    """Test the value of the TEXT input is used for cells with a form."""
+
+    data = parse_owhttpd_page(read_page("test_sensor_1_1_owfs_page.txt"))
+    rows = {row[0]: row[1:] for row in data}
+
+    assert rows["temperature"] == ["22.1875"]
+    assert rows["temphigh"] == ["1"]
+    assert rows["templow"] == ["1"]
+    assert rows["alias"] == [""]
+    assert rows["scratchpad"] == ["680101011FFF081097"]
+
+
+def test_parse_owhttpd_page_no_table():
+    """Test a page without tables returns an empty list."""
+
+    assert parse_owhttpd_page("Test text no table") == []
+
+
+def test_parse_owhttpd_page_ignores_first_table():
+    """Test only the rows of the second table are returned."""
+
+    text = (
+        "<TABLE><TR><TD>first</TD></TR></TABLE>"
+        "<TABLE><TR><TD>second</TD><TD>a &amp; b</TD></TR></TABLE>"
+        "<TABLE><TR><TD>third</TD></TR></TABLE>"
+    )
+
+    assert parse_owhttpd_page(text) == [["second", "a & b"]]
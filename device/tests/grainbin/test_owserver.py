@@ -0,0 +1,168 @@
+"""owserver protocol client tests."""
+import pytest
+
+from fd_device.grainbin.owserver import (
+    FLG_PERSISTENCE,
+    HEADER,
+    MSG_DIRALL,
+    MSG_PRESENCE,
+    MSG_READ,
+    MSG_WRITE,
+    PING_PAYLOAD,
+    OwserverClient,
+    OwserverError,
+)
+
+
+class FakeSocket:
+    """A socket that records what is sent and replays canned responses."""
+
+    def __init__(self, responses: bytes):
+        """Create the FakeSocket object."""
+        self.sent = b""
+        self.responses = responses
+        self.closed = False
+
+    def sendall(self, data):
+        """Record sent data."""
+        self.sent += data
+
+    def recv(self, length):
+        """Return up to length bytes of the canned responses."""
+        chunk, self.responses = self.responses[:length], self.responses[length:]
+        return chunk
+
+    def close(self):
+        """Mark the socket closed."""
+        self.closed = True
+
+
+def make_response(payload: bytes, ret: int = 0, flags: int = FLG_PERSISTENCE):
+    """Build a raw owserver response."""
+    return HEADER.pack(0, len(payload), ret, flags, len(payload), 0) + payload
+
+
+def patch_socket(mocker, responses: bytes) -> FakeSocket:
+    """Patch socket.create_connection to return a FakeSocket."""
+    fake_socket = FakeSocket(responses)
+    mocker.patch(
+        "fd_device.grainbin.owserver.socket.create_connection",
+        return_value=fake_socket,
+    )
+    return fake_socket
+
+
+def test_dir(mocker):
+    """Test the dir method splits the listing into full paths."""
+
+    fake_socket = patch_socket(
+        mocker, make_response(b"/bus.1/28.CC9A290D0000,/bus.1/28.BC9A290D0000\x00")
+    )
+
+    with OwserverClient("fd_1wire") as client:
+        entries = client.dir("/bus.1")
+
+    assert entries == ["/bus.1/28.CC9A290D0000", "/bus.1/28.BC9A290D0000"]
+    _, payload_len, msg_type, _, _, _ = HEADER.unpack(fake_socket.sent[: HEADER.size])
+    assert msg_type == MSG_DIRALL
+    assert fake_socket.sent[HEADER.size :] == b"/bus.1\x00"
+    assert payload_len == len(b"/bus.1\x00")
+
+
+def test_dir_empty(mocker):
+    """Test the dir method with an empty listing."""
+
+    patch_socket(mocker, make_response(b""))
+
+    client = OwserverClient("fd_1wire")
+
+    assert client.dir("/bus.3") == []
+
+
+def test_read(mocker):
+    """Test the read method strips the padded value."""
+
+    fake_socket = patch_socket(mocker, make_response(b"     22.1875"))
+
+    client = OwserverClient("fd_1wire")
+    value = client.read("/bus.1/28.CC9A290D0000/temperature")
+
+    assert value == "22.1875"
+    _, _, msg_type, _, size, _ = HEADER.unpack(fake_socket.sent[: HEADER.size])
+    assert msg_type == MSG_READ
+    assert size > 0
+
+
+def test_read_skips_ping(mocker):
+    """Test the read method ignores keepalive pings."""
+
+    ping = HEADER.pack(0, PING_PAYLOAD, 0, FLG_PERSISTENCE, 0, 0)
+    patch_socket(mocker, ping + make_response(b"           1"))
+
+    client = OwserverClient("fd_1wire")
+
+    assert client.read("/bus.1/28.CC9A290D0000/temphigh") == "1"
+
+
+def test_read_error(mocker):
+    """Test the read method raises an OwserverError on a negative return."""
+
+    patch_socket(mocker, make_response(b"", ret=-2))
+
+    client = OwserverClient("fd_1wire")
+
+    with pytest.raises(OwserverError):
+        client.read("/bus.1/28.000000000000/temperature")
+
+
+def test_read_connection_closed(mocker):
+    """Test the read method raises an OwserverError if the socket closes."""
+
+    fake_socket = patch_socket(mocker, b"")
+
+    client = OwserverClient("fd_1wire")
+
+    with pytest.raises(OwserverError):
+        client.read("/bus.1/28.CC9A290D0000/temperature")
+    assert fake_socket.closed
+
+
+def test_present(mocker):
+    """Test the present method."""
+
+    fake_socket = patch_socket(mocker, make_response(b"") + make_response(b"", ret=-2))
+
+    client = OwserverClient("fd_1wire")
+
+    assert client.present("/bus.1/28.CC9A290D0000")
+    assert not client.present("/bus.1/28.000000000000")
+    _, _, msg_type, _, _, _ = HEADER.unpack(fake_socket.sent[: HEADER.size])
+    assert msg_type == MSG_PRESENCE
+
+
+def test_connection_not_persistent(mocker):
+    """Test the socket is closed if owserver does not grant persistence."""
+
+    fake_socket = patch_socket(mocker, make_response(b"1", flags=0))
+
+    client = OwserverClient("fd_1wire")
+    client.read("/bus.1/28.CC9A290D0000/templow")
+
+    assert fake_socket.closed
+
+
+def test_write(mocker):
+    """Test the write method sends the data after the path."""
+
+    fake_socket = patch_socket(mocker, make_response(b""))
+
+    client = OwserverClient("fd_1wire")
+    client.write("/bus.1/simultaneous/temperature", b"1")
+
+    _, payload_len, msg_type, _, size, _ = HEADER.unpack(
+        fake_socket.sent[: HEADER.size]
+    )
+    assert msg_type == MSG_WRITE
+    assert size == 1
+    assert fake_socket.sent[HEADER.size :] == b"/bus.1/simultaneous/temperature\x001"
+    assert payload_len == len(b"/bus.1/simultaneous/temperature\x001")
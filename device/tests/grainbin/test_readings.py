@@ -0,0 +1,117 @@
+"""grainbin.readings module tests."""
+import datetime
+
+import pytest
+from sqlalchemy import select
+
+from fd_device.database.device import GrainbinReading
+from fd_device.grainbin.readings import readings_from_updates, write_readings
+
+from ..factories import GrainbinFactory
+
+CREATED_AT = datetime.datetime(2024, 5, 1, 12, 30)
+
+
+def make_update(name: str) -> dict:
+    """Return a grainbin update with two sensors."""
+    return {
+        "created_at": CREATED_AT,
+        "name": name,
+        "sensor_data": [
+            {
+                "sensor_name": "28.CC9A290D0000",
+                "temperature": "22.1875",
+                "temphigh": "1",
+                "templow": "2",
+            },
+            {
+                "sensor_name": "28.BC9A290D0000",
+                "temperature": "U",
+                "temphigh": "1",
+            },
+        ],
+    }
+
+
+def test_readings_from_updates():
+    """A row is created for every sensor of a known grainbin."""
+
+    rows = readings_from_updates(
+        [make_update("bin 1"), make_update("unknown bin")], {"bin 1": 5}
+    )
+
+    assert rows == [
+        {
+            "timestamp": CREATED_AT,
+            "grainbin_id": 5,
+            "sensor_name": "28.CC9A290D0000",
+            "cable": 1,
+            "position": 2,
+            "temperature": 22.1875,
+        },
+        {
+            "timestamp": CREATED_AT,
+            "grainbin_id": 5,
+            "sensor_name": "28.BC9A290D0000",
+            "cable": 1,
+            "position": None,
+            "temperature": None,
+        },
+    ]
+
+
+def test_write_readings_empty():
+    """Nothing is written without rows."""
+
+    assert write_readings([]) == 0
+
+
+@pytest.mark.usefixtures("tables")
+def test_write_readings(dbsession):
+    """The rows are inserted."""
+
+    grainbin = GrainbinFactory()
+    rows = readings_from_updates(
+        [make_update(grainbin.name)], {grainbin.name: grainbin.id}
+    )
+
+    assert write_readings(rows, session=dbsession) == 2
+
+    readings = dbsession.scalars(
+        select(GrainbinReading).order_by(GrainbinReading.sensor_name)
+    ).all()
+    assert [reading.sensor_name for reading in readings] == [
+        "28.BC9A290D0000",
+        "28.CC9A290D0000",
+    ]
+    assert readings[1].temperature == 22.1875
+    assert readings[1].timestamp == CREATED_AT
+    assert readings[0].temperature is None
+
+
+def test_write_readings_postgresql_copy(mocker):
+    """Test PostgreSQL rows are written with COPY."""
+
+    session = mocker.MagicMock()
+    session.get_bind.return_value.dialect.name = "postgresql"
+    cursor = session.connection.return_value.connection.cursor.return_value
+    copied = []
+    cursor.copy_expert.side_effect = lambda sql, buffer: copied.append(
+        (sql, buffer.read())
+    )
+
+    rows = readings_from_updates([make_update("bin 1")], {"bin 1": 5})
+    write_readings(rows, session=session)
+
+    sql, data = copied[0]
+    assert sql == (
+        "COPY grainbin_reading (timestamp, grainbin_id, sensor_name, cable, "
+        "position, temperature) FROM STDIN WITH (FORMAT csv)"
+    )
+    assert data.splitlines() == [
+        "2024-05-01 12:30:00,5,28.CC9A290D0000,1,2,22.1875",
+        "2024-05-01 12:30:00,5,28.BC9A290D0000,1,,",
+    ]
+    session.execute.assert_not_called()
+    session.commit.assert_called_once()
+    cursor.close.assert_called_once()
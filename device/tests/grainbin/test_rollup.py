@@ -0,0 +1,143 @@
+"""grainbin.rollup module tests."""
+import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from fd_device.database.device import GrainbinReading, GrainbinReadingRollup
+from fd_device.grainbin.readings import write_readings
+from fd_device.grainbin.rollup import (
+    get_history_status,
+    get_rollups,
+    maintain_reading_history,
+    period_start,
+    prune_readings,
+    prune_rollups,
+    update_rollups,
+)
+
+from ..factories import GrainbinFactory
+
+pytestmark = pytest.mark.usefixtures("tables")
+
+START = datetime.datetime(2024, 5, 1, 12, 0)
+
+
+def store(grainbin_id: int, sensor_name: str, minutes: int, temperature, session):
+    """Store a single reading."""
+    write_readings(
+        [
+            {
+                "timestamp": START + datetime.timedelta(minutes=minutes),
+                "grainbin_id": grainbin_id,
+                "sensor_name": sensor_name,
+                "cable": 1,
+                "position": 1,
+                "temperature": temperature,
+            }
+        ],
+        session=session,
+    )
+
+
+def test_period_start():
+    """Timestamps are truncated to the start of their period."""
+
+    timestamp = datetime.datetime(2024, 5, 1, 12, 34, 56, 789)
+
+    assert period_start(timestamp, "hour") == datetime.datetime(2024, 5, 1, 12)
+    assert period_start(timestamp, "day") == datetime.datetime(2024, 5, 1)
+
+
+def test_update_rollups(dbsession):
+    """Readings are summarized per sensor and per grainbin."""
+
+    grainbin_id = GrainbinFactory().id
+    store(grainbin_id, "sensor_1", 0, 10.0, dbsession)
+    store(grainbin_id, "sensor_1", 30, 20.0, dbsession)
+    store(grainbin_id, "sensor_2", 30, 30.0, dbsession)
+    store(grainbin_id, "sensor_2", 40, None, dbsession)
+    store(grainbin_id, "sensor_1", 90, 40.0, dbsession)
+
+    assert update_rollups(batch_size=2, session=dbsession) == 5
+
+    hourly = get_rollups(
+        "hour", START, START + datetime.timedelta(days=1), sensor_name="sensor_1"
+    )
+    assert [(r.min_temp, r.max_temp, r.mean_temp, r.count) for r in hourly] == [
+        (10.0, 20.0, 15.0, 2),
+        (40.0, 40.0, 40.0, 1),
+    ]
+    (daily,) = get_rollups(
+        "day",
+        START - datetime.timedelta(days=1),
+        START + datetime.timedelta(days=1),
+        grainbin_id=grainbin_id,
+    )
+    assert daily.sensor_name is None
+    assert (daily.min_temp, daily.max_temp, daily.mean_temp, daily.count) == (
+        10.0,
+        40.0,
+        25.0,
+        4,
+    )
+
+
+def test_update_rollups_is_incremental(dbsession):
+    """Only new readings are added to the existing rollups."""
+
+    grainbin_id = GrainbinFactory().id
+    store(grainbin_id, "sensor_1", 0, 10.0, dbsession)
+    update_rollups(session=dbsession)
+    store(grainbin_id, "sensor_1", 10, 20.0, dbsession)
+
+    assert update_rollups(session=dbsession) == 1
+    assert update_rollups(session=dbsession) == 0
+
+    (hourly,) = get_rollups(
+        "hour", START, START + datetime.timedelta(hours=1), sensor_name="sensor_1"
+    )
+    assert (hourly.mean_temp, hourly.count) == (15.0, 2)
+    assert dbsession.scalar(select(func.count(GrainbinReadingRollup.id))) == 4
+
+
+def test_prune_readings(dbsession):
+    """Only old readings that are in the rollups are deleted, in batches."""
+
+    grainbin_id = GrainbinFactory().id
+    for minutes in range(5):
+        store(grainbin_id, "sensor_1", minutes, 10.0, dbsession)
+    update_rollups(session=dbsession)
+    store(grainbin_id, "sensor_1", 5, 10.0, dbsession)
+
+    assert prune_readings(days=1, batch_size=2, session=dbsession) == 5
+    assert dbsession.scalar(select(func.count(GrainbinReading.id))) == 1
+
+
+def test_prune_rollups(dbsession):
+    """Old hourly rollups are deleted and daily rollups are kept."""
+
+    grainbin_id = GrainbinFactory().id
+    store(grainbin_id, "sensor_1", 0, 10.0, dbsession)
+    update_rollups(session=dbsession)
+
+    assert prune_rollups(days=1, session=dbsession) == 2
+
+    periods = dbsession.scalars(select(GrainbinReadingRollup.period)).all()
+    assert periods == ["day", "day"]
+
+
+def test_maintain_reading_history_and_status(dbsession):
+    """The history is rolled up and pruned, and its status reported."""
+
+    grainbin_id = GrainbinFactory().id
+    store(grainbin_id, "sensor_1", 0, 10.0, dbsession)
+
+    result = maintain_reading_history()
+    status = get_history_status()
+
+    assert result == {"rolled_up": 1, "pruned_readings": 1, "pruned_rollups": 2}
+    assert status["readings"] == 0
+    assert status["hour_rollups"] == 0
+    assert status["day_rollups"] == 2
+    assert status["oldest_day_rollup"] == datetime.datetime(2024, 5, 1)
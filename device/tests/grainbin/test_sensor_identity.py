@@ -0,0 +1,64 @@
+"""grainbin.sensor_identity module tests."""
+import pytest
+
+from fd_device.grainbin.sensor_identity import (
+    clear_sensor_identities,
+    load_sensor_identities,
+    save_sensor_identities,
+)
+
+
+@pytest.mark.usefixtures("tables")
+class TestSensorIdentity:
+    """Test the sensor identity store."""
+
+    @staticmethod
+    def test_load_sensor_identities_empty():
+        """Test loading with nothing stored."""
+
+        assert load_sensor_identities() == {}
+
+    @staticmethod
+    def test_save_and_load_sensor_identities(dbsession):
+        """Test saving then loading sensor identities."""
+
+        save_sensor_identities(
+            {
+                "28.CC9A290D0000": {"temphigh": "1", "templow": "1"},
+                "28.BC9A290D0000": {"temphigh": "1", "templow": "2"},
+            },
+            session=dbsession,
+        )
+
+        identities = load_sensor_identities(session=dbsession)
+
+        assert identities == {
+            "28.CC9A290D0000": {"temphigh": "1", "templow": "1"},
+            "28.BC9A290D0000": {"temphigh": "1", "templow": "2"},
+        }
+
+    @staticmethod
+    def test_save_sensor_identities_updates(dbsession):
+        """Test saving an existing sensor updates its identity."""
+
+        save_sensor_identities(
+            {"28.CC9A290D0000": {"temphigh": "1", "templow": "1"}}, session=dbsession
+        )
+        save_sensor_identities(
+            {"28.CC9A290D0000": {"temphigh": "3", "templow": "4"}}, session=dbsession
+        )
+
+        identities = load_sensor_identities(session=dbsession)
+
+        assert identities == {"28.CC9A290D0000": {"temphigh": "3", "templow": "4"}}
+
+    @staticmethod
+    def test_clear_sensor_identities(dbsession):
+        """Test clearing the stored sensor identities."""
+
+        save_sensor_identities(
+            {"28.CC9A290D0000": {"temphigh": "1", "templow": "1"}}, session=dbsession
+        )
+        clear_sensor_identities(session=dbsession)
+
+        assert load_sensor_identities(session=dbsession) == {}
@@ -0,0 +1,166 @@
+"""Test the simulated OWFS servers."""
+# pylint: disable=redefined-outer-name
+import pytest
+
+from fd_device.grainbin.owfs_interface import create_http_session, fetch_and_parse_page
+from fd_device.grainbin.owserver import OwserverClient, OwserverError
+from fd_device.grainbin.simulator import (
+    OwfsModel,
+    ReplayOwfs,
+    SimulatedError,
+    SimulatedOwfs,
+    SimulatedOwhttpd,
+    SimulatedOwserver,
+    load_recording,
+    record_owfs,
+    save_recording,
+    start_in_thread,
+)
+
+
+@pytest.fixture()
+def model():
+    """A simulated OWFS with two busses of three sensors."""
+    return SimulatedOwfs(bus_count=2, sensors_per_bus=3, temperature=lambda _: 20.5)
+
+
+@pytest.fixture()
+def owserver(model):
+    """A running simulated owserver. Yields a client connected to it."""
+    server = SimulatedOwserver(model)
+    start_in_thread(server)
+    with OwserverClient(*server.server_address) as client:
+        yield client
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture()
+def owhttpd(model):
+    """A running simulated owhttpd. Yields its base url."""
+    server = SimulatedOwhttpd(model)
+    start_in_thread(server)
+    host, port = server.server_address
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_simulated_owfs_topology(model):
+    """The busses hold their sensors and bus.0 holds every sensor."""
+
+    root = model.dir("/")
+    assert root[:3] == ["/bus.0", "/bus.1", "/bus.2"]
+    assert model.dir("/bus.1")[:3] == [
+        "/bus.1/28.000100010000",
+        "/bus.1/28.000100020000",
+        "/bus.1/28.000100030000",
+    ]
+    assert len([e for e in model.dir("/bus.0") if "/28." in e]) == 6
+    assert model.dir("/bus.3") is None
+
+
+def test_simulated_owfs_read_and_write(model):
+    """Properties are read, converted and written."""
+
+    assert model.read("/bus.2/28.000200030000/temphigh") == "2"
+    assert model.read("/bus.2/28.000200030000/templow") == "3"
+    assert model.read("/bus.2/28.000200030000/latesttemp").strip() == "85"
+    assert model.read("/bus.2/28.000200030000/temperature").strip() == "20.5"
+    assert model.read("/bus.1/28.000200030000/temperature") is None
+
+    assert model.write("/bus.1/simultaneous/temperature", "1")
+    assert model.read("/bus.1/28.000100010000/latesttemp").strip() == "20.5"
+    assert model.read("/bus.2/28.000200010000/latesttemp").strip() == "85"
+
+    assert model.write("/bus.1/28.000100010000/temphigh", "7")
+    assert model.read("/bus.1/28.000100010000/temphigh") == "7"
+    assert not model.write("/bus.1/28.000100010000/temperature", "7")
+
+
+def test_simulated_owfs_error_injection():
+    """Every request fails with an error rate of 1."""
+
+    model = SimulatedOwfs(error_rate=1.0)
+
+    with pytest.raises(SimulatedError):
+        model.dir("/")
+    assert model.request_count == 1
+
+
+def test_incomplete_model():
+    """A model that does not answer every request can not be created."""
+
+    class ReadOnlyOwfs(OwfsModel):
+        """A model without write."""
+
+        def dir(self, path):
+            """Return no entries."""
+            return []
+
+        def read(self, path):
+            """Return no value."""
+            return None
+
+    with pytest.raises(TypeError):
+        ReadOnlyOwfs()  # pylint: disable=abstract-class-instantiated
+
+
+def test_simulated_owserver(owserver):
+    """The owserver protocol is answered from the model."""
+
+    assert "/bus.1" in owserver.dir("/")
+    assert owserver.read("/bus.1/28.000100020000/templow") == "2"
+    owserver.write("/bus.1/simultaneous/temperature", b"1")
+    assert owserver.read("/bus.1/28.000100020000/latesttemp") == "20.5"
+    assert owserver.present("/bus.1")
+    assert not owserver.present("/bus.9")
+    with pytest.raises(OwserverError):
+        owserver.read("/bus.1/28.000100020000/missing")
+
+
+def test_simulated_owserver_error_injection(model, owserver):
+    """Injected errors are returned as owserver errors."""
+
+    model.error_rate = 1.0
+
+    with pytest.raises(OwserverError):
+        owserver.dir("/")
+
+
+def test_simulated_owhttpd(owhttpd):
+    """The pages are rendered the way owhttpd renders them."""
+
+    http_session = create_http_session(retries=0)
+
+    root = fetch_and_parse_page(owhttpd, http_session)
+    assert ["bus.1", "bus.1", "directory"] in root
+
+    sensor = fetch_and_parse_page(f"{owhttpd}/bus.2/28.000200010000", http_session)
+    assert ["temperature", "20.5"] in sensor
+    assert ["temphigh", "2"] in sensor
+    assert ["templow", "1"] in sensor
+
+    prop = fetch_and_parse_page(
+        f"{owhttpd}/bus.2/28.000200010000/templow", http_session
+    )
+    assert prop == [["templow", "1"]]
+
+    assert fetch_and_parse_page(f"{owhttpd}/bus.9", http_session) is None
+
+
+def test_record_and_replay(owserver, tmp_path):
+    """A recording answers the same as the recorded OWFS."""
+
+    recording = record_owfs(owserver)
+    filename = str(tmp_path / "recording.json")
+    save_recording(recording, filename)
+
+    replay = ReplayOwfs(load_recording(filename))
+
+    assert replay.dir("/") == owserver.dir("/")
+    assert replay.dir("/bus.2") == owserver.dir("/bus.2")
+    assert replay.read("/bus.2/28.000200010000/templow") == "1"
+    assert replay.read("/bus.2/28.000200010000/missing") is None
+    assert replay.write("/bus.2/simultaneous/temperature", "1")
+    assert not replay.write("/bus.9/simultaneous/temperature", "1")
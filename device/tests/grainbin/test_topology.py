@@ -0,0 +1,241 @@
+"""grainbin.topology module tests."""
+import pytest
+from pytest_mock import MockerFixture
+
+from fd_device.grainbin.owfs_interface import OwfsError
+from fd_device.grainbin.sensor_identity import (
+    load_sensor_identities,
+    save_sensor_identities,
+)
+from fd_device.grainbin.topology import GrainbinTopology
+
+from ..helpers import FakeClock
+
+pytestmark = pytest.mark.usefixtures("tables")
+
+TEST_SENSORS = {
+    "bus.1": ["28.CC9A290D0000", "28.BC9A290D0000"],
+    "bus.2": ["28.BBE5290D0000"],
+}
+TEST_SENSOR_DATA = {
+    "28.CC9A290D0000": {"temperature": "22.1875", "temphigh": "1", "templow": "1"},
+    "28.BC9A290D0000": {"temperature": "22.625", "temphigh": "1", "templow": "2"},
+    "28.BBE5290D0000": {"temperature": "22.4375", "temphigh": "2", "templow": "1"},
+}
+
+
+def patch_owfs(mocker: MockerFixture, sensors: dict):
+    """Patch the owfs interface functions used by the topology."""
+
+    mocks = {}
+    mocks["busses"] = mocker.patch(
+        "fd_device.grainbin.topology.get_all_busses",
+        side_effect=lambda **kwargs: sorted(sensors),
+    )
+    mocks["sensors"] = mocker.patch(
+        "fd_device.grainbin.topology.get_all_sensors_of_bus",
+        side_effect=lambda bus_name, **kwargs: list(sensors[bus_name]),
+    )
+    mocks["read"] = mocker.patch(
+        "fd_device.grainbin.topology.read_sensor_of_bus",
+        side_effect=lambda bus_name, sensor: dict(TEST_SENSOR_DATA[sensor]),
+    )
+    return mocks
+
+
+def test_refresh(mocker: MockerFixture):
+    """Test the refresh method discovers busses, sensors and attributes."""
+
+    patch_owfs(mocker, TEST_SENSORS)
+
+    topology = GrainbinTopology()
+    topology.refresh()
+
+    assert topology.busses == ["bus.1", "bus.2"]
+    assert topology.get_sensors("bus.1") == TEST_SENSORS["bus.1"]
+    assert topology.get_sensors("bus.3") == []
+    assert topology.get_attributes("28.BC9A290D0000") == {
+        "temphigh": "1",
+        "templow": "2",
+    }
+    assert not topology.is_stale()
+
+
+def test_start_cycle_uses_cache(mocker: MockerFixture):
+    """Test the start_cycle method only discovers the topology once."""
+
+    mocks = patch_owfs(mocker, TEST_SENSORS)
+
+    topology = GrainbinTopology(check_every=0)
+    topology.start_cycle()
+    topology.start_cycle()
+    topology.start_cycle()
+
+    assert mocks["busses"].call_count == 1
+    assert mocks["read"].call_count == 3
+
+
+def test_start_cycle_ttl(mocker: MockerFixture):
+    """Test the start_cycle method discovers the topology again after the ttl."""
+
+    mocks = patch_owfs(mocker, TEST_SENSORS)
+    clock = FakeClock()
+
+    topology = GrainbinTopology(ttl=60, check_every=0, clock=clock)
+    topology.start_cycle()
+    clock.now = 61
+    topology.start_cycle()
+
+    assert mocks["busses"].call_count == 2
+
+
+def test_invalidate(mocker: MockerFixture):
+    """Test the invalidate method forces discovery on the next cycle."""
+
+    mocks = patch_owfs(mocker, TEST_SENSORS)
+
+    topology = GrainbinTopology(check_every=0)
+    topology.start_cycle()
+    topology.invalidate()
+
+    assert topology.is_stale()
+    topology.start_cycle()
+    assert mocks["busses"].call_count == 2
+
+
+def test_start_cycle_change_check(mocker: MockerFixture):
+    """Test the listings are compared every check_every cycles."""
+
+    sensors = {bus_name: list(names) for bus_name, names in TEST_SENSORS.items()}
+    mocks = patch_owfs(mocker, sensors)
+
+    topology = GrainbinTopology(check_every=2)
+    topology.start_cycle()
+    # an unchanged listing only costs the directory reads
+    topology.start_cycle()
+    topology.start_cycle()
+    assert mocks["read"].call_count == 3
+
+    # a new sensor is picked up on the next check, not before. The change
+    # reads the attributes of every sensor again.
+    sensors["bus.2"].append("28.CC9A290D0000")
+    topology.start_cycle()
+    assert mocks["read"].call_count == 3
+    topology.start_cycle()
+    assert mocks["read"].call_count == 7
+    assert topology.get_sensors("bus.2") == ["28.BBE5290D0000", "28.CC9A290D0000"]
+
+
+def test_start_cycle_listing_failed(mocker: MockerFixture):
+    """Test a failed listing is not cached and is tried again next cycle."""
+
+    mocks = patch_owfs(mocker, TEST_SENSORS)
+    mocks["busses"].side_effect = [OwfsError("Could not list the busses")] + [
+        sorted(TEST_SENSORS)
+    ] * 2
+
+    topology = GrainbinTopology(check_every=0)
+    topology.start_cycle()
+    assert topology.is_stale()
+    assert topology.busses == []
+
+    topology.start_cycle()
+    assert not topology.is_stale()
+    assert topology.get_sensors("bus.1") == TEST_SENSORS["bus.1"]
+
+    topology.start_cycle()
+    assert mocks["busses"].call_count == 2
+
+
+def test_start_cycle_grainbin_bus_without_sensors(mocker: MockerFixture):
+    """Test a bus with a grainbin and no sensors is discovered again next cycle."""
+
+    sensors = {"bus.1": [], "bus.2": list(TEST_SENSORS["bus.2"])}
+    mocks = patch_owfs(mocker, sensors)
+
+    topology = GrainbinTopology(check_every=0)
+    topology.start_cycle(grainbin_busses=["bus.1", "bus.2"])
+    assert topology.is_stale()
+    assert topology.get_sensors("bus.2") == TEST_SENSORS["bus.2"]
+
+    sensors["bus.1"] = list(TEST_SENSORS["bus.1"])
+    topology.start_cycle(grainbin_busses=["bus.1", "bus.2"])
+    assert not topology.is_stale()
+    assert topology.get_sensors("bus.1") == TEST_SENSORS["bus.1"]
+    assert mocks["busses"].call_count == 2
+
+
+def test_has_changed(mocker: MockerFixture):
+    """Test the has_changed method detects a removed bus."""
+
+    sensors = {bus_name: list(names) for bus_name, names in TEST_SENSORS.items()}
+    patch_owfs(mocker, sensors)
+
+    topology = GrainbinTopology()
+    topology.refresh()
+    assert not topology.has_changed()
+
+    del sensors["bus.2"]
+    assert topology.has_changed()
+
+
+def test_refresh_saves_sensor_identities(mocker: MockerFixture):
+    """Test the refresh method stores the attributes it reads."""
+
+    patch_owfs(mocker, TEST_SENSORS)
+
+    topology = GrainbinTopology()
+    topology.refresh()
+
+    identities = load_sensor_identities()
+    assert identities["28.BBE5290D0000"] == {"temphigh": "2", "templow": "1"}
+    assert len(identities) == 3
+
+
+def test_refresh_uses_sensor_identities(mocker: MockerFixture):
+    """Test the refresh method only reads sensors missing from the store."""
+
+    mocks = patch_owfs(mocker, TEST_SENSORS)
+    save_sensor_identities(
+        {
+            "28.CC9A290D0000": {"temphigh": "5", "templow": "6"},
+            "28.BC9A290D0000": {"temphigh": "5", "templow": "7"},
+        }
+    )
+
+    topology = GrainbinTopology()
+    topology.refresh()
+
+    assert mocks["read"].call_count == 1
+    assert topology.get_attributes("28.CC9A290D0000") == {
+        "temphigh": "5",
+        "templow": "6",
+    }
+
+
+def test_invalidate_reload_attributes(mocker: MockerFixture):
+    """Test the invalidate method can ask for the attributes to be read again."""
+
+    mocks = patch_owfs(mocker, TEST_SENSORS)
+
+    topology = GrainbinTopology(check_every=0)
+    topology.start_cycle()
+    topology.invalidate()
+    topology.start_cycle()
+    assert mocks["read"].call_count == 3
+
+    topology.invalidate(reload_attributes=True)
+    topology.start_cycle()
+    assert mocks["read"].call_count == 6
+
+
+def test_refresh_does_not_save_failed_reads(mocker: MockerFixture):
+    """Test a sensor that could not be read is not stored."""
+
+    patch_owfs(mocker, TEST_SENSORS)
+    mocker.patch("fd_device.grainbin.topology.read_sensor_of_bus", return_value={})
+
+    topology = GrainbinTopology()
+    topology.refresh()
+
+    assert load_sensor_identities() == {}
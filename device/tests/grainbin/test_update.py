@@ -1,13 +1,21 @@
 """grainbin.update module tests."""
 import datetime
+import threading
 
 import pytest
 from pytest_mock import MockerFixture
+from sqlalchemy import event, select
 
+from fd_device.database.device import GrainbinReading
+from fd_device.database.metadata import GrainbinMetadata
+from fd_device.grainbin.topology import GrainbinTopology
 from fd_device.grainbin.update import (
     get_average_temperature,
+    get_bus_grainbin_updates,
+    get_grainbin_batch,
     get_grainbin_updates,
     get_indivudual_grainbin_update,
+    store_average_temperatures,
 )
 from fd_device.settings import get_config
 
@@ -35,25 +43,25 @@ class TestGetIndividualGrainbinUpdate:
         "sensor_names": ["28.CC9A290D0000", "28.BC9A290D0000", "28.BBE5290D0000"],
         "sensor_data": [
             {
-                "temperature": "22.1875",
+                "temperature": 22.1875,
                 "temphigh": "1",
                 "templow": "1",
                 "sensor_name": "28.CC9A290D0000",
             },
             {
-                "temperature": "22.625",
+                "temperature": 22.625,
                 "temphigh": "1",
                 "templow": "2",
                 "sensor_name": "28.BC9A290D0000",
             },
             {
-                "temperature": "22.4375",
+                "temperature": 22.4375,
                 "temphigh": "1",
                 "templow": "3",
                 "sensor_name": "28.BBE5290D0000",
             },
         ],
-        "average_temp": "22.4167",
+        "average_temp": 22.4167,
     }
 
     test_grainbin_update_2 = {
@@ -64,19 +72,19 @@ class TestGetIndividualGrainbinUpdate:
         "sensor_names": ["28.CC9A290D0000", "28.BC9A290D0000"],
         "sensor_data": [
             {
-                "temperature": "22.1875",
+                "temperature": 22.1875,
                 "temphigh": "2",
                 "templow": "1",
                 "sensor_name": "28.CC9A290D0000",
             },
             {
-                "temperature": "22.625",
+                "temperature": 22.625,
                 "temphigh": "2",
                 "templow": "2",
                 "sensor_name": "28.BC9A290D0000",
             },
         ],
-        "average_temp": "22.4062",
+        "average_temp": 22.4062,
     }
 
     @staticmethod
@@ -87,8 +95,8 @@ class TestGetIndividualGrainbinUpdate:
 
         avg_temperature = get_average_temperature(test_temperatures)
 
-        assert isinstance(avg_temperature, str)
-        assert avg_temperature == "22.4167"
+        assert isinstance(avg_temperature, float)
+        assert avg_temperature == 22.4167
 
     @staticmethod
     def test_get_average_temperature_percision():
@@ -98,8 +106,8 @@ class TestGetIndividualGrainbinUpdate:
 
         avg_temperature = get_average_temperature(test_temperatures, percision=2)
 
-        assert isinstance(avg_temperature, str)
-        assert avg_temperature == "22.42"
+        assert isinstance(avg_temperature, float)
+        assert avg_temperature == 22.42
 
     @staticmethod
     def test_get_average_temperature_empty():
@@ -109,8 +117,7 @@ class TestGetIndividualGrainbinUpdate:
 
         avg_temperature = get_average_temperature(test_temperatures)
 
-        assert isinstance(avg_temperature, str)
-        assert avg_temperature == "N/A"
+        assert avg_temperature is None
 
     @staticmethod
     def test_get_individual_grainbin_update(mocker: MockerFixture):
@@ -137,15 +144,80 @@ class TestGetIndividualGrainbinUpdate:
         assert individual_update["bus_number_string"] == grainbin.bus_number_string
         assert isinstance(individual_update["sensor_names"], list)
         assert isinstance(individual_update["sensor_data"], list)
-        assert isinstance(individual_update["average_temp"], str)
+        assert isinstance(individual_update["average_temp"], float)
+        assert all(
+            isinstance(data["temperature"], float)
+            for data in individual_update["sensor_data"]
+        )
+
+    @staticmethod
+    def test_get_individual_grainbin_update_with_topology(mocker: MockerFixture):
+        """Test the get_individual_grainbin_update function only reads temperatures with a topology."""
+
+        topology = GrainbinTopology()
+        topology.sensors = {"bus.0": TestGetIndividualGrainbinUpdate.test_sensor_list_1}
+        topology.attributes = {
+            sensor: {"temphigh": data["temphigh"], "templow": data["templow"]}
+            for sensor, data in zip(
+                TestGetIndividualGrainbinUpdate.test_sensor_list_1,
+                TestGetIndividualGrainbinUpdate.test_sensor_data_1,
+            )
+        }
+
+        read_sensor_of_bus = mocker.patch(
+            "fd_device.grainbin.update.read_sensor_of_bus"
+        )
+        mocker.patch(
+            "fd_device.grainbin.update.read_sensor_temperature",
+            side_effect=[
+                data["temperature"]
+                for data in TestGetIndividualGrainbinUpdate.test_sensor_data_1
+            ],
+        )
+
+        grainbin = GrainbinFactory()
+        grainbin.update(bus_number_string="bus.0")
+
+        individual_update = get_indivudual_grainbin_update(grainbin, topology)
+
+        expected = TestGetIndividualGrainbinUpdate.test_grainbin_update_1
+        assert individual_update["sensor_names"] == expected["sensor_names"]
+        assert individual_update["sensor_data"] == expected["sensor_data"]
+        assert individual_update["average_temp"] == expected["average_temp"]
+        read_sensor_of_bus.assert_not_called()
+
+    @staticmethod
+    def test_get_individual_grainbin_update_missing_sensor(mocker: MockerFixture):
+        """Test the get_individual_grainbin_update function invalidates the topology if a sensor is missing."""
+
+        topology = GrainbinTopology()
+        topology.sensors = {"bus.0": ["28.CC9A290D0000", "28.BC9A290D0000"]}
+        topology.refresh = mocker.Mock()
+        mocker.patch(
+            "fd_device.grainbin.update.read_sensor_temperature",
+            side_effect=["22.1875", None],
+        )
+
+        grainbin = GrainbinFactory()
+        grainbin.update(bus_number_string="bus.0")
+
+        individual_update = get_indivudual_grainbin_update(grainbin, topology)
+
+        assert individual_update["sensor_names"] == [
+            sensor["sensor_name"] for sensor in individual_update["sensor_data"]
+        ]
+        assert individual_update["sensor_data"][1]["temperature"] is None
+        assert individual_update["average_temp"] == 22.1875
+        assert topology.is_stale()
 
     @staticmethod
     def test_get_grainbin_updates(mocker: MockerFixture):
         """Test the get_grainbin_updates function."""
 
+        mocker.patch("fd_device.grainbin.update.TOPOLOGY", busses=["bus.1", "bus.2"])
         mocker.patch(
-            "fd_device.grainbin.update.get_all_busses",
-            return_value=["bus.1", "bus.2"],
+            "fd_device.grainbin.update.start_simultaneous_conversion",
+            return_value=False,
         )
 
         individual_updates = [
@@ -169,9 +241,10 @@ class TestGetIndividualGrainbinUpdate:
     def test_get_grainbin_updates_with_session(mocker: MockerFixture, dbsession):
         """Test the get_grainbin_updates function with a session."""
 
+        mocker.patch("fd_device.grainbin.update.TOPOLOGY", busses=["bus.1", "bus.2"])
         mocker.patch(
-            "fd_device.grainbin.update.get_all_busses",
-            return_value=["bus.1", "bus.2"],
+            "fd_device.grainbin.update.start_simultaneous_conversion",
+            return_value=False,
         )
 
         individual_updates = [
@@ -191,13 +264,231 @@ class TestGetIndividualGrainbinUpdate:
         assert isinstance(grainbin_update, list)
         assert len(grainbin_update) == 2
 
+    @staticmethod
+    def test_get_grainbin_updates_stores_readings(mocker: MockerFixture, dbsession):
+        """Test the get_grainbin_updates function stores the sensor readings."""
+
+        mocker.patch("fd_device.grainbin.update.TOPOLOGY", busses=["bus.1"])
+        mocker.patch(
+            "fd_device.grainbin.update.start_simultaneous_conversion",
+            return_value=False,
+        )
+        grainbin = GrainbinFactory()
+        grainbin.update(bus_number_string="bus.1")
+        update = dict(TestGetIndividualGrainbinUpdate.test_grainbin_update_1)
+        update["name"] = grainbin.name
+        mocker.patch(
+            "fd_device.grainbin.update.get_indivudual_grainbin_update",
+            return_value=update,
+        )
+
+        get_grainbin_updates(session=dbsession)
+
+        readings = dbsession.scalars(select(GrainbinReading)).all()
+        assert len(readings) == len(update["sensor_data"])
+        assert {reading.grainbin_id for reading in readings} == {grainbin.id}
+
+    @staticmethod
+    def test_get_individual_grainbin_update_no_bus(mocker: MockerFixture):
+        """Test a grainbin without a bus has no sensors and reads nothing."""
+
+        mocked_sensors = mocker.patch(
+            "fd_device.grainbin.update.get_all_sensors_of_bus"
+        )
+        grainbin = GrainbinMetadata(
+            id=1, name="bin 1", bus_number=1, bus_number_string=None
+        )
+
+        info = get_indivudual_grainbin_update(grainbin)
+
+        assert info["sensor_names"] == []
+        assert info["sensor_data"] == []
+        assert info["average_temp"] is None
+        mocked_sensors.assert_not_called()
+
+    @staticmethod
+    def test_get_grainbin_batch():
+        """Test the get_grainbin_batch function sends the shared values once."""
+
+        created_at = datetime.datetime(2024, 1, 1, 12, 0)
+        updates = [
+            {"created_at": created_at, "name": "bin 1", "average_temp": 20.0},
+            {"created_at": created_at, "name": "bin 2", "average_temp": 21.0},
+        ]
+
+        batch = get_grainbin_batch(updates, "device 1", created_at)
+
+        assert batch["device_id"] == "device 1"
+        assert batch["created_at"] == created_at
+        assert [grainbin["name"] for grainbin in batch["grainbins"]] == [
+            "bin 1",
+            "bin 2",
+        ]
+        assert "created_at" not in batch["grainbins"][0]
+        # the updates themselves are not changed
+        assert "created_at" in updates[0]
+
+    @staticmethod
+    def test_get_grainbin_batch_read_time():
+        """Test the batch is stamped with when the first grainbin was read."""
+
+        first = datetime.datetime(2024, 1, 1, 12, 0)
+        updates = [
+            {"created_at": first + datetime.timedelta(seconds=2), "name": "bin 1"},
+            {"created_at": first, "name": "bin 2"},
+        ]
+
+        assert get_grainbin_batch(updates, "device 1")["created_at"] == first
+
+    @staticmethod
+    def test_store_average_temperatures(dbsession):
+        """Test the store_average_temperatures function updates every grainbin in one statement."""
+
+        grainbins = GrainbinFactory.create_batch(3)
+        grainbins[1].update(average_temp=5.0)
+        grainbin_ids = {grainbin.name: grainbin.id for grainbin in grainbins}
+        names = list(grainbin_ids)
+
+        statements = []
+        engine = dbsession.get_bind()
+
+        def count(*args):
+            statements.append(args[2])
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            updated = store_average_temperatures(
+                [
+                    {"name": names[0], "average_temp": 21.5},
+                    {"name": names[1], "average_temp": None},
+                    {"name": names[2]},
+                    {"name": "unknown bin", "average_temp": 30.0},
+                ],
+                grainbin_ids,
+                dbsession,
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        dbsession.commit()
+
+        assert updated == 2
+        assert len(statements) == 1
+        assert statements[0].startswith("UPDATE grainbin")
+        # the loaded objects see the new values after the commit
+        assert grainbins[0].average_temp == 21.5
+        assert grainbins[1].average_temp is None
+
+    @staticmethod
+    def test_store_average_temperatures_no_updates(dbsession):
+        """Test the store_average_temperatures function without updates does nothing."""
+
+        assert store_average_temperatures([], {}, dbsession) == 0
+
     @staticmethod
     def test_get_grainbin_updates_no_grainbins(mocker: MockerFixture):
         """Test the get_grainbin_updates function with no grainbins."""
 
-        mocker.patch("fd_device.grainbin.update.get_all_busses")
+        topology = mocker.patch("fd_device.grainbin.update.TOPOLOGY")
 
         grainbin_update = get_grainbin_updates()
 
         assert isinstance(grainbin_update, list)
         assert len(grainbin_update) == 0
+        topology.start_cycle.assert_not_called()
+
+    @staticmethod
+    def test_get_grainbin_updates_busses_in_parallel(mocker: MockerFixture):
+        """Test the get_grainbin_updates function reads different busses at the same time."""
+
+        mocker.patch("fd_device.grainbin.update.TOPOLOGY", busses=["bus.1", "bus.2"])
+        mocker.patch(
+            "fd_device.grainbin.update.start_simultaneous_conversion",
+            return_value=False,
+        )
+
+        # both busses must be read at the same time to pass the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        def fake_update(grainbin, _topology, _latest):
+            barrier.wait()
+            return {"name": grainbin.name}
+
+        mocker.patch(
+            "fd_device.grainbin.update.get_indivudual_grainbin_update",
+            side_effect=fake_update,
+        )
+
+        grainbins = GrainbinFactory.create_batch(2)
+        grainbins[0].update(bus_number_string="bus.1")
+        grainbins[1].update(bus_number_string="bus.2")
+        names = [grainbin.name for grainbin in grainbins]
+        grainbin_update = get_grainbin_updates()
+
+        assert [update["name"] for update in grainbin_update] == names
+
+    @staticmethod
+    def test_get_bus_grainbin_updates(mocker: MockerFixture):
+        """Test the get_bus_grainbin_updates function reads grainbins in order."""
+
+        mocker.patch(
+            "fd_device.grainbin.update.get_indivudual_grainbin_update",
+            side_effect=lambda grainbin, topology, latest: {"name": grainbin.name},
+        )
+
+        grainbins = GrainbinFactory.create_batch(2)
+        bus_updates = get_bus_grainbin_updates(grainbins)
+
+        assert [update["name"] for update in bus_updates] == [
+            grainbins[0].name,
+            grainbins[1].name,
+        ]
+
+    @staticmethod
+    def test_get_bus_grainbin_updates_simultaneous(mocker: MockerFixture):
+        """Test the get_bus_grainbin_updates function converts the bus once."""
+
+        mocker.patch(
+            "fd_device.grainbin.update.CONFIG.GRAINBIN_SIMULTANEOUS_CONVERSION", True
+        )
+        mocker.patch("fd_device.grainbin.update.time.sleep")
+        start = mocker.patch(
+            "fd_device.grainbin.update.start_simultaneous_conversion",
+            return_value=True,
+        )
+        update = mocker.patch(
+            "fd_device.grainbin.update.get_indivudual_grainbin_update",
+            return_value={},
+        )
+
+        topology = GrainbinTopology()
+        grainbins = GrainbinFactory.create_batch(2)
+        for grainbin in grainbins:
+            grainbin.update(bus_number_string="bus.1")
+        get_bus_grainbin_updates(grainbins, topology)
+
+        start.assert_called_once_with("bus.1")
+        update.assert_called_with(grainbins[1], topology, True)
+
+    @staticmethod
+    def test_get_bus_grainbin_updates_simultaneous_failed(mocker: MockerFixture):
+        """Test the get_bus_grainbin_updates function falls back if the conversion fails."""
+
+        mocker.patch(
+            "fd_device.grainbin.update.CONFIG.GRAINBIN_SIMULTANEOUS_CONVERSION", True
+        )
+        sleep = mocker.patch("fd_device.grainbin.update.time.sleep")
+        mocker.patch(
+            "fd_device.grainbin.update.start_simultaneous_conversion",
+            return_value=False,
+        )
+        update = mocker.patch(
+            "fd_device.grainbin.update.get_indivudual_grainbin_update",
+            return_value={},
+        )
+
+        topology = GrainbinTopology()
+        grainbins = GrainbinFactory.create_batch(1)
+        get_bus_grainbin_updates(grainbins, topology)
+
+        update.assert_called_once_with(grainbins[0], topology, False)
+        sleep.assert_not_called()
@@ -0,0 +1,227 @@
+"""celery_runner module tests."""
+import pytest
+from celery import exceptions
+from sqlalchemy import select
+
+from fd_device.celery_runner import (
+    TaskSupport,
+    send_grainbin_update,
+    send_outbox_updates,
+    send_update_to_server,
+    send_updates_to_server,
+)
+from fd_device.database.device import OutboxMessage
+from fd_device.outbox import get_outbox_status
+
+from .factories import DeviceFactory
+
+pytestmark = pytest.mark.usefixtures("tables")
+
+
+def test_send_update_to_server_stores_on_failure(mocker):
+    """An update that could not be published is stored in the outbox."""
+
+    mocker.patch("fd_device.celery_runner.app.send_task", side_effect=OSError)
+
+    assert send_update_to_server("device.update", {"id": 1}) is False
+    assert get_outbox_status()["messages"] == 0
+
+    assert (
+        send_update_to_server("device.update", {"id": 1}, store_on_failure=True)
+        is False
+    )
+    assert get_outbox_status()["messages"] == 1
+
+
+def test_send_grainbin_update_stores_rest_after_failure(mocker):
+    """After a failed send the other updates are stored without trying them."""
+
+    mocker.patch(
+        "fd_device.celery_runner.get_grainbin_updates",
+        return_value=[{"name": "bin 1"}, {"name": "bin 2"}, {"name": "bin 3"}],
+    )
+    send_task = mocker.patch(
+        "fd_device.celery_runner.app.send_task", side_effect=OSError
+    )
+
+    send_grainbin_update()
+
+    send_task.assert_called_once()
+    assert get_outbox_status()["messages"] == 3
+
+
+def test_send_outbox_updates(mocker):
+    """The stored updates are published without waiting for results."""
+
+    mocker.patch("fd_device.celery_runner.app.send_task", side_effect=OSError)
+    send_update_to_server("device.update", {"id": 1}, store_on_failure=True)
+    send_task = mocker.patch("fd_device.celery_runner.app.send_task")
+
+    send_outbox_updates()
+
+    send_task.assert_called_once()
+    assert send_task.call_args[0] == ("device.update",)
+    assert send_task.call_args[1]["args"] == [{"id": 1}]
+    assert send_task.call_args[1]["ignore_result"] is True
+    assert get_outbox_status()["messages"] == 0
+
+
+def test_send_updates_to_server_publishes_first(mocker):
+    """Every payload is published before any result is waited for."""
+
+    calls = []
+    result = mocker.Mock()
+    result.get.side_effect = lambda **kwargs: calls.append("get") or True
+
+    def send_task(task_name, args, **options):
+        calls.append("send")
+        return result
+
+    mocker.patch("fd_device.celery_runner.app.send_task", side_effect=send_task)
+
+    outcomes = send_updates_to_server("grainbin.update", [{"id": 1}, {"id": 2}])
+
+    assert calls == ["send", "send", "get", "get"]
+    assert [outcome.status for outcome in outcomes] == ["sent", "sent"]
+    assert [outcome.attempts for outcome in outcomes] == [1, 1]
+
+
+def test_send_updates_to_server_retries_timeouts(mocker):
+    """A payload without a result in time is sent again on its own."""
+
+    sent = mocker.Mock()
+    sent.get.return_value = True
+    timed_out = mocker.Mock()
+    timed_out.get.side_effect = exceptions.TimeoutError
+    mocker.patch(
+        "fd_device.celery_runner.app.send_task",
+        side_effect=[sent, timed_out, sent],
+    )
+
+    outcomes = send_updates_to_server("grainbin.update", [{"id": 1}, {"id": 2}])
+
+    assert [outcome.status for outcome in outcomes] == ["sent", "sent"]
+    assert [outcome.attempts for outcome in outcomes] == [1, 2]
+
+
+def test_send_updates_to_server_gives_up_after_retries(mocker):
+    """A payload still without a result after the retries times out."""
+
+    timed_out = mocker.Mock()
+    timed_out.get.side_effect = exceptions.TimeoutError
+    mocker.patch("fd_device.celery_runner.app.send_task", return_value=timed_out)
+    mocker.patch("fd_device.celery_runner.CONFIG.SEND_TASK_RETRIES", 2)
+
+    (outcome,) = send_updates_to_server(
+        "grainbin.update", [{"id": 1}], store_on_failure=True
+    )
+
+    assert outcome.status == "timeout"
+    assert outcome.attempts == 3
+    # the task was published, so it is not stored to be sent again
+    assert get_outbox_status()["messages"] == 0
+
+
+@pytest.fixture
+def grainbin_updates(mocker):
+    """Send three grainbin updates with a fresh batch task support."""
+
+    mocker.patch(
+        "fd_device.celery_runner.get_grainbin_updates",
+        return_value=[{"name": "bin 1"}, {"name": "bin 2"}, {"name": "bin 3"}],
+    )
+    mocker.patch("fd_device.celery_runner.GRAINBIN_BATCH", TaskSupport(retry_after=60))
+
+
+@pytest.mark.usefixtures("grainbin_updates")
+class TestSendGrainbinBatch:
+    """Test sending the grainbin updates in one batch task."""
+
+    @staticmethod
+    def test_batch_is_sent(mocker):
+        """The updates of a cycle are sent in one task."""
+
+        DeviceFactory(device_id="device 1")
+        send_task = mocker.patch("fd_device.celery_runner.app.send_task")
+
+        send_grainbin_update()
+
+        send_task.assert_called_once()
+        task_name, kwargs = send_task.call_args[0][0], send_task.call_args[1]
+        (batch,) = kwargs["args"]
+        assert task_name == "grainbin.update_batch"
+        assert batch["device_id"] == "device 1"
+        assert len(batch["grainbins"]) == 3
+
+    @staticmethod
+    def test_not_registered_falls_back(mocker):
+        """If the server does not have the batch task one task per grainbin is sent."""
+
+        DeviceFactory()
+        batch_result = mocker.Mock()
+        batch_result.get.return_value = exceptions.NotRegistered(
+            "grainbin.update_batch"
+        )
+        send_task = mocker.patch(
+            "fd_device.celery_runner.app.send_task",
+            side_effect=[batch_result] + [mocker.Mock()] * 6,
+        )
+
+        send_grainbin_update()
+        task_names = [call[0][0] for call in send_task.call_args_list]
+        assert task_names == ["grainbin.update_batch"] + ["grainbin.update"] * 3
+
+        # the batch task is not tried again until retry_after has passed
+        send_grainbin_update()
+        assert send_task.call_count == 7
+        assert send_task.call_args[0][0] == "grainbin.update"
+
+    @staticmethod
+    def test_no_device_sends_per_grainbin(mocker):
+        """Without a device id the updates are sent one per grainbin."""
+
+        send_task = mocker.patch("fd_device.celery_runner.app.send_task")
+
+        send_grainbin_update()
+
+        assert send_task.call_count == 3
+        assert send_task.call_args[0][0] == "grainbin.update"
+
+    @staticmethod
+    def test_publish_failure_stores_per_grainbin(mocker, dbsession):
+        """A batch that could not be published is stored one update per grainbin."""
+
+        DeviceFactory()
+        mocker.patch("fd_device.celery_runner.app.send_task", side_effect=OSError)
+
+        send_grainbin_update()
+
+        task_names = dbsession.scalars(select(OutboxMessage.task_name)).all()
+        assert task_names == ["grainbin.update"] * 3
+
+
+def test_task_support_retry_after():
+    """An unsupported task is tried again after retry_after seconds."""
+
+    now = [0.0]
+    support = TaskSupport(retry_after=10, clock=lambda: now[0])
+    assert support.is_supported()
+
+    support.mark_unsupported()
+    assert not support.is_supported()
+
+    now[0] = 11.0
+    assert support.is_supported()
+
+
+def test_publish_update_serializer(mocker):
+    """Updates are published with the configured serializer and compression."""
+
+    send_task = mocker.patch("fd_device.celery_runner.app.send_task")
+    mocker.patch("fd_device.celery_runner.CONFIG.UPDATE_SERIALIZER", "fd_columnar")
+    mocker.patch("fd_device.celery_runner.CONFIG.UPDATE_COMPRESSION", "zlib")
+
+    send_update_to_server("device.update", {"id": 1}, ignore_result=True)
+
+    assert send_task.call_args[1]["serializer"] == "fd_columnar"
+    assert send_task.call_args[1]["compression"] == "zlib"
@@ -0,0 +1,105 @@
+"""outbox module tests."""
+import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from fd_device.database.device import OutboxMessage
+from fd_device.outbox import drain_outbox, get_outbox_status, store_message
+
+pytestmark = pytest.mark.usefixtures("tables")
+
+CREATED_AT = datetime.datetime(2024, 5, 1, 12, 30)
+
+
+def store(count: int, session):
+    """Store count grainbin updates."""
+    for number in range(count):
+        store_message(
+            "grainbin.update",
+            {"name": f"bin {number}", "created_at": CREATED_AT, "average_temp": 1.5},
+            session=session,
+        )
+
+
+def test_store_message_round_trip(dbsession):
+    """The payload is sent again exactly as it was stored."""
+
+    store(1, dbsession)
+    sent = []
+
+    assert drain_outbox(lambda *args: sent.append(args) or True, rate=0) == 1
+    assert sent == [
+        (
+            "grainbin.update",
+            {"name": "bin 0", "created_at": CREATED_AT, "average_temp": 1.5},
+        )
+    ]
+    assert dbsession.scalar(select(func.count(OutboxMessage.id))) == 0
+
+
+def test_drain_outbox_in_order_and_batches(dbsession):
+    """The messages are sent oldest first across batches."""
+
+    store(5, dbsession)
+    names = []
+
+    sent = drain_outbox(
+        lambda _task, payload: names.append(payload["name"]) or True,
+        batch_size=2,
+        rate=0,
+        session=dbsession,
+    )
+
+    assert sent == 5
+    assert names == [f"bin {number}" for number in range(5)]
+
+
+def test_drain_outbox_stops_at_failure(dbsession):
+    """Sending stops at the first failure and the rest is kept."""
+
+    store(4, dbsession)
+    results = iter([True, False])
+
+    sent = drain_outbox(
+        lambda *_args: next(results), batch_size=10, rate=0, session=dbsession
+    )
+
+    assert sent == 1
+    messages = dbsession.scalars(select(OutboxMessage)).all()
+    assert len(messages) == 3
+    assert messages[0].attempts == 1
+    assert messages[0].last_attempt is not None
+
+
+def test_drain_outbox_max_messages(dbsession):
+    """No more than max_messages are sent per call."""
+
+    store(5, dbsession)
+
+    assert drain_outbox(lambda *_args: True, rate=0, max_messages=3) == 3
+    assert get_outbox_status()["messages"] == 2
+
+
+def test_drain_outbox_rate(dbsession, mocker):
+    """The sends are spaced by the rate, also between batches."""
+
+    sleep = mocker.patch("fd_device.outbox.time.sleep")
+    store(3, dbsession)
+
+    drain_outbox(lambda *_args: True, batch_size=2, rate=4, session=dbsession)
+
+    assert sleep.call_args_list == [mocker.call(0.25)] * 2
+
+
+def test_get_outbox_status(dbsession):
+    """The status shows the number of stored messages."""
+
+    assert get_outbox_status(session=dbsession)["messages"] == 0
+    store(2, dbsession)
+
+    status = get_outbox_status(session=dbsession)
+
+    assert status["messages"] == 2
+    assert status["oldest"] is not None
+    assert status["last_attempt"] is None
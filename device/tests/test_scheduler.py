@@ -0,0 +1,184 @@
+"""scheduler module tests."""
+import threading
+
+import pytest
+
+from fd_device.scheduler import COALESCE, QUEUE, SKIP, Job, Scheduler
+
+from .helpers import FakeClock
+
+
+def blocking_job(overlap: str):
+    """Return a job that waits until the returned event is set."""
+
+    release = threading.Event()
+    job = Job(lambda: release.wait(5), 60, name="blocking", overlap=overlap)
+    return job, release
+
+
+def test_run_times_are_aligned():
+    """Run times are multiples of the interval shifted by the offset."""
+
+    job = Job(lambda: None, 60, offset=5)
+
+    job.schedule_next(125)
+    assert job.next_run == 185
+    job.schedule_next(185)
+    assert job.next_run == 245
+
+
+def test_run_pending_does_not_drift():
+    """A job runs at its run times no matter when the scheduler wakes up."""
+
+    clock = FakeClock(100)
+    runs = []
+    scheduler = Scheduler(jitter=0, clock=clock)
+    job = scheduler.add_job(lambda: runs.append(clock.now), 60)
+
+    assert scheduler.run_pending() == 120
+    assert not runs
+
+    # the scheduler woke up late
+    clock.now = 127
+    assert scheduler.run_pending() == 180
+    clock.now = 181
+    assert scheduler.run_pending() == 240
+    job.shutdown()
+
+    assert len(runs) == 2
+    assert job.stats.max_lateness == pytest.approx(7)
+
+
+def test_missed_runs_start_once():
+    """A job that missed several run times is started once."""
+
+    clock = FakeClock(0)
+    runs = []
+    scheduler = Scheduler(jitter=0, clock=clock)
+    job = scheduler.add_job(lambda: runs.append(clock.now), 10)
+    scheduler.run_pending()
+
+    clock.now = 55
+    assert scheduler.run_pending() == 60
+    job.shutdown()
+
+    assert len(runs) == 1
+
+
+def test_clock_set_back():
+    """The run time is computed again when the clock is set back."""
+
+    clock = FakeClock(1_000_000)
+    scheduler = Scheduler(jitter=0, clock=clock)
+    job = scheduler.add_job(lambda: None, 60)
+    scheduler.run_pending()
+
+    clock.now = 120
+    assert scheduler.run_pending() == 180
+    assert job.stats.runs == 0
+
+
+def test_add_job_jitter():
+    """Each job gets a random offset of up to the jitter."""
+
+    scheduler = Scheduler(jitter=30)
+    offsets = [scheduler.add_job(lambda: None, 60).offset for _ in range(20)]
+
+    assert all(0 <= offset <= 30 for offset in offsets)
+    assert len(set(offsets)) > 1
+    # the offset is never larger than the interval
+    assert scheduler.add_job(lambda: None, 10).offset <= 10
+
+
+def test_add_job_default_jitter():
+    """Without a jitter the offsets are spread over the whole interval."""
+
+    scheduler = Scheduler()
+    offsets = [scheduler.add_job(lambda: None, 3600).offset for _ in range(50)]
+
+    assert all(0 <= offset <= 3600 for offset in offsets)
+    assert max(offsets) - min(offsets) > 60
+
+
+def test_add_job_invalid():
+    """An unknown overlap policy or a non positive interval is refused."""
+
+    with pytest.raises(ValueError):
+        Scheduler().add_job(lambda: None, 60, overlap="wait")
+    with pytest.raises(ValueError):
+        Scheduler().add_job(lambda: None, 0)
+
+
+@pytest.mark.parametrize(
+    "overlap, submitted, runs",
+    [(SKIP, 1, 1), (COALESCE, 2, 2), (QUEUE, 3, 3)],
+)
+def test_overlap_policy(overlap, submitted, runs):
+    """Runs due while the job is still running follow the overlap policy."""
+
+    job, release = blocking_job(overlap)
+
+    results = [job.submit(due=0) for _ in range(3)]
+    release.set()
+    job.shutdown()
+
+    assert results.count(True) == submitted
+    assert job.stats.skipped == 3 - submitted
+    assert job.stats.runs == runs
+
+
+def test_jobs_do_not_block_each_other():
+    """A slow job does not delay the other jobs."""
+
+    clock = FakeClock(0)
+    scheduler = Scheduler(jitter=0, clock=clock)
+    release = threading.Event()
+    fast_done = threading.Event()
+    scheduler.add_job(lambda: release.wait(5), 10, name="slow")
+    scheduler.add_job(fast_done.set, 10, name="fast")
+    scheduler.run_pending()
+
+    clock.now = 10
+    scheduler.run_pending()
+
+    assert fast_done.wait(5)
+    release.set()
+    scheduler.shutdown()
+
+
+def test_failed_job():
+    """A job that raises is counted as failed and keeps its schedule."""
+
+    def fail():
+        raise RuntimeError("failed")
+
+    job = Job(fail, 60, overlap=QUEUE)
+    job.submit(due=0)
+    job.submit(due=60)
+    job.shutdown()
+
+    stats = job.get_stats()
+    assert stats["runs"] == 2
+    assert stats["failures"] == 2
+
+
+def test_run_until_stopped():
+    """The scheduler runs the jobs until stop is called."""
+
+    scheduler = Scheduler()
+    runs = []
+
+    def job():
+        runs.append(1)
+        if len(runs) == 2:
+            scheduler.stop()
+
+    scheduler.add_job(job, 0.05, overlap=QUEUE)
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    thread.join(5)
+    scheduler.shutdown()
+
+    assert not thread.is_alive()
+    assert len(runs) >= 2
+    assert scheduler.snapshot()["job"]["runs"] == len(runs)
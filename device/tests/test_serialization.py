@@ -0,0 +1,96 @@
+"""serialization module tests."""
+import datetime
+import zlib
+
+from kombu import serialization
+from kombu.utils.json import dumps as json_dumps
+
+from fd_device.serialization import (
+    CONTENT_TYPE,
+    SERIALIZER_NAME,
+    dumps,
+    from_columns,
+    loads,
+    register_serializer,
+    to_columns,
+)
+
+
+def grainbin_update(sensor_count: int = 3) -> dict:
+    """Return a grainbin update like get_indivudual_grainbin_update does."""
+
+    return {
+        "created_at": datetime.datetime(2024, 1, 1, 12, 30),
+        "name": "bin 1",
+        "bus_number": 1,
+        "bus_number_string": "bus.1",
+        "sensor_names": [f"28.{n:012X}" for n in range(sensor_count)],
+        "sensor_data": [
+            {
+                "temperature": 20.0 + n / 16,
+                "temphigh": 1,
+                "templow": n,
+                "sensor_name": f"28.{n:012X}",
+            }
+            for n in range(sensor_count)
+        ],
+        "average_temp": 21.0,
+    }
+
+
+def test_to_columns():
+    """The sensor dictionaries are sent as parallel arrays."""
+
+    columns = to_columns(grainbin_update())
+
+    sensor_data = columns["sensor_data"]["__columns__"]
+    assert list(sensor_data) == ["temperature", "temphigh", "templow", "sensor_name"]
+    assert sensor_data["templow"] == [0, 1, 2]
+    # a list of strings is not changed
+    assert columns["sensor_names"] == grainbin_update()["sensor_names"]
+
+
+def test_to_columns_different_keys():
+    """A list of dictionaries with different keys is not changed."""
+
+    rows = [{"a": 1}, {"b": 2}]
+
+    assert to_columns(rows) == rows
+    assert to_columns([{"a": 1}]) == [{"a": 1}]
+
+
+def test_round_trip():
+    """A celery message body is loaded back unchanged, including datetimes."""
+
+    batch = {
+        "device_id": "device 1",
+        "created_at": datetime.datetime(2024, 1, 1, 12, 30),
+        "grainbins": [grainbin_update(), grainbin_update(5)],
+    }
+    body = ([batch], {}, {"callbacks": None})
+
+    assert loads(dumps(body)) == [[batch], {}, {"callbacks": None}]
+    assert from_columns(to_columns(batch)) == batch
+
+
+def test_smaller_than_json():
+    """The columnar layout is smaller than json, also when compressed."""
+
+    update = grainbin_update(30)
+
+    assert len(dumps(update)) < len(json_dumps(update)) * 0.7
+    assert len(zlib.compress(dumps(update).encode())) < len(
+        zlib.compress(json_dumps(update).encode())
+    )
+
+
+def test_register_serializer():
+    """The serializer is registered with kombu under its content type."""
+
+    register_serializer()
+    update = grainbin_update()
+
+    content_type, encoding, data = serialization.dumps(update, SERIALIZER_NAME)
+
+    assert content_type == CONTENT_TYPE
+    assert serialization.loads(data, content_type, encoding) == update
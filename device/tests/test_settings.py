@@ -1,6 +1,12 @@
 # pylint: disable=unused-argument
 """Test settings."""
-from fd_device.settings import DevConfig, ProdConfig, TestConfig, get_config
+from fd_device.settings import (
+    CeleryConfig,
+    DevConfig,
+    ProdConfig,
+    TestConfig,
+    get_config,
+)
 
 
 def test_retrieving_settings():
@@ -14,3 +20,10 @@ def test_retrieving_settings():
     assert dev_config == DevConfig
     assert prod_config == ProdConfig
     assert wrong_config == DevConfig
+
+
+def test_celery_broker_pool():
+    """Broker connections are kept open between tasks."""
+
+    assert CeleryConfig.broker_pool_limit > 0
+    assert CeleryConfig.broker_heartbeat > 0